@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import Column, DateTime, Integer, create_engine, func
+from sqlalchemy import Column, DateTime, Integer, create_engine, func, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
@@ -26,6 +26,55 @@ def get_db():
     finally:
         db.close()
 
+def _migrate_message_seq(conn) -> None:
+    # create_all mevcut tablolara sütun eklemez; messages.seq burada eklenir ve doldurulur
+    nullable = conn.execute(text(
+        "SELECT is_nullable FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = 'messages' AND column_name = 'seq'"
+    )).scalar()
+    if nullable == "NO":
+        return
+    if nullable is None:
+        conn.execute(text("ALTER TABLE messages ADD COLUMN seq INTEGER"))
+    # Mevcut mesajlar sohbet içinde id sırasıyla numaralandırılır
+    conn.execute(text(
+        "UPDATE messages AS m SET seq = numbered.seq "
+        "FROM (SELECT id, COALESCE(MAX(seq) OVER (PARTITION BY chat_id), 0) "
+        "+ ROW_NUMBER() OVER (PARTITION BY chat_id, seq IS NULL ORDER BY id) AS seq FROM messages) AS numbered "
+        "WHERE m.id = numbered.id AND m.seq IS NULL"
+    ))
+    conn.execute(text("ALTER TABLE messages ALTER COLUMN seq SET NOT NULL"))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_messages_chat_id_seq ON messages (chat_id, seq)"))
+
+
+def _migrate_message_indexes(conn) -> None:
+    # Sohbet geçmişi okumaları (chat_id, user_id) eşitliği ve id sırasıyla yapılır
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_messages_chat_id_user_id_id ON messages (chat_id, user_id, id)"
+    ))
+    # chat_id ile başlayan bileşik indeksler tek sütunlu indeksi gereksiz kılar
+    conn.execute(text("DROP INDEX IF EXISTS ix_messages_chat_id"))
+
+
+def _migrate_xray_evaluation_cache_expiry(conn) -> None:
+    # Sona erme sütunu sonradan eklendi; eski satırların ömrü bilinmediğinden hemen
+    # süresi dolmuş sayılır, istendiğinde yeniden hesaplanır ve ilk temizlikte silinir
+    if conn.execute(text("SELECT to_regclass('xray_evaluation_cache')")).scalar() is None:
+        return
+    conn.execute(text("ALTER TABLE xray_evaluation_cache ADD COLUMN IF NOT EXISTS expires_at TIMESTAMP WITH TIME ZONE"))
+    conn.execute(text("UPDATE xray_evaluation_cache SET expires_at = now() WHERE expires_at IS NULL"))
+    conn.execute(text("ALTER TABLE xray_evaluation_cache ALTER COLUMN expires_at SET NOT NULL"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_xray_evaluation_cache_expires_at ON xray_evaluation_cache (expires_at)"
+    ))
+
+
 # Initialize database
 def init_db():
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        # Birden fazla süreç aynı anda başlarsa geçişi yalnızca biri yapar
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('xcardia_init_db'))"))
+        _migrate_message_seq(conn)
+        _migrate_message_indexes(conn)
+        _migrate_xray_evaluation_cache_expiry(conn) 
\ No newline at end of file
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, func
+from app.db.base import Base
+
+
+class ChatSummaryModel(Base):
+    __tablename__ = "chat_summaries"
+
+    chat_id = Column(String, primary_key=True)
+    user_id = Column(String, primary_key=True)
+    summary = Column(Text, nullable=False)
+    # Özete katlanan son mesajın id'si; sonraki mesajlar tam metin olarak gönderilir
+    covered_until_id = Column(Integer, nullable=False)
+    summary_tokens = Column(Integer, nullable=False)
+    folded_messages = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
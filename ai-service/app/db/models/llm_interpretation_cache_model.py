@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Float, Integer, String, Text, DateTime, func
+from app.db.base import Base
+
+
+class LLMInterpretationCacheModel(Base):
+    __tablename__ = "llm_interpretation_cache"
+
+    # sha256(istem sürümü + yuvarlanmış değerlendirme + normalize soru + deployment)
+    cache_key = Column(String(64), primary_key=True)
+    template_version = Column(String, nullable=False)
+    deployment = Column(String, nullable=False)
+    content = Column(Text, nullable=False)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    latency_ms = Column(Float, nullable=False, default=0.0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), index=True, nullable=False)
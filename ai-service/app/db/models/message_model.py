@@ -1,15 +1,21 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, func
+from sqlalchemy import Column, Index, Integer, String, Text, DateTime, func
 from app.db.base import Base
 
 
 class MessageModel(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("uq_messages_chat_id_seq", "chat_id", "seq", unique=True),
+        Index("ix_messages_chat_id_user_id_id", "chat_id", "user_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String, index=True, nullable=False)
-    chat_id = Column(String, index=True, nullable=False)
+    chat_id = Column(String, nullable=False)
     role = Column(String(50), nullable=False)
     content = Column(Text, nullable=False)
+    # Sohbet içindeki sıra (1'den başlar); aynı mesajın iki kez yazılmasını engeller
+    seq = Column(Integer, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Float, JSON, DateTime, func
+from app.db.base import Base
+
+
+class XRayEvaluationCacheModel(Base):
+    __tablename__ = "xray_evaluation_cache"
+
+    # sha256(image bytes) + model version + preprocessing version
+    cache_key = Column(String(64), primary_key=True)
+    image_sha256 = Column(String(64), index=True, nullable=False)
+    model_version = Column(String, nullable=False)
+    preprocessing_version = Column(String, nullable=False)
+    result = Column(JSON, nullable=False)
+    inference_ms = Column(Float, nullable=False, default=0.0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), index=True, nullable=False)
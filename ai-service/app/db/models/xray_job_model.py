@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Index, Integer, String, Text, JSON, LargeBinary, DateTime, func
+from app.db.base import Base
+
+
+class XRayJobModel(Base):
+    __tablename__ = "xray_jobs"
+
+    id = Column(Integer, primary_key=True)
+    # queued -> running -> done | failed
+    status = Column(String(16), nullable=False, default="queued")
+    # Yüklenen ham görüntü; iş bitince silinir
+    image = Column(LargeBinary, nullable=True)
+    image_sha256 = Column(String(64), nullable=False)
+    # İsteği gönderen API'nin aktif model sürümü ve sonucu üreten worker'ın sürümü
+    requested_model_version = Column(String, nullable=False)
+    model_version = Column(String, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    # invalid_image | model_unavailable | inference | timeout
+    error_type = Column(String(32), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Worker'lar en eski bekleyen işleri bu index üzerinden alır
+        Index("ix_xray_jobs_status_id", "status", "id"),
+    )
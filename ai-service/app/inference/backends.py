@@ -0,0 +1,74 @@
+import os
+from typing import Callable
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+# Başlangıçta seçilen çıkarım backend'i: eager | torchscript | onnx | int8
+XRAY_MODEL_BACKEND = os.getenv("XRAY_MODEL_BACKEND", "eager")
+XRAY_EXPORT_DIR = os.getenv("XRAY_EXPORT_DIR", "/app/models/exported")
+
+BACKENDS = ("eager", "torchscript", "onnx", "int8")
+# Artifact adı, export edildiği checkpoint'in anahtarını içerir (model.<anahtar>.<uzantı>)
+BACKEND_FILES = {
+    "torchscript": "torchscript.pt",
+    "onnx": "onnx",
+    "int8": "int8.torchscript.pt",
+}
+
+# (N, 1, 224, 224) float32 -> (N, num_classes) ham model çıktısı
+Predictor = Callable[[np.ndarray], np.ndarray]
+
+
+def backend_path(backend: str, artifact_key: str, export_dir: str = XRAY_EXPORT_DIR) -> str:
+    """
+    - **artifact_key**: `ModelVersion.artifact_key` of the checkpoint the artifact is exported from.
+    """
+    return os.path.join(export_dir, f"model.{artifact_key}.{BACKEND_FILES[backend]}")
+
+
+def _torch_predictor(module: Callable) -> Predictor:
+    def predict(batch: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            return module(torch.from_numpy(batch)).cpu().numpy()
+    return predict
+
+
+def _onnx_predictor(path: str) -> Predictor:
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = torch.get_num_threads()
+    options.inter_op_num_threads = 1
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+    input_name = session.get_inputs()[0].name
+
+    def predict(batch: np.ndarray) -> np.ndarray:
+        return session.run(None, {input_name: batch})[0]
+    return predict
+
+
+def load_predictor(
+        backend: str,
+        eager_model: nn.Module,
+        artifact_key: str = "",
+        export_dir: str = XRAY_EXPORT_DIR,
+    ) -> Predictor:
+    """
+    Build a predictor for `backend`. Non-eager backends load the artifacts
+    written by `python -m app.inference.export` for the same checkpoint.
+    - **Raises**: ValueError for unknown backends, FileNotFoundError if not exported.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown model backend: {backend}")
+    if backend == "eager":
+        return _torch_predictor(eager_model.eval())
+
+    path = backend_path(backend, artifact_key, export_dir)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{backend} artifact not found at {path}, run app.inference.export first")
+    if backend == "onnx":
+        return _onnx_predictor(path)
+    return _torch_predictor(torch.jit.load(path, map_location="cpu").eval())
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from app.inference.weights import ModelUnavailableError
+from app.infrastructure.metrics import metrics
+
+BatchRunner = Callable[[np.ndarray], Awaitable[np.ndarray]]
+
+
+class MicroBatcher:
+    """
+    Collects single preprocessed inputs from concurrent requests into batches.
+    A batch is dispatched once `max_batch_size` items are queued or the first
+    item has waited `max_wait_ms`, whichever comes first. Each caller gets
+    back its own row of the batch output.
+    """
+
+    def __init__(
+            self,
+            run_batch: BatchRunner,
+            max_batch_size: int = 8,
+            max_wait_ms: float = 5.0,
+            name: str = "xray",
+        ):
+        self._run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.name = name
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # Toplanmakta ya da modelde olan batch; kapanışta bekleyenleri yanıtlamak için
+        self._running: List[Tuple[np.ndarray, asyncio.Future, float]] = []
+        self._closed = False
+
+    def _ensure_started(self) -> None:
+        # Queue ve worker, çalışan event loop'a bağlı olarak ilk istekte oluşturulur
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item: np.ndarray) -> np.ndarray:
+        """
+        Queue one input (without batch dimension) and wait for its output row.
+        - **Raises**: ModelUnavailableError if the batcher is closed.
+        """
+        if self._closed:
+            raise ModelUnavailableError(f"{self.name} batcher is shut down")
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future, time.perf_counter()))
+        return await future
+
+    async def close(self) -> None:
+        """
+        Stop dispatching. Inputs still queued or in the unfinished batch are
+        failed with ModelUnavailableError so their callers do not hang.
+        """
+        self._closed = True
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        pending, self._running = self._running, []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        error = ModelUnavailableError(f"{self.name} batcher is shut down")
+        for _, future, _ in pending:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future, float]]:
+        batch = self._running = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            # İstemcisi vazgeçmiş istekleri modele sokma
+            batch = [entry for entry in batch if not entry[1].cancelled()]
+            if not batch:
+                continue
+
+            dispatched_at = time.perf_counter()
+            for _, _, enqueued_at in batch:
+                metrics.histogram(f"{self.name}_batch_queue_wait_ms").observe((dispatched_at - enqueued_at) * 1000)
+            metrics.histogram(f"{self.name}_batch_size").observe(len(batch))
+            metrics.histogram(f"{self.name}_batch_fill_ratio").observe(len(batch) / self.max_batch_size)
+
+            try:
+                outputs = await self._run_batch(np.stack([item for item, _, _ in batch]))
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                metrics.histogram(f"{self.name}_batch_run_ms").observe((time.perf_counter() - dispatched_at) * 1000)
+
+            for (_, future, _), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(output)
+            self._running = []
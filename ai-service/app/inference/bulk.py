@@ -0,0 +1,177 @@
+"""
+Offline bulk X-ray evaluation with the service's model and preprocessing.
+
+    python -m app.inference.bulk INPUT --output results.parquet [--pattern "heart_xray_*.jpg"]
+        [--batch-size 32] [--workers 4] [--prefetch 4]
+
+INPUT is a directory (searched recursively) or a manifest: a .txt file with
+one path per line or a .csv file with a `path` column. Results are appended
+to `<output>.partial.csv` after every batch; rerunning the same command
+resumes from there. The final CSV or Parquet file (by extension) is written
+once every image is done.
+"""
+import argparse
+import csv
+import fnmatch
+import os
+import sys
+import time
+from typing import List, Sequence, Set
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+from app.inference.preprocessing import INPUT_SIZE, preprocess_image_bytes
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+
+
+def list_inputs(source: str, pattern: str = "*") -> List[str]:
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(
+                os.path.join(root, name) for name in files
+                if name.lower().endswith(IMAGE_EXTENSIONS) and fnmatch.fnmatch(name, pattern)
+            )
+        return sorted(paths)
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, newline="") as f:
+        if source.lower().endswith(".csv"):
+            paths = [row["path"] for row in csv.DictReader(f)]
+        else:
+            paths = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    # Manifest'teki göreli yollar manifest dosyasına göredir
+    return [path if os.path.isabs(path) else os.path.join(base, path) for path in paths]
+
+
+class XRayFileDataset(Dataset):
+    """
+    Reads and preprocesses images in DataLoader workers. Unreadable images
+    yield a zero input and their error message instead of failing the run.
+    """
+
+    def __init__(self, paths: Sequence[str]):
+        self.paths = list(paths)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __getitem__(self, index: int):
+        path = self.paths[index]
+        try:
+            with open(path, "rb") as f:
+                return path, preprocess_image_bytes(f.read()), ""
+        except Exception as e:
+            return path, np.zeros((1, INPUT_SIZE, INPUT_SIZE), np.float32), str(e)
+
+
+def collate(items):
+    paths, images, errors = zip(*items)
+    return list(paths), torch.from_numpy(np.stack(images)), list(errors)
+
+
+def _init_worker(_: int) -> None:
+    # Paralellik worker sayısından gelir; her worker tek thread kullanır
+    torch.set_num_threads(1)
+    import cv2
+    cv2.setNumThreads(1)
+
+
+def read_done_paths(partial_path: str, model_version: str) -> Set[str]:
+    """
+    - **Raises**: SystemExit if the checkpoint was written by another model version.
+    """
+    if not os.path.exists(partial_path):
+        return set()
+    with open(partial_path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    versions = {row["model_version"] for row in rows}
+    if versions and versions != {model_version}:
+        raise SystemExit(
+            f"{partial_path} was written by model {sorted(versions)}, current model is {model_version}; "
+            "remove it to start over"
+        )
+    return {row["path"] for row in rows}
+
+
+def finalize(partial_path: str, output: str) -> None:
+    if output.lower().endswith(".parquet"):
+        import pandas as pd
+
+        pd.read_csv(partial_path).to_parquet(output, index=False)
+        os.remove(partial_path)
+    else:
+        os.replace(partial_path, output)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Directory of images or a .txt/.csv manifest")
+    parser.add_argument("--output", required=True, help="Result file, .csv or .parquet")
+    parser.add_argument("--pattern", default="*", help="Filename glob when INPUT is a directory")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--prefetch", type=int, default=4, help="Batches prefetched per worker")
+    parser.add_argument("--log-every", type=int, default=10, help="Progress line every N batches")
+    args = parser.parse_args()
+
+    from app.inference.weights import PRETRAINED_LABELS
+    from app.repositories.xray_scan_evaluation_repository import XRayScanEvaluationRepository
+
+    repository = XRayScanEvaluationRepository()
+    model_version = repository.model_version
+    repository._get_model()
+
+    partial_path = f"{args.output}.partial.csv"
+    done = read_done_paths(partial_path, model_version)
+    paths = [path for path in list_inputs(args.input, args.pattern) if path not in done]
+    print(f"{len(paths)} images to evaluate ({len(done)} already done), model {model_version}")
+
+    targets = repository.TARGET_PATHOLOGIES
+    fieldnames = ["path", "model_version", "error", *targets, *(f"pathologies.{label}" for label in PRETRAINED_LABELS)]
+    loader = DataLoader(
+        XRayFileDataset(paths),
+        batch_size=args.batch_size,
+        num_workers=args.workers,
+        prefetch_factor=args.prefetch if args.workers else None,
+        worker_init_fn=_init_worker,
+        collate_fn=collate,
+    )
+
+    started = time.perf_counter()
+    evaluated = 0
+    with open(partial_path, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        if f.tell() == 0:
+            writer.writeheader()
+        for batch_index, (batch_paths, images, errors) in enumerate(loader, start=1):
+            valid = [i for i, error in enumerate(errors) if not error]
+            probabilities = repository.predict_batch(images[valid].numpy()) if valid else []
+            rows = dict(zip(valid, probabilities))
+            for i, (path, error) in enumerate(zip(batch_paths, errors)):
+                record = {"path": path, "model_version": model_version, "error": error}
+                if i in rows:
+                    values = rows[i]
+                    record.update(zip(targets, values.tolist()))
+                    record.update(zip((f"pathologies.{label}" for label in PRETRAINED_LABELS), values[len(targets):].tolist()))
+                writer.writerow(record)
+            # Her batch sonrası checkpoint diske yazılır
+            f.flush()
+            os.fsync(f.fileno())
+
+            evaluated += len(batch_paths)
+            if batch_index % args.log_every == 0:
+                elapsed = time.perf_counter() - started
+                print(f"{evaluated}/{len(paths)} images, {evaluated / elapsed:.1f} images/sec", file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    finalize(partial_path, args.output)
+    print(f"Evaluated {evaluated} images in {elapsed:.1f} s ({evaluated / elapsed if elapsed else 0:.1f} images/sec) -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Build-time weight bundling. Downloads the torchxrayvision pretrained weights
+into the model directory as a plain state dict and writes a sha256 manifest
+of every checkpoint, so the service never touches the network at runtime.
+
+    python -m app.inference.bundle [--skip-pretrained]
+    python -m app.inference.bundle --verify
+
+`--verify` exits non-zero if a listed file is missing or its checksum changed.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import torch
+
+from app.inference.registry import XRAY_MODEL_DIR, file_checksum
+from app.inference.weights import PRETRAINED_PATH, PRETRAINED_WEIGHTS, XRAY_WEIGHTS_MANIFEST, load_manifest
+
+
+def bundle_pretrained(weights: str = PRETRAINED_WEIGHTS, output: str = PRETRAINED_PATH) -> str:
+    import torchxrayvision as xrv
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # torchxrayvision tüm modülü pickle'lar; mmap + weights_only ile okunabilmesi için state dict saklanır
+        model = xrv.models.DenseNet(weights=weights, cache_dir=cache_dir)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    tmp_path = f"{output}.tmp"
+    torch.save(model.state_dict(), tmp_path)
+    os.replace(tmp_path, output)
+    return xrv.models.model_urls[weights]["weights_url"]
+
+
+def checkpoint_paths(model_dir: str) -> list:
+    paths = []
+    for root, _, files in os.walk(model_dir):
+        paths.extend(os.path.join(root, name) for name in files if name.endswith((".pth", ".pt")))
+    return sorted(paths)
+
+
+def write_manifest(model_dir: str, manifest_path: str, sources: dict) -> dict:
+    files = {}
+    for path in checkpoint_paths(model_dir):
+        relative = os.path.relpath(path, model_dir)
+        files[relative] = {"sha256": file_checksum(path), "size": os.path.getsize(path)}
+        if relative in sources:
+            files[relative]["source"] = sources[relative]
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"files": files}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+    return files
+
+
+def verify_manifest(model_dir: str, manifest_path: str) -> bool:
+    manifest = load_manifest(manifest_path)
+    if not manifest:
+        print(f"No manifest at {manifest_path}")
+        return False
+    ok = True
+    for relative, entry in sorted(manifest.items()):
+        path = os.path.join(model_dir, relative)
+        if not os.path.isfile(path):
+            print(f"{relative:<48} MISSING")
+            ok = False
+        elif file_checksum(path) != entry["sha256"]:
+            print(f"{relative:<48} CHECKSUM MISMATCH")
+            ok = False
+        else:
+            print(f"{relative:<48} ok")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model-dir", default=XRAY_MODEL_DIR)
+    parser.add_argument("--manifest", default=XRAY_WEIGHTS_MANIFEST)
+    parser.add_argument("--skip-pretrained", action="store_true")
+    parser.add_argument("--verify", action="store_true")
+    args = parser.parse_args()
+
+    if args.verify:
+        return 0 if verify_manifest(args.model_dir, args.manifest) else 1
+
+    sources = {}
+    if not args.skip_pretrained:
+        output = os.path.join(args.model_dir, os.path.relpath(PRETRAINED_PATH, XRAY_MODEL_DIR))
+        sources[os.path.relpath(output, args.model_dir)] = bundle_pretrained(output=output)
+
+    files = write_manifest(args.model_dir, args.manifest, sources)
+    for relative, entry in sorted(files.items()):
+        print(f"{relative:<48} {entry['size'] / 1e6:>7.1f} MB  {entry['sha256'][:16]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+import numpy as np
+import torch
+
+from app.infrastructure.metrics import metrics
+
+# "thread": API sürecinde ayrı thread havuzu, "process": modeli bir kez yükleyen worker süreçleri
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")
+# Aynı anda çalışabilecek forward pass sayısı (process modunda worker süreç sayısı)
+INFERENCE_MAX_CONCURRENCY = int(os.getenv("INFERENCE_MAX_CONCURRENCY", "1"))
+# Her forward pass'in kullanacağı intra-op / inter-op thread bütçesi
+INFERENCE_INTRA_OP_THREADS = int(os.getenv(
+    "INFERENCE_INTRA_OP_THREADS",
+    str(max(1, (os.cpu_count() or 1) // INFERENCE_MAX_CONCURRENCY)),
+))
+INFERENCE_INTEROP_THREADS = int(os.getenv("INFERENCE_INTEROP_THREADS", "1"))
+# broadcast çağrısının tüm worker'lara ulaşması için beklenecek en uzun süre
+INFERENCE_BROADCAST_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_BROADCAST_TIMEOUT_SECONDS", "60"))
+
+# Worker süreçlerinde: broadcast görevleri her worker'a birer tane düşsün diye birbirini bekler
+_broadcast_barrier = None
+
+
+def configure_torch_threads(intra_op_threads: int, interop_threads: int) -> None:
+    """
+    Apply the thread budget to the current process.
+    The inter-op pool can only be sized before its first use, so later calls keep the existing size.
+    """
+    torch.set_num_threads(intra_op_threads)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError:
+        pass
+
+
+def _init_process_worker(
+        intra_op_threads: int,
+        interop_threads: int,
+        initializer: Optional[Callable[[], None]],
+        barrier,
+    ) -> None:
+    global _broadcast_barrier
+    _broadcast_barrier = barrier
+    configure_torch_threads(intra_op_threads, interop_threads)
+    if initializer is not None:
+        initializer()
+
+
+class InferenceExecutor:
+    """
+    Runs CPU-bound model calls off the event loop, in a dedicated pool with an
+    explicit torch thread budget and a cap on concurrent inferences.
+    In process mode each worker loads the model once through `initializer`;
+    `predict` and `initializer` must then be picklable module-level functions.
+    """
+
+    def __init__(
+            self,
+            predict: Callable[..., np.ndarray],
+            initializer: Optional[Callable[[], None]] = None,
+            mode: str = INFERENCE_EXECUTOR,
+            max_concurrency: int = INFERENCE_MAX_CONCURRENCY,
+            intra_op_threads: int = INFERENCE_INTRA_OP_THREADS,
+            interop_threads: int = INFERENCE_INTEROP_THREADS,
+        ):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor mode: {mode}")
+        self.mode = mode
+        self.max_concurrency = max(1, max_concurrency)
+        self._predict = predict
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._broadcast_lock: Optional[asyncio.Lock] = None
+
+        if mode == "process":
+            context = multiprocessing.get_context("spawn")
+            self._pool: Executor = ProcessPoolExecutor(
+                max_workers=self.max_concurrency,
+                mp_context=context,
+                initializer=_init_process_worker,
+                initargs=(intra_op_threads, interop_threads, initializer, context.Barrier(self.max_concurrency)),
+            )
+        else:
+            configure_torch_threads(intra_op_threads, interop_threads)
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_concurrency,
+                thread_name_prefix="inference",
+            )
+        print(
+            f"Inference executor: mode={mode}, max_concurrency={self.max_concurrency}, "
+            f"intra_op_threads={intra_op_threads}, interop_threads={interop_threads}"
+        )
+
+    async def run(self, batch: np.ndarray, *args) -> np.ndarray:
+        return await self.call(self._predict, batch, *args)
+
+    async def call(self, fn: Callable, *args):
+        """
+        Run `fn(*args)` in the pool under the same concurrency cap as `run`.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        loop = asyncio.get_running_loop()
+        waiting_since = loop.time()
+        async with self._semaphore:
+            metrics.histogram("inference_executor_wait_ms").observe((loop.time() - waiting_since) * 1000)
+            return await loop.run_in_executor(self._pool, fn, *args)
+
+    async def broadcast(self, fn: Callable, *args) -> List:
+        """
+        Run `fn(*args)` once in every worker process, e.g. to drop a model
+        version from each worker's registry. In thread mode the workers share
+        this process, so `fn` runs once.
+        - **Returns**: The result of each call.
+        """
+        loop = asyncio.get_running_loop()
+        if self.mode == "thread":
+            return [await loop.run_in_executor(self._pool, fn, *args)]
+        if self._broadcast_lock is None:
+            self._broadcast_lock = asyncio.Lock()
+        # Eşzamanlı iki broadcast aynı bariyeri paylaşmasın
+        async with self._broadcast_lock:
+            return list(await asyncio.gather(*(
+                loop.run_in_executor(self._pool, _run_on_every_worker, fn, args)
+                for _ in range(self.max_concurrency)
+            )))
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_on_every_worker(fn: Callable, args: tuple):
+    result = fn(*args)
+    # Tüm görevler bariyerde buluşana kadar worker bırakılmaz; böylece her görev ayrı bir worker'da çalışır
+    _broadcast_barrier.wait(INFERENCE_BROADCAST_TIMEOUT_SECONDS)
+    return result
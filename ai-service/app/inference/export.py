@@ -0,0 +1,201 @@
+"""
+Export the X-ray model to TorchScript, ONNX and int8 dynamically quantized
+TorchScript, and check each artifact against the fp32 eager model.
+
+    python -m app.inference.export [--output-dir /app/models/exported] [--checkpoint model_v2.pth] [--samples DIR]
+
+Artifacts are named after the checkpoint's checksum, so they are only ever
+served with the weights they were exported from. Exits non-zero when a
+backend's probability drift exceeds its tolerance.
+"""
+import argparse
+import copy
+import glob
+import inspect
+import os
+import sys
+from dataclasses import replace
+from typing import Dict, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from app.inference.backends import XRAY_EXPORT_DIR, Predictor, backend_path
+from app.inference.preprocessing import preprocess_image_bytes
+from app.inference.registry import ModelVersion, resolve_checkpoint_path
+from app.inference.weights import ModelUnavailableError
+
+# Servis edilen olasılıklarda izin verilen en büyük mutlak sapma
+PARITY_TOLERANCES: Dict[str, float] = {
+    "torchscript": 1e-4,
+    "onnx": 1e-3,
+    "int8": 2e-2,
+}
+
+
+class ParityError(Exception):
+    def __init__(self, backend: str, drift: float, tolerance: float):
+        self.message = f"{backend} drift {drift:.2e} exceeds tolerance {tolerance:.0e}"
+        super().__init__(self.message)
+
+
+def export_torchscript(model: nn.Module, path: str, example: torch.Tensor) -> None:
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example, check_trace=False)
+    torch.jit.freeze(traced).save(path)
+
+
+def export_onnx(model: nn.Module, path: str, example: torch.Tensor) -> None:
+    kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # TorchScript tabanlı exporter; yeni torch sürümlerinde varsayılan dynamo'dur
+        kwargs["dynamo"] = False
+    torch.onnx.export(
+        model,
+        example,
+        path,
+        input_names=["image"],
+        output_names=["logits"],
+        dynamic_axes={"image": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=17,
+        **kwargs,
+    )
+
+
+class RowScaledQuantizedLinear(nn.Module):
+    """
+    Dynamically quantized nn.Linear that scales each row of its input to
+    [-1, 1] first. Plain dynamic quantization picks one activation scale for
+    the whole batch, so an image's output would depend on the images batched
+    with it (pooled DenseNet features range from ~10 to ~2000 across images).
+    """
+
+    def __init__(self, linear: nn.Linear):
+        super().__init__()
+        unbiased = nn.Linear(linear.in_features, linear.out_features, bias=False)
+        unbiased.weight = linear.weight
+        self.linear = torch.ao.quantization.quantize_dynamic(
+            nn.Sequential(unbiased),
+            {nn.Linear: torch.ao.quantization.per_channel_dynamic_qconfig},
+            dtype=torch.qint8,
+        )
+        self.bias = nn.Parameter(linear.bias.detach().clone(), requires_grad=False)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        scale = x.abs().amax(dim=1, keepdim=True).clamp_min(1e-12)
+        return self.linear(x / scale) * scale + self.bias
+
+
+def _quantize_linears(module: nn.Module) -> nn.Module:
+    for name, child in module.named_children():
+        if isinstance(child, nn.Linear):
+            setattr(module, name, RowScaledQuantizedLinear(child))
+        else:
+            _quantize_linears(child)
+    return module
+
+
+def export_int8(model: nn.Module, path: str, example: torch.Tensor) -> None:
+    # Dinamik quantization yalnızca nn.Linear katmanlarını int8'e çevirir;
+    # DenseNet'te bu sınıflandırıcı başıdır, konvolüsyonlar fp32 kalır.
+    quantized = _quantize_linears(copy.deepcopy(model)).eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(quantized, example, check_trace=False)
+    traced.save(path)
+
+
+EXPORTERS = {
+    "torchscript": export_torchscript,
+    "onnx": export_onnx,
+    "int8": export_int8,
+}
+
+
+def probability_drift(reference: Predictor, candidate: Predictor, inputs: np.ndarray) -> float:
+    """
+    Largest absolute difference between the probabilities of two predictors.
+    """
+    return float(np.max(np.abs(reference(inputs) - candidate(inputs))))
+
+
+def check_parity(backend: str, reference: Predictor, candidate: Predictor, inputs: np.ndarray) -> float:
+    drift = probability_drift(reference, candidate, inputs)
+    tolerance = PARITY_TOLERANCES[backend]
+    if drift > tolerance:
+        raise ParityError(backend, drift, tolerance)
+    return drift
+
+
+def load_parity_inputs(samples_dir: str, count: int) -> np.ndarray:
+    """
+    Preprocess sample images exactly like uploads are preprocessed in production.
+    """
+    paths = sorted(glob.glob(os.path.join(samples_dir, "*.jpg")) + glob.glob(os.path.join(samples_dir, "*.png")))
+    images = []
+    for path in paths[:count]:
+        with open(path, "rb") as f:
+            images.append(preprocess_image_bytes(f.read()))
+    return np.stack(images)
+
+
+def export_version(repository, version: ModelVersion, backend: str, inputs: np.ndarray) -> Tuple[str, float]:
+    """
+    Export `version`'s model for `backend` into `version.export_dir` and check
+    the served probabilities (`predict_batch`, calibration included) against
+    the fp32 eager model.
+    - **Returns**: The artifact path and the largest probability drift.
+    - **Raises**: ParityError if the drift exceeds the backend's tolerance.
+    """
+    eager = replace(version, backend="eager")
+    model = repository._get_model(eager)
+    path = backend_path(backend, version.artifact_key, version.export_dir)
+    EXPORTERS[backend](model, path, torch.from_numpy(inputs[:1]))
+    candidate = replace(version, backend=backend)
+    drift = check_parity(
+        backend,
+        lambda batch: repository.predict_batch(batch, eager),
+        lambda batch: repository.predict_batch(batch, candidate),
+        inputs,
+    )
+    return path, drift
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output-dir", default=XRAY_EXPORT_DIR)
+    parser.add_argument("--checkpoint", help="Checkpoint inside the model directory, the active weights by default")
+    parser.add_argument("--samples", help="Directory of X-ray images used for the parity check")
+    parser.add_argument("--count", type=int, default=8)
+    parser.add_argument("--backends", nargs="+", default=list(EXPORTERS))
+    args = parser.parse_args()
+
+    from app.repositories.xray_scan_evaluation_repository import XRayScanEvaluationRepository
+
+    repository = XRayScanEvaluationRepository()
+    os.makedirs(args.output_dir, exist_ok=True)
+    try:
+        path = resolve_checkpoint_path(args.checkpoint) if args.checkpoint else repository._get_active_version().path
+        version = repository._resolve_version(path, "eager", os.path.realpath(args.output_dir))
+    except (ModelUnavailableError, ValueError) as e:
+        print(f"Model could not be loaded, nothing to export: {getattr(e, 'message', e)}")
+        return 1
+
+    if args.samples:
+        inputs = load_parity_inputs(args.samples, args.count)
+    else:
+        inputs = np.random.default_rng(0).uniform(-1024, 1024, (args.count, 1, 224, 224)).astype(np.float32)
+
+    failed = False
+    for backend in args.backends:
+        try:
+            path, drift = export_version(repository, version, backend, inputs)
+            print(f"{backend:<12} {path} ({os.path.getsize(path) / 1e6:.1f} MB), max drift {drift:.2e}")
+        except ParityError as e:
+            print(f"{backend:<12} FAILED: {e.message}")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+@dataclass(frozen=True)
+class Head:
+    name: str
+    labels: Tuple[str, ...]
+    # torchxrayvision kalibrasyon eşikleri; eşik olasılığı 0.5'e eşlenir
+    op_threshs: Optional[Tuple[float, ...]] = None
+
+
+class MultiHeadDenseNet(nn.Module):
+    """
+    Runs the DenseNet feature extractor once and applies every classifier head
+    to the shared pooled features.
+    - **Returns**: Raw logits of all heads, concatenated in `heads` order.
+
+    Heads are only exact on the backbone they were trained with, so only
+    heads trained on this same backbone (see `shares_backbone`) belong here.
+    """
+
+    def __init__(self, features: nn.Module, heads: Sequence[Tuple[Head, nn.Linear]]):
+        super().__init__()
+        self.features = features
+        self.classifiers = nn.ModuleList([classifier for _, classifier in heads])
+        self.heads: List[Head] = [head for head, _ in heads]
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        features = F.relu(self.features(x))
+        pooled = F.adaptive_avg_pool2d(features, (1, 1)).flatten(1)
+        return torch.cat([classifier(pooled) for classifier in self.classifiers], dim=1)
+
+
+def shares_backbone(state_dict: Dict[str, torch.Tensor], other: Dict[str, torch.Tensor]) -> bool:
+    """
+    True if two checkpoints have identical feature extractor weights, i.e. a
+    classifier trained on one sees the same features on the other.
+    """
+    keys = {key for key in state_dict if key.startswith("features.")}
+    if not keys or keys != {key for key in other if key.startswith("features.")}:
+        return False
+    return all(
+        state_dict[key].shape == other[key].shape and torch.equal(state_dict[key], other[key])
+        for key in keys
+    )
+
+
+def op_norm(probabilities: np.ndarray, op_threshs: Sequence[float]) -> np.ndarray:
+    """
+    NumPy port of `torchxrayvision.models.op_norm`.
+    """
+    threshs = np.asarray(op_threshs, dtype=probabilities.dtype)
+    below = probabilities < threshs
+    return np.where(
+        below,
+        probabilities / (threshs * 2),
+        1.0 - (1.0 - probabilities) / ((1 - threshs) * 2),
+    )
+
+
+def head_probabilities(logits: np.ndarray, heads: Sequence[Head]) -> np.ndarray:
+    """
+    Sigmoid of the concatenated logits, with each head's calibration applied.
+    """
+    # tanh formu büyük logit'lerde taşmaz
+    probabilities = 0.5 * (1 + np.tanh(0.5 * logits))
+    offset = 0
+    for head in heads:
+        end = offset + len(head.labels)
+        if head.op_threshs is not None:
+            probabilities[:, offset:end] = op_norm(probabilities[:, offset:end], head.op_threshs)
+        offset = end
+    return probabilities
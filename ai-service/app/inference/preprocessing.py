@@ -0,0 +1,77 @@
+import io
+import os
+from typing import Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Model girişi: (1, 224, 224) float32, [-1024, 1024] aralığında (torchxrayvision normalizasyonu)
+INPUT_SIZE = 224
+# Ön işleme çıktısını etkileyen her değişiklikte artırılmalı (sonuç önbelleği anahtarının parçası)
+PREPROCESSING_VERSION = "2"
+
+# Yüzlerce megapiksellik taramalar için; JPEG'ler zaten küçültülerek decode edilir
+Image.MAX_IMAGE_PIXELS = int(os.getenv("XRAY_MAX_IMAGE_PIXELS", "400000000"))
+
+_SCALE = np.float32(2048.0 / 255.0)
+_OFFSET = np.float32(1024.0)
+
+
+def decode_grayscale(image_bytes: bytes, min_size: int = INPUT_SIZE) -> np.ndarray:
+    """
+    Decode an image straight to 8-bit grayscale near the target resolution.
+    JPEGs use DCT-domain downscaling (`Image.draft`) so a 200 MP scan is never
+    fully decoded; other formats are box-reduced right after decoding.
+    The shorter side is kept >= `min_size`.
+    - **Raises**: ValueError if the bytes are not a decodable image.
+    """
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        if img.format == "JPEG":
+            img.draft("L", (min_size, min_size))
+        img.load()
+    except Exception as e:
+        raise ValueError(f"Error: Image is not valid. {e}")
+
+    factor = min(img.size) // min_size
+    if factor >= 2:
+        img = img.reduce(factor)
+
+    if img.mode.startswith("I"):
+        # 16-bit taramaları 8-bit'e ölçekle
+        array = np.asarray(img, dtype=np.float32) * np.float32(255.0 / 65535.0)
+        return np.clip(array, 0, 255).astype(np.uint8)
+    if img.mode != "L":
+        img = img.convert("L")
+    return np.asarray(img)
+
+
+def preprocess_grayscale(image: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Center-crop, area-resize and normalize a 2D uint8 image into `out`
+    (shape (1, 224, 224), float32), allocating it if not given.
+    """
+    if image.ndim != 2 or min(image.shape) == 0:
+        raise ValueError("Error: Image is not valid.")
+    if out is None:
+        out = np.empty((1, INPUT_SIZE, INPUT_SIZE), dtype=np.float32)
+
+    height, width = image.shape
+    crop = min(height, width)
+    top, left = height // 2 - crop // 2, width // 2 - crop // 2
+    square = image[top:top + crop, left:left + crop]
+
+    resized = cv2.resize(square, (INPUT_SIZE, INPUT_SIZE), interpolation=cv2.INTER_AREA)
+    # (x / 255 * 2 - 1) * 1024, tek geçişte ve ara dizi oluşturmadan
+    np.multiply(resized, _SCALE, out=out[0], casting="unsafe")
+    out[0] -= _OFFSET
+    return out
+
+
+def preprocess_image_bytes(image_bytes: bytes, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Decode and preprocess an uploaded X-ray into a model input.
+    - **out**: Optional preallocated (1, 224, 224) float32 buffer, e.g. a row of a batch.
+    """
+    return preprocess_grayscale(decode_grayscale(image_bytes), out=out)
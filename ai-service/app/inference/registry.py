@@ -0,0 +1,211 @@
+import hashlib
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, Tuple
+
+import torch
+
+from app.inference.backends import Predictor
+
+# Checkpoint'ler bu dizinin dışından yüklenemez
+XRAY_MODEL_DIR = os.path.realpath(os.getenv("XRAY_MODEL_DIR", "/app/models"))
+# Bir süreçte aynı anda bellekte tutulan en fazla model sürümü (aktif + drain edilen)
+XRAY_MODEL_KEEP_VERSIONS = int(os.getenv("XRAY_MODEL_KEEP_VERSIONS", "2"))
+
+
+@dataclass(frozen=True)
+class ModelVersion:
+    """
+    A checkpoint on disk plus the backend it is served with.
+    `pretrained` marks the bundled torchxrayvision weights; `verified` that
+    the checksum matched the bundle manifest. `head_path` adds the pretrained
+    classifier as a second head on this checkpoint's backbone, which must be
+    the pretrained backbone itself.
+    """
+    path: str
+    checksum: str
+    backend: str
+    export_dir: str
+    pretrained: bool = False
+    verified: bool = False
+    head_path: str = ""
+    head_checksum: str = ""
+
+    @property
+    def version(self) -> str:
+        if self.head_checksum:
+            return f"{self.checksum[:16]}+{self.head_checksum[:8]}:{self.backend}"
+        return f"{self.checksum[:16]}:{self.backend}"
+
+    @property
+    def artifact_key(self) -> str:
+        """
+        Names exported artifacts, so a backend only ever serves artifacts of these weights.
+        """
+        if self.head_checksum:
+            return f"{self.checksum[:16]}-{self.head_checksum[:8]}"
+        return self.checksum[:16]
+
+    def to_dict(self) -> dict:
+        return {
+            "version": self.version,
+            "path": self.path,
+            "checksum": self.checksum,
+            "backend": self.backend,
+            "pretrained": self.pretrained,
+            "verified": self.verified,
+            "head_path": self.head_path,
+            "head_checksum": self.head_checksum,
+        }
+
+
+@dataclass
+class LoadedModel:
+    version: ModelVersion
+    model: object
+    predictor: Predictor
+    load_ms: float
+    loaded_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+def file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def resolve_model_path(path: str) -> str:
+    """
+    - **Raises**: ValueError if `path` is outside XRAY_MODEL_DIR.
+    """
+    resolved = os.path.realpath(os.path.join(XRAY_MODEL_DIR, path))
+    if os.path.commonpath([resolved, XRAY_MODEL_DIR]) != XRAY_MODEL_DIR:
+        raise ValueError(f"{path} must be inside {XRAY_MODEL_DIR}")
+    return resolved
+
+
+def resolve_checkpoint_path(path: str) -> str:
+    """
+    - **Raises**: ValueError if `path` is outside XRAY_MODEL_DIR or does not exist.
+    """
+    resolved = resolve_model_path(path)
+    if not os.path.isfile(resolved):
+        raise ValueError(f"Checkpoint not found: {path}")
+    return resolved
+
+
+def load_state_dict(path: str) -> Dict[str, torch.Tensor]:
+    """
+    Load a checkpoint memory-mapped: tensors are backed by the file's page
+    cache, so every worker process maps the same physical pages instead of
+    copying the weights into its own heap.
+    """
+    try:
+        return torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    except RuntimeError:
+        # Eski (zip olmayan) serileştirme formatı mmap'i desteklemez
+        print(f"Checkpoint {path} cannot be memory-mapped, loading into memory")
+        return torch.load(path, map_location="cpu", weights_only=True)
+
+
+def rss_mb() -> float:
+    """
+    Current resident set size of this process.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class ModelRegistry:
+    """
+    Per-process cache of loaded model versions; `load(version)` returns
+    (model, predictor). Versions are loaded on first
+    use and the least recently used ones beyond `keep` are dropped, so a swap
+    only costs one extra model while old requests drain.
+    `lease` counts batches running on each version in this process.
+    """
+
+    def __init__(
+            self,
+            load: Callable[[ModelVersion], Tuple[object, Predictor]],
+            keep: int = XRAY_MODEL_KEEP_VERSIONS,
+        ):
+        self._load = load
+        self._keep = max(1, keep)
+        self._loaded: "OrderedDict[ModelVersion, LoadedModel]" = OrderedDict()
+        self._loading: Dict[ModelVersion, threading.Lock] = {}
+        self._inflight: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def get(self, version: ModelVersion) -> LoadedModel:
+        with self._lock:
+            loaded = self._loaded.get(version)
+            if loaded is not None:
+                self._loaded.move_to_end(version)
+                return loaded
+            version_lock = self._loading.setdefault(version, threading.Lock())
+
+        # Yeni sürüm yüklenirken diğer sürümlerle çıkarım devam eder
+        with version_lock:
+            with self._lock:
+                loaded = self._loaded.get(version)
+            if loaded is not None:
+                return loaded
+            started = time.perf_counter()
+            model, predictor = self._load(version)
+            loaded = LoadedModel(version, model, predictor, (time.perf_counter() - started) * 1000)
+            with self._lock:
+                self._loaded[version] = loaded
+                self._loading.pop(version, None)
+                while len(self._loaded) > self._keep:
+                    evicted, _ = self._loaded.popitem(last=False)
+                    print(f"Unloaded model {evicted.version}")
+        return loaded
+
+    def release(self, version: ModelVersion) -> None:
+        with self._lock:
+            if self._loaded.pop(version, None) is not None:
+                print(f"Unloaded model {version.version}")
+
+    @contextmanager
+    def lease(self, version: ModelVersion) -> Iterator[None]:
+        with self._lock:
+            self._inflight[version] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._inflight[version] -= 1
+                if self._inflight[version] <= 0:
+                    del self._inflight[version]
+
+    def inflight(self, version: ModelVersion) -> int:
+        with self._lock:
+            return self._inflight.get(version, 0)
+
+    def describe(self) -> list:
+        with self._lock:
+            return [
+                dict(
+                    loaded.version.to_dict(),
+                    load_ms=round(loaded.load_ms, 1),
+                    loaded_at=loaded.loaded_at.isoformat(),
+                    inflight=self._inflight.get(loaded.version, 0),
+                )
+                for loaded in self._loaded.values()
+            ]
+
@@ -0,0 +1,53 @@
+import json
+import os
+from typing import Optional
+
+import torchxrayvision as xrv
+
+from app.inference.registry import XRAY_MODEL_DIR
+
+# Build sırasında `python -m app.inference.bundle` ile yazılan checksum manifest'i
+XRAY_WEIGHTS_MANIFEST = os.getenv("XRAY_WEIGHTS_MANIFEST", os.path.join(XRAY_MODEL_DIR, "manifest.json"))
+# true ise manifest'te olmayan checkpoint'ler de reddedilir
+XRAY_REQUIRE_BUNDLED_WEIGHTS = os.getenv("XRAY_REQUIRE_BUNDLED_WEIGHTS", "false").lower() == "true"
+
+# torchxrayvision ön-eğitimli ağırlıkları; çalışma anında indirilmez, bundle'dan okunur
+PRETRAINED_WEIGHTS = "densenet121-res224-all"
+PRETRAINED_PATH = os.path.join(XRAY_MODEL_DIR, "bundle", f"{PRETRAINED_WEIGHTS}.pth")
+PRETRAINED_LABELS = tuple(xrv.models.model_urls[PRETRAINED_WEIGHTS]["labels"])
+
+
+class ModelUnavailableError(Exception):
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+def load_manifest(path: str = XRAY_WEIGHTS_MANIFEST) -> dict:
+    """
+    - **Returns**: {relative path: {"sha256", "size", ...}}, empty if there is no manifest.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get("files", {})
+
+
+def verify_checkpoint(path: str, checksum: str, manifest: Optional[dict] = None) -> bool:
+    """
+    Check a checkpoint's sha256 against the bundle manifest.
+    - **Returns**: True if listed and matching, False if not listed.
+    - **Raises**: ModelUnavailableError on a mismatch, or for unlisted
+      checkpoints when XRAY_REQUIRE_BUNDLED_WEIGHTS is set.
+    """
+    manifest = load_manifest() if manifest is None else manifest
+    entry = manifest.get(os.path.relpath(path, XRAY_MODEL_DIR))
+    if entry is None:
+        if XRAY_REQUIRE_BUNDLED_WEIGHTS:
+            raise ModelUnavailableError(f"{path} is not in the weight bundle manifest")
+        return False
+    if entry["sha256"] != checksum:
+        raise ModelUnavailableError(
+            f"Checksum mismatch for {path}: expected {entry['sha256']}, got {checksum}"
+        )
+    return True
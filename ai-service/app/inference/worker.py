@@ -0,0 +1,105 @@
+"""
+Standalone X-ray inference worker for the Postgres job queue. Loads only the
+model (no API, no LLM client) and evaluates jobs submitted by API replicas
+running with XRAY_INFERENCE_MODE=queue. Run as many as there is capacity for,
+on any node that can reach the database.
+
+    python -m app.inference.worker [--batch-size 8] [--worker-id NAME]
+
+SIGTERM/SIGINT finish the current batch before exiting.
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.inference.preprocessing import preprocess_image_bytes
+from app.repositories.xray_job_repository import (
+    JOBS_CHANNEL, XRAY_JOB_POLL_INTERVAL_SECONDS, XRayJobRepository, listen_connection, wait_for_notify,
+)
+from app.repositories.xray_scan_evaluation_repository import XRAY_BATCH_MAX_SIZE, XRayScanEvaluationRepository
+from app.inference.weights import ModelUnavailableError
+
+# Bayat işlerin yeniden kuyruğa alınma ve eski işlerin silinme aralığı
+XRAY_JOB_MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("XRAY_JOB_MAINTENANCE_INTERVAL_SECONDS", "30"))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=XRAY_BATCH_MAX_SIZE, help="Jobs claimed per forward pass")
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}:{os.getpid()}")
+    args = parser.parse_args()
+
+    stopping = []
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stopping.append(True))
+
+    repository = XRayScanEvaluationRepository()
+    jobs = XRayJobRepository()
+    try:
+        version = repository._get_active_version()
+        # Model iş almadan önce yüklenir; yüklenemiyorsa worker hiç iş almaz
+        repository._get_model(version)
+    except ModelUnavailableError as e:
+        print(e.message, file=sys.stderr)
+        return 1
+    print(f"Worker {args.worker_id} serving model {version.version}, batch size {args.batch_size}")
+
+    conn = listen_connection(JOBS_CHANNEL)
+    decoders = ThreadPoolExecutor(max_workers=min(args.batch_size, os.cpu_count() or 1))
+    last_maintenance = 0.0
+    try:
+        while not stopping:
+            if time.monotonic() - last_maintenance > XRAY_JOB_MAINTENANCE_INTERVAL_SECONDS:
+                report = jobs.maintain()
+                if any(report.values()):
+                    print(f"Job maintenance: {report}")
+                last_maintenance = time.monotonic()
+
+            claimed = jobs.claim(args.batch_size, args.worker_id)
+            if not claimed:
+                # Yeni iş bildirimi gelene kadar (ya da yoklama aralığı dolana kadar) uyunur
+                wait_for_notify(conn, XRAY_JOB_POLL_INTERVAL_SECONDS)
+                continue
+
+            started = time.perf_counter()
+            batch = np.empty((len(claimed), 1, 224, 224), np.float32)
+            # Görüntüler paralel olarak doğrudan batch tamponunun satırlarına çözülür
+            outcomes = list(decoders.map(_decode, [image for _, image in claimed], batch))
+            results, failures = {}, {}
+            for (job_id, _), error in zip(claimed, outcomes):
+                if error is not None:
+                    failures[job_id] = ("invalid_image", error)
+            rows = [i for i, error in enumerate(outcomes) if error is None]
+            if rows:
+                try:
+                    probabilities = repository.predict_batch(batch[rows], version)
+                    results = {claimed[i][0]: repository._to_result(p) for i, p in zip(rows, probabilities)}
+                except ModelUnavailableError as e:
+                    failures.update({claimed[i][0]: ("model_unavailable", e.message) for i in rows})
+                except Exception as e:
+                    print(f"Error in X-ray prediction: {e}", file=sys.stderr)
+                    failures.update({claimed[i][0]: ("inference", f"Error: {e}") for i in rows})
+            jobs.finish(results, failures, version.version)
+            print(f"Evaluated {len(claimed)} jobs in {(time.perf_counter() - started) * 1000:.0f} ms")
+    finally:
+        decoders.shutdown()
+        conn.close()
+    return 0
+
+
+def _decode(image_bytes: bytes, out: np.ndarray):
+    try:
+        preprocess_image_bytes(image_bytes, out)
+        return None
+    except Exception as e:
+        return str(e)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
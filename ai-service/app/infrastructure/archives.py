@@ -0,0 +1,76 @@
+import asyncio
+import os
+import tarfile
+import zipfile
+from typing import AsyncIterator, BinaryIO, Iterator, List, Tuple, Union
+
+from fastapi import UploadFile
+
+# Arşivdeki tek bir görüntünün en fazla boyutu; bellek kullanımını sınırlar
+XRAY_BATCH_MAX_IMAGE_BYTES = int(os.getenv("XRAY_BATCH_MAX_IMAGE_BYTES", str(64 * 1024 * 1024)))
+
+ARCHIVE_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".zip")
+
+# (name, image bytes) ya da okunamayan üye için (name, hata)
+UploadItem = Tuple[str, Union[bytes, Exception]]
+
+
+def is_archive(filename: str) -> bool:
+    return (filename or "").lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _skip(name: str) -> bool:
+    # macOS arşiv artıkları ve gizli dosyalar
+    return name.startswith("__MACOSX/") or os.path.basename(name).startswith(".")
+
+
+def _too_large(name: str) -> Exception:
+    return ValueError(f"Error: {name} is larger than {XRAY_BATCH_MAX_IMAGE_BYTES} bytes")
+
+
+def iter_archive(fileobj: BinaryIO, filename: str) -> Iterator[UploadItem]:
+    """
+    Yield the files of a tar or zip archive one at a time. Tar archives are
+    read as a stream, so only the current member is ever held in memory.
+    """
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or _skip(info.filename):
+                    continue
+                if info.file_size > XRAY_BATCH_MAX_IMAGE_BYTES:
+                    yield info.filename, _too_large(info.filename)
+                    continue
+                yield info.filename, archive.read(info)
+        return
+
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile() or _skip(member.name):
+                continue
+            if member.size > XRAY_BATCH_MAX_IMAGE_BYTES:
+                yield member.name, _too_large(member.name)
+                continue
+            yield member.name, archive.extractfile(member).read()
+
+
+async def iter_uploads(uploads: List[UploadFile]) -> AsyncIterator[UploadItem]:
+    """
+    Yield every image of a multi-file upload, expanding tar/zip archives.
+    Archive reads run in the default thread pool.
+    """
+    loop = asyncio.get_running_loop()
+    for upload in uploads:
+        if not is_archive(upload.filename):
+            yield upload.filename, await upload.read()
+            continue
+        members = iter_archive(upload.file, upload.filename)
+        while True:
+            try:
+                item = await loop.run_in_executor(None, next, members, None)
+            except (tarfile.TarError, zipfile.BadZipFile) as e:
+                yield upload.filename, ValueError(f"Error: {upload.filename} is not a valid archive. {e}")
+                break
+            if item is None:
+                break
+            yield item
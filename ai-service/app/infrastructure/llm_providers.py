@@ -0,0 +1,255 @@
+import abc
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+import uuid
+from typing import AsyncIterator, List, Optional
+
+import httpx
+import openai
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from app.infrastructure.tokens import count_message_tokens
+
+# Sohbet tamamlamalarını üreten sağlayıcı: azure | fake (yerel, kota harcamayan sahte sağlayıcı)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "azure")
+
+# Sahte sağlayıcı: ilk token gecikmesi (ms, dağılımın medyanı) ve dağılımı: constant | lognormal | exponential
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "300"))
+FAKE_LLM_LATENCY_DISTRIBUTION = os.getenv("FAKE_LLM_LATENCY_DISTRIBUTION", "lognormal")
+# lognormal dağılımın log-uzayındaki standart sapması; kuyruk gecikmesini belirler
+FAKE_LLM_LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5"))
+# Token başına üretim süresi ve yanıt uzunluğu
+FAKE_LLM_TOKEN_MS = float(os.getenv("FAKE_LLM_TOKEN_MS", "20"))
+FAKE_LLM_COMPLETION_TOKENS = int(os.getenv("FAKE_LLM_COMPLETION_TOKENS", "100"))
+# İsteklerin bu oranı 500 / 429 ile reddedilir
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_RATE_LIMIT_RATE = float(os.getenv("FAKE_LLM_RATE_LIMIT_RATE", "0"))
+# Aynı tohumla gecikme ve hata dizisi tekrarlanabilir
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+
+PROVIDERS = ("azure", "fake")
+LATENCY_DISTRIBUTIONS = ("constant", "lognormal", "exponential")
+
+FAKE_LLM_WORDS = (
+    "röntgen", "bulgular", "kalp", "akciğer", "gölge", "normal", "sınırlarda",
+    "değerlendirme", "öneri", "doktorunuza", "danışınız", "olasılık", "düşük", "yüksek",
+)
+
+
+class LLMUnavailableError(Exception):
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+class LLMProvider(abc.ABC):
+    """
+    Runs chat completions against one backend. `complete` takes the
+    arguments of `chat.completions.create` and returns the same objects:
+    a ChatCompletion, or an async iterator of ChatCompletionChunk with an
+    async `close()` when `stream=True`. Failures raise openai errors so the
+    caller's retry policy applies to every provider.
+    """
+    name = ""
+    deployment = ""
+
+    @abc.abstractmethod
+    async def complete(self, messages: List[dict], max_completion_tokens: int, **kwargs):
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class AzureOpenAIProvider(LLMProvider):
+    name = "azure"
+
+    def __init__(
+            self,
+            max_connections: int,
+            max_keepalive_connections: int,
+            timeout_seconds: float,
+        ):
+        self.deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-3.5-turbo")
+        self._max_connections = max_connections
+        self._max_keepalive_connections = max_keepalive_connections
+        self._timeout_seconds = timeout_seconds
+        self._client: Optional[openai.AsyncAzureOpenAI] = None
+
+    def __get_client(self) -> openai.AsyncAzureOpenAI:
+        if self._client is None:
+            self._client = openai.AsyncAzureOpenAI(
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                # Yeniden denemeler limiter ve metriklerle birlikte OpenAIRepository'de yapılır
+                max_retries=0,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self._max_connections,
+                        max_keepalive_connections=self._max_keepalive_connections,
+                    ),
+                    timeout=httpx.Timeout(self._timeout_seconds, connect=10.0),
+                ),
+            )
+        return self._client
+
+    async def complete(self, messages: List[dict], max_completion_tokens: int, **kwargs):
+        return await self.__get_client().chat.completions.create(
+            messages=messages,
+            max_completion_tokens=max_completion_tokens,
+            model=self.deployment,
+            **kwargs,
+        )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+class FakeStream:
+    def __init__(self, chunks: AsyncIterator[ChatCompletionChunk]):
+        self._chunks = chunks
+
+    def __aiter__(self):
+        return self._chunks
+
+    async def close(self) -> None:
+        await self._chunks.aclose()
+
+
+class FakeLLMProvider(LLMProvider):
+    """
+    Local stand-in for load tests: no network and no quota. Answers are
+    derived from a hash of the prompt, so the same prompt always gets the
+    same text. Latency, errors and token counts follow the FAKE_LLM_*
+    settings, and the random sequence is reproducible via FAKE_LLM_SEED.
+    """
+    name = "fake"
+    deployment = "fake"
+
+    def __init__(
+            self,
+            latency_ms: float = FAKE_LLM_LATENCY_MS,
+            distribution: str = FAKE_LLM_LATENCY_DISTRIBUTION,
+            sigma: float = FAKE_LLM_LATENCY_SIGMA,
+            token_ms: float = FAKE_LLM_TOKEN_MS,
+            completion_tokens: int = FAKE_LLM_COMPLETION_TOKENS,
+            error_rate: float = FAKE_LLM_ERROR_RATE,
+            rate_limit_rate: float = FAKE_LLM_RATE_LIMIT_RATE,
+            seed: int = FAKE_LLM_SEED,
+        ):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self._latency_ms = latency_ms
+        self._distribution = distribution
+        self._sigma = sigma
+        self._token_ms = token_ms
+        self._completion_tokens = completion_tokens
+        self._error_rate = error_rate
+        self._rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+
+    def __first_token_seconds(self) -> float:
+        if self._distribution == "constant":
+            latency_ms = self._latency_ms
+        elif self._distribution == "exponential":
+            latency_ms = self._random.expovariate(1 / self._latency_ms) if self._latency_ms > 0 else 0.0
+        else:
+            # Medyanı FAKE_LLM_LATENCY_MS olan lognormal dağılım
+            latency_ms = self._latency_ms * self._random.lognormvariate(0, self._sigma)
+        return latency_ms / 1000
+
+    def __raise_injected_error(self) -> None:
+        roll = self._random.random()
+        request = httpx.Request("POST", "http://fake-llm/chat/completions")
+        if roll < self._rate_limit_rate:
+            raise openai.RateLimitError(
+                "Injected rate limit", response=httpx.Response(429, request=request), body=None,
+            )
+        if roll < self._rate_limit_rate + self._error_rate:
+            raise openai.InternalServerError(
+                "Injected server error", response=httpx.Response(500, request=request), body=None,
+            )
+
+    def __answer(self, messages: List[dict], tokens: int) -> List[str]:
+        digest = hashlib.sha256(json.dumps(messages, sort_keys=True, default=str).encode()).digest()
+        words = random.Random(digest)
+        return [("" if index == 0 else " ") + words.choice(FAKE_LLM_WORDS) for index in range(tokens)]
+
+    def __usage(self, prompt_tokens: int, completion_tokens: int) -> dict:
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    async def complete(self, messages: List[dict], max_completion_tokens: int, **kwargs):
+        first_token_seconds = self.__first_token_seconds()
+        self.__raise_injected_error()
+        tokens = max(1, min(self._completion_tokens, max_completion_tokens))
+        parts = self.__answer(messages, tokens)
+        prompt_tokens = count_message_tokens(messages)
+        completion_id = f"fake-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        if not kwargs.get("stream"):
+            await asyncio.sleep(first_token_seconds + tokens * self._token_ms / 1000)
+            return ChatCompletion.model_validate({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": self.deployment,
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "".join(parts)},
+                }],
+                "usage": self.__usage(prompt_tokens, tokens),
+            })
+
+        include_usage = (kwargs.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(choices: list, usage: Optional[dict] = None) -> ChatCompletionChunk:
+            return ChatCompletionChunk.model_validate({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": self.deployment,
+                "choices": choices,
+                "usage": usage,
+            })
+
+        async def chunks():
+            await asyncio.sleep(first_token_seconds)
+            for index, part in enumerate(parts):
+                if index > 0:
+                    await asyncio.sleep(self._token_ms / 1000)
+                yield chunk([{"index": 0, "delta": {"role": "assistant", "content": part}}])
+            yield chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if include_usage:
+                yield chunk([], self.__usage(prompt_tokens, tokens))
+
+        return FakeStream(chunks())
+
+
+def create_provider(
+        name: str,
+        max_connections: int,
+        max_keepalive_connections: int,
+        timeout_seconds: float,
+    ) -> LLMProvider:
+    """
+    - **name**: One of PROVIDERS.
+    - **Raises**: ValueError for unknown providers.
+    """
+    if name == "azure":
+        return AzureOpenAIProvider(max_connections, max_keepalive_connections, timeout_seconds)
+    if name == "fake":
+        return FakeLLMProvider()
+    raise ValueError(f"Unknown LLM provider: {name}")
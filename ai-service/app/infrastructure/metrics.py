@@ -0,0 +1,94 @@
+import threading
+from collections import deque
+from typing import Callable, Dict
+
+
+class Counter:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def snapshot(self) -> float:
+        return self._value
+
+
+class Histogram:
+    """
+    Keeps running count/sum plus a bounded window of recent observations
+    for percentile estimates.
+    """
+    def __init__(self, window: int = 2048):
+        self._values = deque(maxlen=window)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._values.append(value)
+            self._count += 1
+            self._sum += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            values = sorted(self._values)
+            count, total = self._count, self._sum
+        if not values:
+            return {"count": count, "sum": total}
+
+        def percentile(q: float) -> float:
+            return values[min(len(values) - 1, int(q * len(values)))]
+
+        return {
+            "count": count,
+            "sum": round(total, 3),
+            "mean": round(total / count, 3),
+            "p50": round(percentile(0.50), 3),
+            "p90": round(percentile(0.90), 3),
+            "p99": round(percentile(0.99), 3),
+            "max": round(values[-1], 3),
+        }
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics registry, exposed as JSON on `/metrics`.
+    """
+    def __init__(self):
+        self._counters: Dict[str, Counter] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str) -> Counter:
+        with self._lock:
+            return self._counters.setdefault(name, Counter())
+
+    def histogram(self, name: str) -> Histogram:
+        with self._lock:
+            return self._histograms.setdefault(name, Histogram())
+
+    def gauge(self, name: str, read: Callable[[], float]) -> None:
+        """
+        Register a value computed at snapshot time (e.g. a hit rate).
+        """
+        with self._lock:
+            self._gauges[name] = read
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = dict(self._histograms)
+            gauges = dict(self._gauges)
+        return {
+            "counters": {name: c.snapshot() for name, c in sorted(counters.items())},
+            "gauges": {name: read() for name, read in sorted(gauges.items())},
+            "histograms": {name: h.snapshot() for name, h in sorted(histograms.items())},
+        }
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Continuously refilling bucket; `capacity` units per minute.
+    The level may go negative when a caller is charged more than it reserved.
+    """
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self._rate = self.capacity / 60.0
+        self._level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self._level >= amount else (amount - self._level) / self._rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self._level -= amount
+
+    def give(self, amount: float) -> None:
+        self._refill()
+        self._level = min(self.capacity, self._level + amount)
+
+
+class LLMRateLimiter:
+    """
+    Client-side limiter matched to a deployment's requests-per-minute and
+    tokens-per-minute quota, so we queue locally instead of collecting 429s.
+    Callers reserve an estimate up front and settle with the actual usage.
+    A zero quota disables that bucket.
+    """
+    def __init__(self, rpm: int = 0, tpm: int = 0):
+        self._requests = TokenBucket(rpm) if rpm > 0 else None
+        self._tokens = TokenBucket(tpm) if tpm > 0 else None
+        self._paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def pause(self, seconds: float) -> None:
+        """
+        Hold every caller for `seconds`, e.g. after a 429 with Retry-After.
+        """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, tokens: int) -> float:
+        """
+        Wait until both quotas allow one request of `tokens` tokens.
+        - **Returns**: Seconds spent waiting.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        started = time.monotonic()
+        # Kilit sırayı korur: bekleyen büyük istekler küçükler tarafından aç bırakılmaz
+        async with self._lock:
+            while True:
+                wait = max(
+                    self._paused_until - time.monotonic(),
+                    self._requests.wait_time(1) if self._requests else 0.0,
+                    self._tokens.wait_time(tokens) if self._tokens else 0.0,
+                )
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self._requests:
+                self._requests.take(1)
+            if self._tokens:
+                self._tokens.take(tokens)
+        return time.monotonic() - started
+
+    def settle(self, reserved: int, used: int) -> None:
+        """
+        Correct a reservation once the actual token usage is known.
+        """
+        if self._tokens is None:
+            return
+        if used < reserved:
+            self._tokens.give(reserved - used)
+        else:
+            self._tokens.take(used - reserved)
@@ -1,9 +1,10 @@
-from fastapi import Depends, HTTPException, Request, status
+from fastapi import Depends, Header, HTTPException, Request, status
+import hmac
 import requests
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 bearer_scheme = HTTPBearer()
 AUTH_SERVICE_URL = "http://auth-service:8000"
@@ -47,4 +48,17 @@ def get_current_user_jwt(credentials: HTTPAuthorizationCredentials = Depends(bea
     except JWTError:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
     except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Authentication error: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=401, detail=f"Authentication error: {str(e)}") 
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def require_admin_token(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """
+    Guards operational endpoints with the shared ADMIN_TOKEN.
+    The admin API is disabled when ADMIN_TOKEN is not set.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    # Bayt olarak karşılaştırılır: ASCII dışı bir başlık TypeError (500) yerine 401 alır
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
@@ -0,0 +1,43 @@
+import os
+import threading
+from typing import List
+
+# o-serisi ve gpt-4o modellerinin kodlaması; build sırasında TIKTOKEN_CACHE_DIR'e indirilir
+LLM_TOKENIZER_ENCODING = os.getenv("LLM_TOKENIZER_ENCODING", "o200k_base")
+
+# Chat formatında her mesajın rol/ayraç maliyeti ve yanıtın başlangıç token'ları
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(LLM_TOKENIZER_ENCODING)
+                except Exception as e:
+                    print(f"Tokenizer {LLM_TOKENIZER_ENCODING} unavailable, estimating tokens from length: {e}")
+                _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        # ~4 karakter/token; Türkçe metinlerde biraz fazla tahmin eder, bütçe için güvenli taraf
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: List[dict]) -> int:
+    """
+    Prompt tokens of chat messages in OpenAI format.
+    """
+    return sum(count_tokens(message.get("content") or "") + TOKENS_PER_MESSAGE for message in messages) + TOKENS_PER_REPLY
@@ -1,8 +1,14 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers.xray_scan_evaluation_router import xray_scan_evaluation_router
 from app.routers.openai_router import openai_router
+from app.routers.admin_router import admin_router
 from app.db.base import init_db
+from app.infrastructure.metrics import metrics
+from app.repositories.xray_scan_evaluation_repository import XRayScanEvaluationRepository
+from app.repositories.openai_repository import OpenAIRepository
 
 app = FastAPI(
     title="Xcardia AI Service",
@@ -19,13 +25,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+async def warm_up_model():
+    evaluater = XRayScanEvaluationRepository()
+    try:
+        await evaluater.warm_up()
+    except Exception as e:
+        print(f"Model warm-up failed: {e}")
+        evaluater.startup_report = {"status": "failed", "error": str(e)}
+
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     init_db()
+    # Model arka planda yüklenir; bitene kadar /ready 503 döner
+    app.state.warm_up_task = asyncio.create_task(warm_up_model())
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await XRayScanEvaluationRepository().shutdown()
+    await OpenAIRepository().close()
 
 app.include_router(xray_scan_evaluation_router)
 app.include_router(openai_router)
+app.include_router(admin_router)
 
 @app.get("/")
 async def root():
-    return {"message": "Welcome to the Xcardia AI Service!"} 
\ No newline at end of file
+    return {"message": "Welcome to the Xcardia AI Service!"}
+
+@app.get("/ready")
+async def ready():
+    evaluater = XRayScanEvaluationRepository()
+    status_code = 200 if evaluater.is_ready else 503
+    return JSONResponse(content=evaluater.startup_report, status_code=status_code)
+
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot() 
\ No newline at end of file
@@ -0,0 +1,233 @@
+import asyncio
+import os
+from typing import List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.db.base import SessionLocal
+from app.db.models.chat_summary_model import ChatSummaryModel
+from app.db.models.message_model import MessageModel
+from app.infrastructure.metrics import metrics
+from app.infrastructure.tokens import TOKENS_PER_MESSAGE, TOKENS_PER_REPLY, count_message_tokens, count_tokens
+from app.repositories.openai_repository import OpenAIRepository
+from app.repositories.prompt_template_repository import PromptTemplateRepository
+from app.schemes.message_schemes import ChatToSend, MessageToSend, RoleEnum
+
+# Bir LLM çağrısında sistem mesajı + özet + geçmiş + yeni mesajlar için en fazla prompt token'ı
+LLM_CONTEXT_TOKEN_BUDGET = int(os.getenv("LLM_CONTEXT_TOKEN_BUDGET", "8000"))
+# Eski mesajlar özete katlanırken geçmiş bütçenin bu oranına kadar boşaltılır;
+# böylece her turda yeniden özetleme yapılmaz
+LLM_CONTEXT_FOLD_RATIO = float(os.getenv("LLM_CONTEXT_FOLD_RATIO", "0.5"))
+LLM_CONTEXT_SUMMARIES_ENABLED = os.getenv("LLM_CONTEXT_SUMMARIES_ENABLED", "true").lower() == "true"
+# Akıl yürüten modellerde bu sınır düşünme token'larını da kapsar
+LLM_SUMMARY_MAX_TOKENS = int(os.getenv("LLM_SUMMARY_MAX_TOKENS", "2000"))
+# Tek bir özetleme çağrısına verilecek en fazla mesaj token'ı
+LLM_SUMMARY_INPUT_TOKENS = int(os.getenv("LLM_SUMMARY_INPUT_TOKENS", "6000"))
+
+SUMMARY_PREFIX = "Sohbetin önceki kısmının özeti:\n"
+HISTORY_PAGE_SIZE = 50
+
+
+class ChatContextRepository:
+    """
+    Builds the messages sent to the LLM for a chat within a token budget:
+    the system prompt, a rolling summary of older turns and as many recent
+    turns as fit. Turns that no longer fit are folded into the summary in
+    the background, so prompt size stays flat as chats grow.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ChatContextRepository, cls).__new__(cls)
+            cls._instance._folding = set()
+            cls._instance._tasks = set()
+        return cls._instance
+
+    def __latest_system_message(self, db: Session, chat_id: str, user_id: str) -> List[MessageToSend]:
+        row = db.execute(
+            select(MessageModel.content)
+            .where(MessageModel.chat_id == chat_id, MessageModel.user_id == user_id, MessageModel.role == RoleEnum.system)
+            .order_by(MessageModel.id.desc())
+            .limit(1)
+        ).first()
+        if row is None:
+            return []
+        return [MessageToSend(role=RoleEnum.system, content=row.content, chat_id=chat_id, user_id=user_id)]
+
+    def __recent_turns(
+            self,
+            db: Session,
+            chat_id: str,
+            user_id: str,
+            after_id: int,
+            budget: int,
+        ) -> Tuple[List[Tuple[int, str, str, int]], bool]:
+        """
+        - **Returns**: The newest non-system messages after `after_id` that fit
+          in `budget` tokens, newest first, and whether older ones were left out.
+        """
+        turns = []
+        used = 0
+        before_id = None
+        while True:
+            query = select(MessageModel.id, MessageModel.role, MessageModel.content).where(
+                MessageModel.chat_id == chat_id,
+                MessageModel.user_id == user_id,
+                MessageModel.role != RoleEnum.system,
+                MessageModel.id > after_id,
+            )
+            if before_id is not None:
+                query = query.where(MessageModel.id < before_id)
+            rows = db.execute(query.order_by(MessageModel.id.desc()).limit(HISTORY_PAGE_SIZE)).all()
+            for id, role, content in rows:
+                tokens = count_tokens(content) + TOKENS_PER_MESSAGE
+                # En yeni mesaj (genellikle kullanıcının sorusu) bütçeyi aşsa da gönderilir
+                if turns and used + tokens > budget:
+                    return turns, True
+                used += tokens
+                turns.append((id, role, content, tokens))
+            if len(rows) < HISTORY_PAGE_SIZE:
+                return turns, False
+            before_id = rows[-1].id
+
+    async def build_context(
+            self,
+            db: Session,
+            chat_id: str,
+            user_id: str,
+            system_messages: Optional[List[MessageToSend]] = None,
+            reserve_tokens: int = 0,
+            pending_messages: Optional[List[MessageToSend]] = None,
+        ) -> ChatToSend:
+        """
+        Build the LLM context of a stored chat.
+        - **system_messages**: System prompt to keep; the chat's latest stored system message by default.
+        - **reserve_tokens**: Budget kept free for messages the caller appends.
+        - **pending_messages**: New messages not stored yet; always sent, after the history.
+        - **Returns**: The system messages, the rolling summary (if any) and the most recent turns that fit, oldest first.
+        """
+        pending_messages = pending_messages or []
+        if pending_messages:
+            reserve_tokens += count_message_tokens([message.to_llm_message() for message in pending_messages]) - TOKENS_PER_REPLY
+        if system_messages is None:
+            system_messages = self.__latest_system_message(db, chat_id, user_id)
+        messages = list(system_messages)
+
+        summary = db.get(ChatSummaryModel, (chat_id, user_id))
+        if summary is not None:
+            messages.append(MessageToSend(
+                role=RoleEnum.system, content=SUMMARY_PREFIX + summary.summary, chat_id=chat_id, user_id=user_id,
+            ))
+        fixed_tokens = count_message_tokens([message.to_llm_message() for message in messages])
+        history_budget = max(0, LLM_CONTEXT_TOKEN_BUDGET - fixed_tokens - reserve_tokens)
+
+        turns, truncated = self.__recent_turns(
+            db, chat_id, user_id, summary.covered_until_id if summary is not None else 0, history_budget,
+        )
+        messages.extend(
+            MessageToSend(role=RoleEnum(role), content=content, chat_id=chat_id, user_id=user_id)
+            for _, role, content, _ in reversed(turns)
+        )
+        messages.extend(pending_messages)
+
+        history_tokens = sum(tokens for *_, tokens in turns)
+        metrics.histogram("llm_context_tokens").observe(fixed_tokens + history_tokens + reserve_tokens - TOKENS_PER_REPLY)
+        if truncated:
+            metrics.counter("llm_context_truncated").inc()
+            if LLM_CONTEXT_SUMMARIES_ENABLED:
+                self.__schedule_fold(chat_id, user_id, self.__fold_until(turns, history_budget))
+        return ChatToSend(id=chat_id, user_id=user_id, messages=messages)
+
+    def __fold_until(self, turns: List[Tuple[int, str, str, int]], history_budget: int) -> int:
+        # En yeni mesajlar bütçenin FOLD_RATIO'suna kadar tutulur; daha eskileri özete katlanır
+        keep = history_budget * LLM_CONTEXT_FOLD_RATIO
+        used = 0
+        for index, (id, _, _, tokens) in enumerate(turns):
+            used += tokens
+            if used > keep:
+                # En yeni mesaj hiçbir zaman katlanmaz
+                return id if index > 0 else id - 1
+        return turns[-1][0] - 1
+
+    def __schedule_fold(self, chat_id: str, user_id: str, until_id: int) -> None:
+        key = (chat_id, user_id)
+        if key in self._folding:
+            return
+        self._folding.add(key)
+        task = asyncio.get_running_loop().create_task(self.fold(chat_id, user_id, until_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda _: self._folding.discard(key))
+
+    async def fold(self, chat_id: str, user_id: str, until_id: int) -> None:
+        """
+        Fold the chat's messages up to `until_id` into its rolling summary,
+        in chunks of at most LLM_SUMMARY_INPUT_TOKENS. Failures leave the
+        previous summary in place; the next build retries.
+        """
+        loop = asyncio.get_running_loop()
+        db = SessionLocal()
+        try:
+            summary = await loop.run_in_executor(None, db.get, ChatSummaryModel, (chat_id, user_id))
+            covered_until_id = summary.covered_until_id if summary is not None else 0
+            text = summary.summary if summary is not None else ""
+            folded = summary.folded_messages if summary is not None else 0
+            rows = await loop.run_in_executor(None, lambda: db.execute(
+                select(MessageModel.id, MessageModel.role, MessageModel.content)
+                .where(
+                    MessageModel.chat_id == chat_id,
+                    MessageModel.user_id == user_id,
+                    MessageModel.role != RoleEnum.system,
+                    MessageModel.id > covered_until_id,
+                    MessageModel.id <= until_id,
+                )
+                .order_by(MessageModel.id.asc())
+            ).all())
+
+            chunk, chunk_tokens = [], 0
+            for index, row in enumerate(rows):
+                chunk.append(row)
+                chunk_tokens += count_tokens(row.content) + TOKENS_PER_MESSAGE
+                if chunk_tokens < LLM_SUMMARY_INPUT_TOKENS and index < len(rows) - 1:
+                    continue
+                text = await self.__summarize(text, chunk)
+                folded += len(chunk)
+                await loop.run_in_executor(
+                    None, self.__save_summary, db, chat_id, user_id, text, chunk[-1].id, folded,
+                )
+                chunk, chunk_tokens = [], 0
+            metrics.counter("chat_summary_folds").inc()
+        except Exception as e:
+            print(f"Error folding chat {chat_id} into its summary: {e}")
+        finally:
+            db.close()
+
+    async def __summarize(self, summary: str, rows: list) -> str:
+        transcript = "\n".join(f"{row.role}: {row.content}" for row in rows)
+        messages = PromptTemplateRepository().get("chat_summary_prompt").render() + [{
+            "role": "user",
+            "content": f"Önceki özet:\n{summary or '-'}\n\nYeni mesajlar:\n{transcript}",
+        }]
+        response = await OpenAIRepository().create_completion(messages, max_completion_tokens=LLM_SUMMARY_MAX_TOKENS)
+        content = (response.choices[0].message.content or "").strip()
+        if not content:
+            raise ValueError("Empty summary returned")
+        return content
+
+    def __save_summary(self, db: Session, chat_id: str, user_id: str, text: str, covered_until_id: int, folded: int) -> None:
+        values = dict(
+            summary=text,
+            covered_until_id=covered_until_id,
+            summary_tokens=count_tokens(text),
+            folded_messages=folded,
+        )
+        stmt = insert(ChatSummaryModel).values(chat_id=chat_id, user_id=user_id, **values)
+        # Özet yalnızca ileri taşınır; eşzamanlı eski bir katlama yeni özeti ezmez
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["chat_id", "user_id"],
+            set_=dict(values, updated_at=func.now()),
+            where=ChatSummaryModel.covered_until_id < covered_until_id,
+        )
+        db.execute(stmt)
+        db.commit()
@@ -1,11 +1,55 @@
-from sqlalchemy import desc
-from sqlalchemy.dialects.postgresql import insert
+from typing import List
+from sqlalchemy import String, Text, bindparam, func, insert as core_insert, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
 from app.db.models.message_model import MessageModel
 from app.schemes.message_schemes import MessageToSend, MessageSent, RoleEnum
 from app.schemes.message_schemes import ChatToLoad, ChatToSend, ChatLoaded
 
+# Aynı sohbete eşzamanlı eklemelerde seq çakışması için deneme sayısı
+APPEND_RETRIES = 5
+
+messages_table = MessageModel.__table__
+# MessageSent alanları; ORM nesnesi yerine satır demetleri okunur
+HISTORY_COLUMNS = (
+    messages_table.c.id,
+    messages_table.c.user_id,
+    messages_table.c.chat_id,
+    messages_table.c.role,
+    messages_table.c.content,
+    messages_table.c.created_at,
+    messages_table.c.updated_at,
+)
+# Mesajlar dizi parametreleriyle gönderilir; SQL metni mesaj sayısından bağımsızdır ve bir kez derlenir
+new_messages = func.unnest(
+    bindparam("user_ids", type_=ARRAY(String)),
+    bindparam("roles", type_=ARRAY(String)),
+    bindparam("contents", type_=ARRAY(Text)),
+).table_valued("user_id", "role", "content", with_ordinality="ord").render_derived()
+last_seq = (
+    select(func.coalesce(func.max(messages_table.c.seq), 0))
+    .where(messages_table.c.chat_id == bindparam("chat_id"))
+    .scalar_subquery()
+)
+# postgresql.insert derleme önbelleğine girmez; sık çalışan ekleme için Core insert kullanılır
+APPEND_MESSAGES = core_insert(messages_table).from_select(
+    ["chat_id", "user_id", "role", "content", "seq"],
+    select(
+        bindparam("chat_id", type_=String),
+        new_messages.c.user_id, new_messages.c.role, new_messages.c.content,
+        last_seq + new_messages.c.ord,
+    ),
+).returning(*messages_table.c)
+INSERT_CHAT = insert(messages_table).from_select(
+    ["chat_id", "user_id", "role", "content", "seq"],
+    select(
+        bindparam("chat_id", type_=String),
+        new_messages.c.user_id, new_messages.c.role, new_messages.c.content,
+        new_messages.c.ord,
+    ),
+).on_conflict_do_nothing(index_elements=["chat_id", "seq"]).returning(*messages_table.c)
 
 
 class ChatRepository:
@@ -16,6 +60,52 @@ class ChatRepository:
             cls._instance = super(ChatRepository, cls).__new__(cls)
         return cls._instance
 
+    def __params(self, chat_id: str, messages: List[MessageToSend]) -> dict:
+        return {
+            "chat_id": chat_id,
+            "user_ids": [message.user_id for message in messages],
+            "roles": [message.role.value for message in messages],
+            "contents": [message.content for message in messages],
+        }
+
+    def __sent(self, rows) -> List[MessageSent]:
+        return [MessageSent.model_validate(dict(row)) for row in sorted(rows, key=lambda row: row["seq"])]
+
+    def append_messages(
+            self,
+            db: Session,
+            messages: List[MessageToSend],
+        ) -> List[MessageSent]:
+        """
+        Append messages to the end of their chat in one INSERT ... RETURNING
+        and one transaction. Sequence numbers continue from the chat's last
+        message; after a conflicting concurrent append to the same chat, the
+        insert is retried under a per-chat advisory lock.
+        - **db**: The database session.
+        - **messages**: Messages of a single chat, in order.
+        - **Returns**: The inserted messages.
+        """
+        chat_id = messages[0].chat_id
+        if any(message.chat_id != chat_id for message in messages):
+            raise ValueError("All messages must belong to the same chat")
+        params = self.__params(chat_id, messages)
+        for attempt in range(APPEND_RETRIES):
+            try:
+                if attempt > 0:
+                    # Çakışmadan sonra aynı sohbete yazanlar sıraya girer
+                    db.execute(select(func.pg_advisory_xact_lock(func.hashtext(chat_id))))
+                inserted = db.execute(APPEND_MESSAGES, params).mappings().all()
+                db.commit()
+                return self.__sent(inserted)
+            except IntegrityError:
+                # Aynı sohbete eşzamanlı ekleme aynı seq'i aldı; son seq yeniden okunur
+                db.rollback()
+                if attempt == APPEND_RETRIES - 1:
+                    raise
+            except Exception:
+                db.rollback()
+                raise
+
     def insert_message(
             self, 
             db: Session,
@@ -27,27 +117,7 @@ class ChatRepository:
         - **message**: The message object to be inserted.
         - **Returns**: The inserted message object.
         """
-        db_message = MessageModel(**message.model_dump())
-        db.add(db_message)
-        db.commit()
-        db.refresh(db_message)
-        return MessageSent.model_validate(db_message.to_dict())
-
-    def __insert_messages_if_not_exists(
-            self,
-            db: Session, 
-            messages: list[MessageModel],
-        ) -> None:
-        for msg in messages:
-            stmt = insert(MessageModel).values(
-                user_id=msg.user_id,
-                chat_id=msg.chat_id,
-                role=msg.role,
-                content=msg.content,
-            ).on_conflict_do_nothing()  # Ignore if conflict on unique constraint
-            db.execute(stmt)
-        db.commit()
-        return
+        return self.append_messages(db, [message])[0]
         
     def insert_chat(
             self, 
@@ -55,35 +125,35 @@ class ChatRepository:
             chat: ChatToSend,
         ) -> ChatLoaded:
         """
-        Insert a new chat into the database.
+        Insert a chat from its first message in one INSERT ... RETURNING.
+        Messages already stored at the same position (seq) are skipped, so
+        repeating the call does not duplicate them.
         - **db**: The database session.
         - **chat**: The chat object to be inserted.
-        - **Returns**: The inserted chat object.
+        - **Returns**: The stored chat.
+        - **Raises**: ValueError if the chat id belongs to another user.
         """
-        db_messages = [
-            MessageModel(**message.model_dump())
-            for message in chat.messages
-        ]
         try:
-            self.__insert_messages_if_not_exists(db, db_messages) 
-            refreshed_messages = db.query(MessageModel).filter(
-                MessageModel.chat_id == chat.id,
-                MessageModel.user_id == chat.user_id
-            ).order_by(MessageModel.id.asc()).all()
-            messagesSent = [
-                MessageSent.model_validate(m.to_dict()) 
-                for m in refreshed_messages
-            ]
-            return ChatLoaded(
-                id=chat.id,
-                user_id=chat.user_id,
-                created_at=messagesSent[0].created_at,
-                messages=messagesSent,
-            )
+            rows = db.execute(INSERT_CHAT, self.__params(chat.id, chat.messages)).mappings().all()
+            # seq'ler 1'den ardışık olduğundan çakışma yoksa sohbette yalnızca bu mesajlar vardır
+            if len(rows) < len(chat.messages):
+                rows = db.execute(
+                    select(*messages_table.c).where(messages_table.c.chat_id == chat.id)
+                ).mappings().all()
+                if any(row["user_id"] != chat.user_id for row in rows):
+                    raise ValueError(f"Chat {chat.id} belongs to another user")
+            db.commit()
         except Exception as e:
             db.rollback()
             print(f"Error inserting chat: {e}")
             raise e
+        messagesSent = self.__sent(rows)
+        return ChatLoaded(
+            id=chat.id,
+            user_id=chat.user_id,
+            created_at=messagesSent[0].created_at,
+            messages=messagesSent,
+        )
 
 
     def load_chat(
@@ -92,27 +162,44 @@ class ChatRepository:
             chat: ChatToLoad,
         ) -> ChatLoaded:
         """
-        Load a chat from the database.
+        Load a page of a chat's non-system messages from the database.
         - **db**: The database session.
-        - **chat**: The chat object to be loaded.
-        - **Returns**: The loaded chat object.
+        - **chat**: The chat to load; `before_id` / `after_id` select the page.
+        - **Returns**: Up to `message_count_limit` messages, oldest first: the most
+          recent ones, the ones right before `before_id`, or with `after_id` the
+          ones right after it. `has_more` tells whether the page was cut short.
         """
         limit = chat.message_count_limit
         if limit < 0:
             limit = 1000000
-        db_messages = db.query(MessageModel).filter(
-            MessageModel.chat_id == chat.id,
-            MessageModel.user_id == chat.user_id,
-            MessageModel.role != RoleEnum.system,
-        ).order_by(MessageModel.id.asc()).limit(limit).all()
-        messagesLoaded = [
-            MessageSent.model_validate(m.to_dict()) for m in db_messages
-        ]
+        query = select(*HISTORY_COLUMNS).where(
+            messages_table.c.chat_id == chat.id,
+            messages_table.c.user_id == chat.user_id,
+            messages_table.c.role != RoleEnum.system.value,
+        )
+        if chat.before_id is not None:
+            query = query.where(messages_table.c.id < chat.before_id)
+        if chat.after_id is not None:
+            query = query.where(messages_table.c.id > chat.after_id)
+        # (chat_id, user_id, id) indeksi sırayla taranır; bir fazlası sonraki sayfayı gösterir
+        if chat.after_id is not None:
+            rows = db.execute(query.order_by(messages_table.c.id.asc()).limit(limit + 1)).all()
+        else:
+            # Limit en yeni mesajlara uygulanır, sonuç eskiden yeniye sıralanır
+            rows = db.execute(query.order_by(messages_table.c.id.desc()).limit(limit + 1)).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if chat.after_id is None:
+            rows.reverse()
+        messagesLoaded = [MessageSent.model_validate(row, from_attributes=True) for row in rows]
         return ChatLoaded(
             id=chat.id,
             user_id=chat.user_id,
             messages=messagesLoaded,
             message_count_limit=chat.message_count_limit,
+            before_id=chat.before_id,
+            after_id=chat.after_id,
+            has_more=has_more,
         )
 
     def load_chat_by_message(
@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional, Tuple
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from app.db.base import SessionLocal
+from app.db.models.llm_interpretation_cache_model import LLMInterpretationCacheModel
+from app.infrastructure.metrics import metrics
+
+# İsteğe bağlı: aynı değerlendirme + aynı ilk soru için LLM yorumu tekrar üretilmez
+LLM_INTERPRETATION_CACHE_ENABLED = os.getenv("LLM_INTERPRETATION_CACHE_ENABLED", "false").lower() == "true"
+LLM_INTERPRETATION_CACHE_SIZE = int(os.getenv("LLM_INTERPRETATION_CACHE_SIZE", "512"))
+LLM_INTERPRETATION_CACHE_TTL_SECONDS = int(os.getenv("LLM_INTERPRETATION_CACHE_TTL_SECONDS", "86400"))
+# Olasılıklar bu kadar ondalığa yuvarlanarak anahtara girer
+LLM_INTERPRETATION_CACHE_DECIMALS = int(os.getenv("LLM_INTERPRETATION_CACHE_DECIMALS", "2"))
+# Tasarruf metriği için 1M token başına fiyat (USD); 0 ise maliyet hesaplanmaz
+LLM_PROMPT_COST_PER_1M_TOKENS = float(os.getenv("LLM_PROMPT_COST_PER_1M_TOKENS", "0"))
+LLM_COMPLETION_COST_PER_1M_TOKENS = float(os.getenv("LLM_COMPLETION_COST_PER_1M_TOKENS", "0"))
+
+# Süresi dolan satırlar en fazla bu aralıkla silinir
+PURGE_INTERVAL_SECONDS = 3600
+
+# (content, prompt_tokens, completion_tokens, latency_ms, expires_at)
+Entry = Tuple[str, int, int, float, float]
+
+
+def normalize_message(content: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", content)).strip().casefold()
+
+
+def round_probabilities(value):
+    # İç içe değerlendirmelerdeki (ör. "pathologies") olasılıklar da yuvarlanır
+    if isinstance(value, dict):
+        return {name: round_probabilities(item) for name, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [round_probabilities(item) for item in value]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return round(float(value), LLM_INTERPRETATION_CACHE_DECIMALS)
+    return value
+
+
+class LLMInterpretationCacheRepository:
+    """
+    Exact-match cache of first X-ray interpretations: an in-process LRU in
+    front of the `llm_interpretation_cache` table, with a TTL. Concurrent
+    requests for the same key share a single completion.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(LLMInterpretationCacheRepository, cls).__new__(cls)
+            cls._instance._entries = OrderedDict()
+            cls._instance._lock = threading.Lock()
+            cls._instance._inflight = {}
+            cls._instance._purged_at = 0.0
+            metrics.gauge("llm_interpretation_cache_hit_rate", cls._instance.hit_rate)
+            metrics.gauge("llm_interpretation_cache_entries", lambda: len(cls._instance._entries))
+        return cls._instance
+
+    @staticmethod
+    def make_key(template_version: str, xray_scan_evaluation: dict, first_message: str, deployment: str) -> str:
+        evaluation = round_probabilities(xray_scan_evaluation)
+        canonical = json.dumps(
+            {
+                "template": template_version,
+                "evaluation": evaluation,
+                "message": normalize_message(first_message),
+                "deployment": deployment or "",
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def hit_rate(self) -> float:
+        hits = sum(
+            metrics.counter(name).snapshot()
+            for name in ("llm_interpretation_cache_memory_hits", "llm_interpretation_cache_db_hits", "llm_interpretation_cache_coalesced")
+        )
+        total = hits + metrics.counter("llm_interpretation_cache_misses").snapshot()
+        return round(hits / total, 4) if total else 0.0
+
+    def _get_memory(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[4] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put_memory(self, key: str, entry: Entry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > LLM_INTERPRETATION_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def _get_db(self, key: str) -> Optional[Entry]:
+        try:
+            db = SessionLocal()
+            try:
+                row = db.get(LLMInterpretationCacheModel, key)
+                if row is None or row.expires_at <= datetime.now(timezone.utc):
+                    return None
+                return (row.content, row.prompt_tokens, row.completion_tokens, row.latency_ms, row.expires_at.timestamp())
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"Error reading LLM interpretation cache: {e}")
+            return None
+
+    def _put_db(self, key: str, template_version: str, deployment: str, entry: Entry) -> None:
+        content, prompt_tokens, completion_tokens, latency_ms, expires_at = entry
+        try:
+            db = SessionLocal()
+            try:
+                values = dict(
+                    content=content,
+                    prompt_tokens=prompt_tokens,
+                    completion_tokens=completion_tokens,
+                    latency_ms=latency_ms,
+                    expires_at=datetime.fromtimestamp(expires_at, timezone.utc),
+                )
+                stmt = insert(LLMInterpretationCacheModel).values(
+                    cache_key=key, template_version=template_version, deployment=deployment or "", **values,
+                )
+                # Süresi dolmuş bir satırın yerine yenisi yazılır
+                db.execute(stmt.on_conflict_do_update(index_elements=["cache_key"], set_=values))
+                if time.monotonic() - self._purged_at > PURGE_INTERVAL_SECONDS:
+                    self._purged_at = time.monotonic()
+                    db.execute(delete(LLMInterpretationCacheModel).where(
+                        LLMInterpretationCacheModel.expires_at < datetime.now(timezone.utc)
+                    ))
+                db.commit()
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"Error writing LLM interpretation cache: {e}")
+
+    def _record_hit(self, counter: str, entry: Entry) -> None:
+        _, prompt_tokens, completion_tokens, latency_ms, _ = entry
+        metrics.counter(counter).inc()
+        metrics.counter("llm_interpretation_cache_saved_ms").inc(latency_ms)
+        metrics.counter("llm_interpretation_cache_saved_prompt_tokens").inc(prompt_tokens)
+        metrics.counter("llm_interpretation_cache_saved_completion_tokens").inc(completion_tokens)
+        metrics.counter("llm_interpretation_cache_saved_cost_usd").inc(
+            (prompt_tokens * LLM_PROMPT_COST_PER_1M_TOKENS + completion_tokens * LLM_COMPLETION_COST_PER_1M_TOKENS) / 1_000_000
+        )
+
+    async def get_or_compute(
+            self,
+            key: str,
+            template_version: str,
+            deployment: str,
+            compute: Callable[[], Awaitable[Tuple[str, int, int]]],
+        ) -> str:
+        """
+        Return the cached interpretation for `key` or run `compute` once,
+        sharing its result with concurrent callers for the same key. If the
+        caller running `compute` is cancelled, one of the waiting callers
+        takes over. Failed completions are never cached.
+        - **key**: Result of `make_key`.
+        - **compute**: Coroutine factory returning (content, prompt_tokens, completion_tokens).
+        - **Returns**: The interpretation text.
+        """
+        if not LLM_INTERPRETATION_CACHE_ENABLED:
+            content, _, _ = await compute()
+            return content
+
+        while True:
+            entry = self._get_memory(key)
+            if entry is not None:
+                self._record_hit("llm_interpretation_cache_memory_hits", entry)
+                return entry[0]
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            try:
+                entry = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Yorumu üreten istek iptal edildiyse bekleyenlerden biri üretimi devralır
+                if inflight.cancelled():
+                    continue
+                raise
+            self._record_hit("llm_interpretation_cache_coalesced", entry)
+            return entry[0]
+
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            entry = await loop.run_in_executor(None, self._get_db, key)
+            if entry is not None:
+                self._record_hit("llm_interpretation_cache_db_hits", entry)
+            else:
+                metrics.counter("llm_interpretation_cache_misses").inc()
+                started = time.perf_counter()
+                content, prompt_tokens, completion_tokens = await compute()
+                entry = (
+                    content,
+                    prompt_tokens,
+                    completion_tokens,
+                    (time.perf_counter() - started) * 1000,
+                    time.time() + LLM_INTERPRETATION_CACHE_TTL_SECONDS,
+                )
+                # Yazma isteğin yolunu yavaşlatmasın
+                loop.run_in_executor(None, self._put_db, key, template_version, deployment, entry)
+            self._put_memory(key, entry)
+            future.set_result(entry)
+            return entry[0]
+        except Exception as e:
+            future.set_exception(e)
+            # Bekleyen yoksa "exception was never retrieved" uyarısını önle
+            future.exception()
+            raise
+        except BaseException:
+            # İptal bekleyenlere iletilmez; bekleyenler üretimi yeniden dener
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(key, None)
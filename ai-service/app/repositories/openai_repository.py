@@ -1,84 +1,186 @@
 import os
 import json
+import asyncio
+import random
+import time
+import email.utils
 import requests
-from typing import Union, List
+from typing import AsyncIterator, Union, List, Optional
+import httpx
 import openai
 from datetime import datetime, timezone
 
 from app.schemes.message_schemes import MessageToSend, ChatToSend, RoleEnum
+from app.infrastructure.llm_providers import LLM_PROVIDER, LLMProvider, LLMUnavailableError, create_provider
+from app.infrastructure.metrics import metrics
+from app.infrastructure.rate_limiter import LLMRateLimiter
+from app.infrastructure.tokens import count_message_tokens, count_tokens
+from app.repositories.llm_interpretation_cache_repository import LLMInterpretationCacheRepository
+from app.repositories.prompt_template_repository import PromptTemplateRepository
 
 # Load environment variables from .env file
 from dotenv import load_dotenv
 load_dotenv()
 
+# Süreç başına tek bir istemci ve bağlantı havuzu kullanılır
+AZURE_OPENAI_MAX_CONNECTIONS = int(os.getenv("AZURE_OPENAI_MAX_CONNECTIONS", "20"))
+AZURE_OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AZURE_OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+AZURE_OPENAI_TIMEOUT_SECONDS = float(os.getenv("AZURE_OPENAI_TIMEOUT_SECONDS", "120"))
+# 429, 5xx ve bağlantı hatalarında üstel geri çekilme ile yeniden deneme
+AZURE_OPENAI_MAX_RETRIES = int(os.getenv("AZURE_OPENAI_MAX_RETRIES", "4"))
+AZURE_OPENAI_BACKOFF_BASE_SECONDS = float(os.getenv("AZURE_OPENAI_BACKOFF_BASE_SECONDS", "0.5"))
+AZURE_OPENAI_BACKOFF_MAX_SECONDS = float(os.getenv("AZURE_OPENAI_BACKOFF_MAX_SECONDS", "30"))
+# Deployment kotası (dakikada istek / token); 0 ise istemci tarafı sınır uygulanmaz
+AZURE_OPENAI_RPM = int(os.getenv("AZURE_OPENAI_RPM", "0"))
+AZURE_OPENAI_TPM = int(os.getenv("AZURE_OPENAI_TPM", "0"))
+
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+
+
+def retry_after_seconds(response: Optional[httpx.Response]) -> Optional[float]:
+    """
+    - **Returns**: The delay the server asked for via `retry-after-ms` or `Retry-After`, if any.
+    """
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            value = headers["retry-after"]
+            try:
+                return float(value)
+            except ValueError:
+                retry_at = email.utils.parsedate_to_datetime(value)
+                return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
 class OpenAIRepository:
     _instance = None
-    _openAI_client: Union[openai.AzureOpenAI, None] = None
-    _openAI_deployment: Union[str, None] = None
-    _openAI_api_key: Union[str, None] = None
+    _provider: Union[LLMProvider, None] = None
+    _rate_limiter: Union[LLMRateLimiter, None] = None
     _openAI_organization: Union[str, None] = None
     _openAI_api_version: Union[str, None] = None
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(OpenAIRepository, cls).__new__(cls)
-            cls._instance._openAI_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-            cls._instance._openAI_api_key = os.getenv("AZURE_OPENAI_API_KEY")
+            cls._instance._provider = create_provider(
+                LLM_PROVIDER,
+                max_connections=AZURE_OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=AZURE_OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                timeout_seconds=AZURE_OPENAI_TIMEOUT_SECONDS,
+            )
             cls._instance._openAI_organization = os.getenv("AZURE_OPENAI_ORGANIZATION")
+            cls._instance._rate_limiter = LLMRateLimiter(rpm=AZURE_OPENAI_RPM, tpm=AZURE_OPENAI_TPM)
+            metrics.gauge("llm_prompt_cache_hit_rate", cls._instance.prompt_cache_hit_rate)
         return cls._instance
 
-    def __get_new_client(self):
-        return openai.AzureOpenAI(
-                api_key=self._openAI_api_key,
-                api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
-                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-            )
+    def prompt_cache_hit_rate(self) -> float:
+        prompt_tokens = metrics.counter("llm_prompt_tokens").snapshot()
+        cached_tokens = metrics.counter("llm_cached_prompt_tokens").snapshot()
+        return round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0
+
+    def __record_usage(self, usage) -> None:
+        metrics.counter("llm_prompt_tokens").inc(usage.prompt_tokens)
+        metrics.counter("llm_completion_tokens").inc(usage.completion_tokens)
+        # Sağlayıcı tarafı prompt önbelleğinden gelen token'lar
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+        metrics.counter("llm_cached_prompt_tokens").inc(cached_tokens)
+        if usage.prompt_tokens:
+            metrics.histogram("llm_cached_token_ratio").observe(cached_tokens / usage.prompt_tokens)
+
+    async def close(self) -> None:
+        await self._provider.close()
+
+    def __backoff_seconds(self, attempt: int, error: Exception) -> float:
+        retry_after = retry_after_seconds(getattr(error, "response", None))
+        if retry_after is not None:
+            return min(retry_after, AZURE_OPENAI_BACKOFF_MAX_SECONDS)
+        # Full jitter: eşzamanlı istemciler aynı anda tekrar denemesin
+        return random.uniform(0, min(AZURE_OPENAI_BACKOFF_MAX_SECONDS, AZURE_OPENAI_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+    async def create_completion(self, messages: List[dict], max_completion_tokens: int, **kwargs):
+        """
+        Run a chat completion on the configured provider (LLM_PROVIDER), within
+        the deployment's rate limits, retrying rate-limited, failed and timed-out calls.
+        - **messages**: Chat messages in OpenAI format.
+        - **Returns**: The chat completion response.
+        - **Raises**: LLMUnavailableError once retries are exhausted, or any non-retryable error.
+        """
+        reserved = count_message_tokens(messages) + max_completion_tokens
+        for attempt in range(AZURE_OPENAI_MAX_RETRIES + 1):
+            waited = await self._rate_limiter.acquire(reserved)
+            metrics.histogram("llm_limiter_wait_ms").observe(waited * 1000)
+            started = time.perf_counter()
+            try:
+                response = await self._provider.complete(messages, max_completion_tokens, **kwargs)
+            except (openai.APIConnectionError, openai.APIStatusError) as e:
+                # Reddedilen istek kotadan düşmez
+                self._rate_limiter.settle(reserved, 0)
+                status_code = getattr(e, "status_code", None)
+                retryable = status_code is None or status_code in RETRYABLE_STATUS_CODES
+                if not retryable:
+                    metrics.counter("llm_errors").inc()
+                    raise
+                if attempt == AZURE_OPENAI_MAX_RETRIES:
+                    metrics.counter("llm_errors").inc()
+                    raise LLMUnavailableError(
+                        f"LLM provider {self._provider.name} unavailable after {attempt + 1} attempts: {e}"
+                    ) from e
+                delay = self.__backoff_seconds(attempt, e)
+                if status_code == 429:
+                    metrics.counter("llm_rate_limited").inc()
+                    self._rate_limiter.pause(delay)
+                metrics.counter("llm_retries").inc()
+                print(f"LLM call failed ({status_code or type(e).__name__}), retrying in {delay:.2f} s")
+                await asyncio.sleep(delay)
+                continue
+
+            metrics.counter("llm_requests").inc()
+            if kwargs.get("stream"):
+                # Kullanım ve süreler akış tüketilirken kaydedilir
+                return response
+            metrics.histogram("llm_completion_ms").observe((time.perf_counter() - started) * 1000)
+            if response.usage is not None:
+                self.__record_usage(response.usage)
+                self._rate_limiter.settle(reserved, response.usage.total_tokens)
+            return response
     
     def __load_azure_demo_chat(self) -> List:
         """
-        Load the Azure OpenAI demo chat messages from a JSON file.
+        Load the Azure OpenAI demo chat messages from the prompt template registry.
         - **Returns**: A list of messages for the chat completion.
         """
-        b = os.path.dirname(os.path.abspath(__file__))
-        demo_chat_file_name = "azure_openai_demo_chat.json"
-        file_path = os.path.join(b, "..", "data", demo_chat_file_name)
-        with open(file_path, 'r') as file:
-            messages = json.load(file)
-        return messages
+        return PromptTemplateRepository().get("azure_openai_demo_chat").render()
     
-    def get_azure_demo_prediction(self) -> str:
+    async def get_azure_demo_prediction(self) -> str:
         """
         Get a demo prediction from Azure OpenAI.
         - **Returns**: A string response from the OpenAI model.
         """
-        client = self.__get_new_client()
         messages=self.__load_azure_demo_chat()
-        response = client.chat.completions.create(
-            messages=messages,
-            max_completion_tokens=250,
-            model=os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-3.5-turbo"),
-        )
+        response = await self.create_completion(messages, max_completion_tokens=250)
         return response.choices[0].message.content.strip()
     
-    def __load_initial_chat_with_assistant(self, file_name: str) -> List:
+    def __load_initial_chat_with_assistant(self, template_name: str) -> List:
         """
-        Load the initial chat with the base assistant from a JSON file.
-        - **Returns**: A ChatLoaded object with the initial chat data.
+        Load an initial chat from the prompt template registry.
+        - **Returns**: A copy of the template's messages.
         """
-        b = os.path.dirname(os.path.abspath(__file__))
-        file_path = os.path.join(b, "..", "data", file_name)
-        chat_data = []
-        with open(file_path, 'r', encoding='utf-8') as file:
-            chat_data = json.load(file)
-        return chat_data
+        return PromptTemplateRepository().get(template_name).render()
  
     def __load_initial_chat_with_base_assistant(self) -> List:
         """
         Load the initial chat with the base assistant from a JSON file.
         - **Returns**: A ChatLoaded object with the initial chat data.
         """
-        initial_chat_file_name = "initial_chat_with_base_assistant.json"
-        return self.__load_initial_chat_with_assistant(initial_chat_file_name)
+        return self.__load_initial_chat_with_assistant("initial_chat_with_base_assistant")
     
     def __expand_initial_messages_with_user(
             self, 
@@ -121,7 +223,7 @@ class OpenAIRepository:
         new_chat.append(first_message_from_user)
         return new_chat
 
-    def get_chat_completion(
+    async def get_chat_completion(
             self, 
             chat: ChatToSend,
         ) -> MessageToSend:
@@ -130,12 +232,7 @@ class OpenAIRepository:
         - **chat**: The chat object to be sent to the OpenAI model.
         - **Returns**: A JSON response with the chat result.
         """
-        client = self.__get_new_client()
-        response = client.chat.completions.create(
-            messages=chat.to_llm_chat(),
-            max_completion_tokens=5000,
-            model=os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-3.5-turbo"),
-        )
+        response = await self.create_completion(chat.to_llm_chat(), max_completion_tokens=5000)
         return MessageToSend(
             role=response.choices[0].message.role,
             content=response.choices[0].message.content.strip(),
@@ -143,30 +240,134 @@ class OpenAIRepository:
             user_id=chat.user_id,
         )
     
+    async def stream_chat_completion(
+            self,
+            chat: ChatToSend,
+        ) -> AsyncIterator[str]:
+        """
+        Stream a chat completion from the OpenAI model as content deltas.
+        Closing the iterator early (e.g. the client disconnected) closes the
+        upstream HTTP response, which cancels the generation.
+        - **chat**: The chat object to be sent to the OpenAI model.
+        - **Returns**: An async iterator of content fragments.
+        """
+        messages = chat.to_llm_chat()
+        max_completion_tokens = 5000
+        prompt_tokens = count_message_tokens(messages)
+        started = time.perf_counter()
+        stream = await self.create_completion(
+            messages,
+            max_completion_tokens=max_completion_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        first_token = True
+        used_tokens = None
+        completion = []
+        try:
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    self.__record_usage(chunk.usage)
+                    used_tokens = chunk.usage.total_tokens
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                if first_token:
+                    first_token = False
+                    metrics.histogram("llm_ttft_ms").observe((time.perf_counter() - started) * 1000)
+                completion.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+            metrics.histogram("llm_completion_ms").observe((time.perf_counter() - started) * 1000)
+        finally:
+            # Kullanım parçası gelmeden kapanan akışta (ör. istemci koptuğunda) harcama üretilen metinden tahmin edilir
+            if used_tokens is None:
+                used_tokens = prompt_tokens + count_tokens("".join(completion))
+            self._rate_limiter.settle(prompt_tokens + max_completion_tokens, used_tokens)
+            await stream.close()
+
     def __load_initial_chat_with_xray_assistant(self) -> List:
         """
         Load the initial chat with the base assistant from a JSON file.
         - **Returns**: A ChatLoaded object with the initial chat data.
         """
-        initial_chat_file_name = "initial_chat_with_xray_assistant.json"
-        return self.__load_initial_chat_with_assistant(initial_chat_file_name)
+        return self.__load_initial_chat_with_assistant("initial_chat_with_xray_assistant")
+
+    def __format_xray_scan_evaluation(self, xray_scan_evaluation: dict) -> str:
+        return json.dumps(xray_scan_evaluation, indent=4, sort_keys=True)
     
     def __get_initial_chat_with_xray_assistant(
             self, 
             xray_scan_evaluation: dict,
             first_message_from_user: MessageToSend,
         ) -> List:
+        # Sohbete kaydedilen biçim: sabit talimatlar + değerlendirme tek sistem mesajında
         initial_chat_messages = self.__load_initial_chat_with_xray_assistant()
         content = initial_chat_messages[0]["content"] 
-        content = content + "\n" + json.dumps(xray_scan_evaluation, indent=4)
+        content = content + "\n" + self.__format_xray_scan_evaluation(xray_scan_evaluation)
         initial_chat_messages[0]["content"] = content
         initial_chat_messages = self.__expand_initial_messages_with_user(
             initial_chat_messages,
             first_message_from_user,
         )
         return initial_chat_messages
+
+    def __get_xray_prompt(
+            self,
+            previous_chat: ChatToSend,
+            xray_scan_evaluation: dict,
+            first_message_from_user: MessageToSend,
+        ) -> ChatToSend:
+        # Sabit talimatlar en başta (her çağrıda aynı önek, sağlayıcı prompt önbelleği
+        # için), değişken veriler en sonda
+        instructions = self.__expand_initial_messages_with_user(
+            self.__load_initial_chat_with_xray_assistant(),
+            first_message_from_user,
+        )
+        evaluation = MessageToSend(
+            role=RoleEnum.system,
+            content=self.__format_xray_scan_evaluation(xray_scan_evaluation),
+            chat_id=first_message_from_user.chat_id,
+            user_id=first_message_from_user.user_id,
+        )
+        return ChatToSend(
+            id=previous_chat.id,
+            user_id=previous_chat.user_id,
+            messages=[MessageToSend(**msg) for msg in instructions]
+                + previous_chat.messages
+                + [evaluation, first_message_from_user],
+        )
  
-    def interpret_xray_scan_evaluation(
+    def xray_prompt_tokens(
+            self,
+            xray_scan_evaluation: dict,
+            first_message_from_user: MessageToSend,
+        ) -> int:
+        """
+        Prompt tokens `interpret_xray_scan_evaluation` adds around the previous chat.
+        """
+        empty_chat = ChatToSend(id=first_message_from_user.chat_id, user_id=first_message_from_user.user_id, messages=[])
+        prompt = self.__get_xray_prompt(empty_chat, xray_scan_evaluation, first_message_from_user)
+        return count_message_tokens(prompt.to_llm_chat())
+
+    async def __get_cached_interpretation(
+            self,
+            chat: ChatToSend,
+            xray_scan_evaluation: dict,
+            first_message_from_user: MessageToSend,
+        ) -> MessageToSend:
+        cache = LLMInterpretationCacheRepository()
+        template_version = PromptTemplateRepository().get("initial_chat_with_xray_assistant").version
+        key = cache.make_key(
+            template_version, xray_scan_evaluation, first_message_from_user.content, self._provider.deployment,
+        )
+
+        async def compute():
+            interpretation = await self.get_chat_completion(chat=chat)
+            return interpretation.content, count_message_tokens(chat.to_llm_chat()), count_tokens(interpretation.content)
+
+        content = await cache.get_or_compute(key, template_version, self._provider.deployment, compute)
+        return MessageToSend(role=RoleEnum.assistant, content=content, chat_id=chat.id, user_id=chat.user_id)
+
+    async def interpret_xray_scan_evaluation(
             self, 
             previous_chat: ChatToSend,
             xray_scan_evaluation: dict,
@@ -186,25 +387,25 @@ class OpenAIRepository:
             user_id=first_message_from_user.user_id,
             messages=[MessageToSend(**msg) for msg in initial_chat_messages],
         )
-        complete_chat = ChatToSend(
-            id=previous_chat.id,
-            user_id=previous_chat.user_id,
-            messages=previous_chat.messages + xray_assistant_chat.messages,
-        )
+        complete_chat = self.__get_xray_prompt(previous_chat, xray_scan_evaluation, first_message_from_user)
         xray_assistant_chat.append(first_message_from_user)
-        interpretation = self.get_chat_completion(chat=complete_chat)
+        if previous_chat.messages:
+            # Önceki mesajlar yanıtı etkiler; takip turları önbelleğe bakmaz
+            interpretation = await self.get_chat_completion(chat=complete_chat)
+        else:
+            interpretation = await self.__get_cached_interpretation(
+                complete_chat, xray_scan_evaluation, first_message_from_user,
+            )
         xray_assistant_chat.append(interpretation)
         return xray_assistant_chat
 
-    def send_message_to_chat(self, chat_data: dict) -> dict:
+    async def send_message_to_chat(self, chat_data: dict) -> dict:
         """
         Send a message to chat with encrypted user ID.
         - **chat_data**: Dictionary containing pseudo_user_id and messages.
         - **Returns**: A dictionary with LLM response.
         """
         try:
-            client = self.__get_new_client()
-            
             # Convert messages to OpenAI format
             messages = []
             for msg in chat_data.get("messages", []):
@@ -214,11 +415,7 @@ class OpenAIRepository:
                 })
             
             # Get LLM response
-            response = client.chat.completions.create(
-                messages=messages,
-                max_completion_tokens=1000,
-                model=os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-3.5-turbo"),
-            )
+            response = await self.create_completion(messages, max_completion_tokens=1000)
             
             return {
                 "response": response.choices[0].message.content.strip(),
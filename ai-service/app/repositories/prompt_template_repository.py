@@ -0,0 +1,99 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+# İstem şablonları (app/data/*.json); her biri OpenAI formatında mesaj listesidir
+PROMPT_TEMPLATES_DIR = os.getenv(
+    "PROMPT_TEMPLATES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+)
+# Dosya değişiklikleri en fazla bu aralıkla kontrol edilir; 0 ise yeniden yükleme kapalı
+PROMPT_TEMPLATES_RELOAD_SECONDS = float(os.getenv("PROMPT_TEMPLATES_RELOAD_SECONDS", "2"))
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    name: str
+    # İçeriğin sha256'sı; önbellek anahtarlarında ve loglarda kullanılır
+    version: str
+    messages: Tuple[dict, ...]
+    mtime: float
+
+    def render(self) -> List[dict]:
+        """
+        - **Returns**: A copy of the template's messages that callers may modify.
+        """
+        return copy.deepcopy(list(self.messages))
+
+
+class PromptTemplateRepository:
+    """
+    In-memory registry of the prompt templates in PROMPT_TEMPLATES_DIR.
+    Templates are parsed once and reloaded when their file changes; a file
+    that fails to parse keeps the previous version.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(PromptTemplateRepository, cls).__new__(cls)
+            cls._instance._templates = {}
+            cls._instance._checked_at = {}
+            cls._instance._lock = threading.Lock()
+        return cls._instance
+
+    def __path(self, name: str) -> str:
+        return os.path.join(PROMPT_TEMPLATES_DIR, f"{name}.json")
+
+    def __load(self, name: str) -> PromptTemplate:
+        path = self.__path(name)
+        mtime = os.path.getmtime(path)
+        with open(path, 'rb') as file:
+            raw = file.read()
+        messages = json.loads(raw.decode('utf-8'))
+        if not isinstance(messages, list) or not all("role" in m and "content" in m for m in messages):
+            raise ValueError(f"Prompt template {name} must be a list of messages with role and content")
+        return PromptTemplate(name, hashlib.sha256(raw).hexdigest()[:12], tuple(messages), mtime)
+
+    def get(self, name: str) -> PromptTemplate:
+        """
+        - **name**: Template file name without the .json extension.
+        - **Returns**: The current version of the template.
+        - **Raises**: FileNotFoundError if the template was never loadable.
+        """
+        template = self._templates.get(name)
+        now = time.monotonic()
+        if template is not None and (
+            PROMPT_TEMPLATES_RELOAD_SECONDS <= 0 or now - self._checked_at.get(name, 0) < PROMPT_TEMPLATES_RELOAD_SECONDS
+        ):
+            return template
+
+        with self._lock:
+            template = self._templates.get(name)
+            self._checked_at[name] = now
+            try:
+                if template is not None and os.path.getmtime(self.__path(name)) == template.mtime:
+                    return template
+                loaded = self.__load(name)
+            except Exception as e:
+                if template is None:
+                    raise
+                print(f"Error reloading prompt template {name}, keeping version {template.version}: {e}")
+                return template
+            if template is not None and loaded.version != template.version:
+                print(f"Prompt template {name} reloaded: {template.version} -> {loaded.version}")
+            self._templates[name] = loaded
+            return loaded
+
+    def describe(self) -> Dict[str, dict]:
+        """
+        - **Returns**: {name: {"version", "messages"}} of the loaded templates.
+        """
+        return {
+            name: {"version": template.version, "messages": len(template.messages)}
+            for name, template in sorted(self._templates.items())
+        }
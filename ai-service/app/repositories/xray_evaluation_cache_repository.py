@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional, Tuple
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from app.db.base import SessionLocal
+from app.db.models.xray_evaluation_cache_model import XRayEvaluationCacheModel
+from app.infrastructure.metrics import metrics
+
+# Aynı görüntü + model sürümü + ön işleme sürümü için inference tekrar çalıştırılmaz
+XRAY_RESULT_CACHE_ENABLED = os.getenv("XRAY_RESULT_CACHE_ENABLED", "true").lower() == "true"
+XRAY_RESULT_CACHE_SIZE = int(os.getenv("XRAY_RESULT_CACHE_SIZE", "1024"))
+# Kalıcı (Postgres) katman; süreçler ve yeniden başlatmalar arasında paylaşılır
+XRAY_RESULT_CACHE_PERSIST = os.getenv("XRAY_RESULT_CACHE_PERSIST", "true").lower() == "true"
+# Kalıcı katmandaki satırların ömrü; eski model/ön işleme sürümlerinin satırları böylece silinir
+XRAY_RESULT_CACHE_TTL_SECONDS = int(os.getenv("XRAY_RESULT_CACHE_TTL_SECONDS", "2592000"))
+
+# Süresi dolan satırlar en fazla bu aralıkla silinir
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class XRayEvaluationCacheRepository:
+    """
+    Two-tier cache of X-ray evaluation results: an in-process LRU in front of
+    the `xray_evaluation_cache` table, whose rows expire after
+    XRAY_RESULT_CACHE_TTL_SECONDS. Concurrent requests for the same key share
+    a single evaluation.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(XRayEvaluationCacheRepository, cls).__new__(cls)
+            cls._instance._entries = OrderedDict()
+            cls._instance._lock = threading.Lock()
+            cls._instance._inflight = {}
+            cls._instance._purged_at = 0.0
+            metrics.gauge("xray_result_cache_hit_rate", cls._instance.hit_rate)
+            metrics.gauge("xray_result_cache_entries", lambda: len(cls._instance._entries))
+        return cls._instance
+
+    @staticmethod
+    def make_key(image_sha256: str, model_version: str, preprocessing_version: str) -> str:
+        return hashlib.sha256(
+            f"{image_sha256}:{model_version}:{preprocessing_version}".encode()
+        ).hexdigest()
+
+    def hit_rate(self) -> float:
+        hits = sum(
+            metrics.counter(name).snapshot()
+            for name in ("xray_result_cache_memory_hits", "xray_result_cache_db_hits", "xray_result_cache_coalesced")
+        )
+        total = hits + metrics.counter("xray_result_cache_misses").snapshot()
+        return round(hits / total, 4) if total else 0.0
+
+    def _get_memory(self, key: str) -> Optional[Tuple[dict, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _put_memory(self, key: str, result: dict, inference_ms: float) -> None:
+        with self._lock:
+            self._entries[key] = (result, inference_ms)
+            self._entries.move_to_end(key)
+            while len(self._entries) > XRAY_RESULT_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def _get_db(self, key: str) -> Optional[Tuple[dict, float]]:
+        try:
+            db = SessionLocal()
+            try:
+                row = db.get(XRayEvaluationCacheModel, key)
+                if row is None or row.expires_at <= datetime.now(timezone.utc):
+                    return None
+                return dict(row.result), row.inference_ms
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"Error reading X-ray result cache: {e}")
+            return None
+
+    def _put_db(self, key: str, image_sha256: str, model_version: str,
+                preprocessing_version: str, result: dict, inference_ms: float) -> None:
+        try:
+            db = SessionLocal()
+            try:
+                stmt = insert(XRayEvaluationCacheModel).values(
+                    cache_key=key,
+                    image_sha256=image_sha256,
+                    model_version=model_version,
+                    preprocessing_version=preprocessing_version,
+                    result=result,
+                    inference_ms=inference_ms,
+                    expires_at=datetime.now(timezone.utc) + timedelta(seconds=XRAY_RESULT_CACHE_TTL_SECONDS),
+                )
+                # Süresi dolmuş bir satırın yerine yenisi yazılır
+                db.execute(stmt.on_conflict_do_update(
+                    index_elements=["cache_key"],
+                    set_={"result": stmt.excluded.result, "inference_ms": stmt.excluded.inference_ms,
+                          "expires_at": stmt.excluded.expires_at},
+                ))
+                if time.monotonic() - self._purged_at > PURGE_INTERVAL_SECONDS:
+                    self._purged_at = time.monotonic()
+                    db.execute(delete(XRayEvaluationCacheModel).where(
+                        XRayEvaluationCacheModel.expires_at < datetime.now(timezone.utc)
+                    ))
+                db.commit()
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"Error writing X-ray result cache: {e}")
+
+    def _record_hit(self, counter: str, inference_ms: float) -> None:
+        metrics.counter(counter).inc()
+        metrics.counter("xray_result_cache_saved_ms").inc(inference_ms)
+
+    async def get_or_compute(
+            self,
+            image_bytes: bytes,
+            model_version: str,
+            preprocessing_version: str,
+            compute: Callable[[], Awaitable[dict]],
+        ) -> dict:
+        """
+        Return the cached evaluation of `image_bytes` or run `compute` once,
+        sharing its result with concurrent callers for the same key. If the
+        caller running `compute` is cancelled, one of the waiting callers
+        takes over. Failed evaluations are never cached.
+        - **model_version**: Identifies the weights and inference backend.
+        - **compute**: Coroutine factory that evaluates the image.
+        - **Returns**: A copy of the evaluation result.
+        """
+        if not XRAY_RESULT_CACHE_ENABLED:
+            return await compute()
+
+        loop = asyncio.get_running_loop()
+        image_sha256 = await loop.run_in_executor(None, lambda: hashlib.sha256(image_bytes).hexdigest())
+        key = self.make_key(image_sha256, model_version, preprocessing_version)
+
+        while True:
+            entry = self._get_memory(key)
+            if entry is not None:
+                self._record_hit("xray_result_cache_memory_hits", entry[1])
+                return dict(entry[0])
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            try:
+                result, inference_ms = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Hesaplayan istek iptal edildiyse bekleyenlerden biri hesaplamayı devralır
+                if inflight.cancelled():
+                    continue
+                raise
+            self._record_hit("xray_result_cache_coalesced", inference_ms)
+            return dict(result)
+
+        future: asyncio.Future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            entry = await loop.run_in_executor(None, self._get_db, key) if XRAY_RESULT_CACHE_PERSIST else None
+            if entry is not None:
+                self._record_hit("xray_result_cache_db_hits", entry[1])
+            else:
+                metrics.counter("xray_result_cache_misses").inc()
+                started = time.perf_counter()
+                result = await compute()
+                entry = (result, (time.perf_counter() - started) * 1000)
+                if XRAY_RESULT_CACHE_PERSIST:
+                    # Yazma isteğin yolunu yavaşlatmasın
+                    loop.run_in_executor(
+                        None, self._put_db, key, image_sha256, model_version,
+                        preprocessing_version, result, entry[1],
+                    )
+            self._put_memory(key, dict(entry[0]), entry[1])
+            future.set_result(entry)
+            return dict(entry[0])
+        except Exception as e:
+            future.set_exception(e)
+            # Bekleyen yoksa "exception was never retrieved" uyarısını önle
+            future.exception()
+            raise
+        except BaseException:
+            # İptal bekleyenlere iletilmez; bekleyenler hesaplamayı yeniden dener
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(key, None)
@@ -0,0 +1,322 @@
+import asyncio
+import hashlib
+import os
+import select
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import psycopg2
+import psycopg2.extensions
+from sqlalchemy import delete, func, select as sql_select, text, update
+from app.db.base import SessionLocal, engine
+from app.db.models.xray_job_model import XRayJobModel
+from app.inference.weights import ModelUnavailableError
+from app.infrastructure.metrics import metrics
+
+# API'nin bir işin sonucunu bekleyeceği en uzun süre
+XRAY_JOB_TIMEOUT_SECONDS = float(os.getenv("XRAY_JOB_TIMEOUT_SECONDS", "60"))
+# LISTEN/NOTIFY kaçırılırsa (ör. bağlantı koptuğunda) durum bu aralıkla sorgulanır
+XRAY_JOB_POLL_INTERVAL_SECONDS = float(os.getenv("XRAY_JOB_POLL_INTERVAL_SECONDS", "1"))
+# Bu süreden uzun "running" kalan işlerin worker'ı öldü sayılır ve iş yeniden kuyruğa alınır
+XRAY_JOB_STALE_SECONDS = float(os.getenv("XRAY_JOB_STALE_SECONDS", "300"))
+XRAY_JOB_MAX_ATTEMPTS = int(os.getenv("XRAY_JOB_MAX_ATTEMPTS", "3"))
+# Biten işlerin tabloda tutulma süresi
+XRAY_JOB_RETENTION_SECONDS = float(os.getenv("XRAY_JOB_RETENTION_SECONDS", "86400"))
+
+JOBS_CHANNEL = "xray_jobs"
+DONE_CHANNEL = "xray_job_done"
+
+
+def listen_connection(*channels: str):
+    """
+    Open a dedicated autocommit connection (outside the SQLAlchemy pool)
+    subscribed to the given NOTIFY channels.
+    """
+    conn = psycopg2.connect(engine.url.render_as_string(hide_password=False))
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    with conn.cursor() as cur:
+        for channel in channels:
+            cur.execute(f"LISTEN {channel}")
+    return conn
+
+
+def wait_for_notify(conn, timeout: float) -> List[str]:
+    """
+    Block until a notification arrives on `conn` or `timeout` passes.
+    - **Returns**: The payloads received, empty on timeout.
+    """
+    if not conn.notifies:
+        select.select([conn], [], [], timeout)
+    conn.poll()
+    payloads = [notify.payload for notify in conn.notifies]
+    conn.notifies.clear()
+    return payloads
+
+
+class XRayJobRepository:
+    """
+    Durable X-ray inference queue in the `xray_jobs` table. API replicas
+    submit jobs and wait for them; standalone inference workers
+    (`python -m app.inference.worker`) claim them with
+    `SELECT ... FOR UPDATE SKIP LOCKED`, so both scale independently.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(XRayJobRepository, cls).__new__(cls)
+            cls._instance._waiters = {}
+            cls._instance._waiters_lock = threading.Lock()
+            cls._instance._listener = None
+        return cls._instance
+
+    # --- API tarafı ---
+
+    def submit(self, image_bytes: bytes, model_version: str) -> int:
+        db = SessionLocal()
+        try:
+            job = XRayJobModel(
+                image=image_bytes,
+                image_sha256=hashlib.sha256(image_bytes).hexdigest(),
+                requested_model_version=model_version,
+            )
+            db.add(job)
+            db.flush()
+            # NOTIFY commit ile birlikte iletilir; boştaki worker'lar hemen uyanır
+            db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": JOBS_CHANNEL, "payload": str(job.id)})
+            db.commit()
+            return job.id
+        finally:
+            db.close()
+
+    def cancel(self, job_id: int, reason: str) -> None:
+        """
+        Fail a job nobody waits for anymore, unless a worker already has it.
+        """
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(XRayJobModel)
+                .where(XRayJobModel.id == job_id, XRayJobModel.status == "queued")
+                .values(status="failed", error=reason, error_type="timeout", image=None, finished_at=func.now())
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _finished(self, job_ids: List[int]) -> List[Tuple[int, str, Optional[dict], Optional[str], Optional[str]]]:
+        db = SessionLocal()
+        try:
+            return db.execute(
+                sql_select(
+                    XRayJobModel.id, XRayJobModel.status, XRayJobModel.result,
+                    XRayJobModel.error, XRayJobModel.error_type,
+                ).where(XRayJobModel.id.in_(job_ids), XRayJobModel.status.in_(("done", "failed")))
+            ).all()
+        finally:
+            db.close()
+
+    def _resolve_finished(self) -> None:
+        with self._waiters_lock:
+            job_ids = list(self._waiters)
+        if not job_ids:
+            return
+        for job_id, status, result, error, error_type in self._finished(job_ids):
+            with self._waiters_lock:
+                waiter = self._waiters.pop(job_id, None)
+            if waiter is None:
+                continue
+            loop, future = waiter
+            outcome = (status, result, error, error_type)
+            loop.call_soon_threadsafe(lambda f=future, o=outcome: f.done() or f.set_result(o))
+
+    def _listen(self) -> None:
+        # Tamamlanma bildirimleri tek bir arka plan thread'inde dinlenir
+        conn = None
+        while True:
+            try:
+                if conn is None:
+                    conn = listen_connection(DONE_CHANNEL)
+                    # Bağlantı yokken kaçırılan bildirimler
+                    self._resolve_finished()
+                wait_for_notify(conn, XRAY_JOB_POLL_INTERVAL_SECONDS)
+                self._resolve_finished()
+            except Exception as e:
+                print(f"X-ray job listener error: {e}")
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                conn = None
+                time.sleep(XRAY_JOB_POLL_INTERVAL_SECONDS)
+
+    def start_listener(self) -> None:
+        with self._waiters_lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="xray-job-listener", daemon=True)
+                self._listener.start()
+
+    async def evaluate(self, image_bytes: bytes, model_version: str) -> dict:
+        """
+        Queue an X-ray for the inference workers and wait for its result.
+        - **image_bytes**: The raw uploaded image file.
+        - **model_version**: The API's active model version, recorded on the job.
+        - **Returns**: The evaluation result.
+        - **Raises**: ValueError if a worker could not decode the image,
+          ModelUnavailableError if no worker finished the job in time or the
+          workers could not load the model.
+        """
+        self.start_listener()
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        job_id = await loop.run_in_executor(None, self.submit, image_bytes, model_version)
+        metrics.counter("xray_jobs_submitted").inc()
+
+        future = loop.create_future()
+        with self._waiters_lock:
+            self._waiters[job_id] = (loop, future)
+        try:
+            status, result, error, error_type = await asyncio.wait_for(future, XRAY_JOB_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            metrics.counter("xray_job_timeouts").inc()
+            message = f"X-ray job {job_id} was not finished within {XRAY_JOB_TIMEOUT_SECONDS:.0f} s"
+            await loop.run_in_executor(None, self.cancel, job_id, message)
+            raise ModelUnavailableError(f"{message}; are inference workers running?")
+        finally:
+            with self._waiters_lock:
+                self._waiters.pop(job_id, None)
+        metrics.histogram("xray_job_wait_ms").observe((time.perf_counter() - started) * 1000)
+
+        if status == "done":
+            return result
+        if error_type == "invalid_image":
+            raise ValueError(error)
+        if error_type in ("model_unavailable", "timeout"):
+            raise ModelUnavailableError(error)
+        raise RuntimeError(error)
+
+    def describe(self) -> dict:
+        """
+        - **Returns**: Job counts by status and the workers seen in the last stale interval.
+        """
+        db = SessionLocal()
+        try:
+            counts = dict(db.execute(
+                sql_select(XRayJobModel.status, func.count()).group_by(XRayJobModel.status)
+            ).all())
+            workers = db.execute(
+                sql_select(XRayJobModel.worker_id).distinct().where(
+                    XRayJobModel.worker_id.isnot(None),
+                    XRayJobModel.claimed_at > func.now() - text(f"interval '{int(XRAY_JOB_STALE_SECONDS)} seconds'"),
+                )
+            ).scalars().all()
+            return {"jobs": counts, "recent_workers": sorted(workers)}
+        finally:
+            db.close()
+
+    # --- Worker tarafı ---
+
+    def claim(self, limit: int, worker_id: str) -> List[Tuple[int, bytes]]:
+        """
+        Atomically take up to `limit` of the oldest queued jobs. Rows locked by
+        other workers are skipped, so concurrent workers never block each other
+        or claim the same job.
+        - **Returns**: (job id, image bytes) pairs, oldest first.
+        """
+        claimable = (
+            sql_select(XRayJobModel.id)
+            .where(XRayJobModel.status == "queued")
+            .order_by(XRayJobModel.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                update(XRayJobModel)
+                .where(XRayJobModel.id.in_(claimable))
+                .values(
+                    status="running",
+                    worker_id=worker_id,
+                    claimed_at=func.now(),
+                    attempts=XRayJobModel.attempts + 1,
+                )
+                .returning(XRayJobModel.id, XRayJobModel.image)
+                .execution_options(synchronize_session=False)
+            ).all()
+            db.commit()
+            return sorted((job_id, bytes(image)) for job_id, image in rows)
+        finally:
+            db.close()
+
+    def finish(self, results: Dict[int, dict], failures: Dict[int, Tuple[str, str]], model_version: str) -> None:
+        """
+        Store a batch's outcomes in one transaction and notify the waiting APIs.
+        - **results**: {job id: evaluation result}
+        - **failures**: {job id: (error type, message)}
+        """
+        db = SessionLocal()
+        try:
+            for job_id, result in results.items():
+                db.execute(
+                    update(XRayJobModel).where(XRayJobModel.id == job_id).values(
+                        status="done", result=result, model_version=model_version,
+                        image=None, finished_at=func.now(),
+                    )
+                )
+            for job_id, (error_type, error) in failures.items():
+                db.execute(
+                    update(XRayJobModel).where(XRayJobModel.id == job_id).values(
+                        status="failed", error=error, error_type=error_type, model_version=model_version,
+                        image=None, finished_at=func.now(),
+                    )
+                )
+            for job_id in [*results, *failures]:
+                db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": DONE_CHANNEL, "payload": str(job_id)})
+            db.commit()
+        finally:
+            db.close()
+
+    def maintain(self) -> dict:
+        """
+        Requeue jobs whose worker died mid-batch (failing them after
+        XRAY_JOB_MAX_ATTEMPTS) and delete finished jobs past retention.
+        - **Returns**: Number of requeued, failed and deleted jobs.
+        """
+        stale = XRayJobModel.claimed_at < func.now() - text(f"interval '{int(XRAY_JOB_STALE_SECONDS)} seconds'")
+        db = SessionLocal()
+        try:
+            failed = db.execute(
+                update(XRayJobModel)
+                .where(XRayJobModel.status == "running", stale, XRayJobModel.attempts >= XRAY_JOB_MAX_ATTEMPTS)
+                .values(
+                    status="failed", error_type="inference", image=None, finished_at=func.now(),
+                    error=f"Error: X-ray job abandoned by its worker {XRAY_JOB_MAX_ATTEMPTS} times",
+                )
+                .returning(XRayJobModel.id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            requeued = db.execute(
+                update(XRayJobModel)
+                .where(XRayJobModel.status == "running", stale)
+                .values(status="queued", worker_id=None, claimed_at=None)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            deleted = db.execute(
+                delete(XRayJobModel)
+                .where(
+                    XRayJobModel.status.in_(("done", "failed")),
+                    XRayJobModel.finished_at < func.now() - text(f"interval '{int(XRAY_JOB_RETENTION_SECONDS)} seconds'"),
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            for job_id in failed:
+                db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": DONE_CHANNEL, "payload": str(job_id)})
+            if requeued:
+                db.execute(text("SELECT pg_notify(:channel, '')"), {"channel": JOBS_CHANNEL})
+            db.commit()
+            return {"requeued": requeued, "failed": len(failed), "deleted": deleted}
+        finally:
+            db.close()
@@ -1,14 +1,56 @@
+import asyncio
+import threading
+import time
 import numpy as np
 import torch
 import torchxrayvision as xrv
-import torchvision
 import os
 import torch.nn as nn
+from typing import AsyncIterator, List, Optional, Tuple, Union
+from app.inference.batcher import MicroBatcher
+from app.inference.executor import InferenceExecutor
+from app.inference.backends import XRAY_EXPORT_DIR, XRAY_MODEL_BACKEND, backend_path, load_predictor
+from app.inference.preprocessing import PREPROCESSING_VERSION, preprocess_image_bytes
+from app.inference.registry import (
+    XRAY_MODEL_DIR, ModelRegistry, ModelVersion, file_checksum, load_state_dict, resolve_checkpoint_path, resolve_model_path, rss_mb,
+)
+from app.inference.multihead import Head, MultiHeadDenseNet, head_probabilities, shares_backbone
+from app.inference.weights import (
+    PRETRAINED_LABELS, PRETRAINED_PATH, PRETRAINED_WEIGHTS, ModelUnavailableError, verify_checkpoint,
+)
+from app.infrastructure.metrics import metrics
+from app.repositories.xray_evaluation_cache_repository import XRayEvaluationCacheRepository
+from app.repositories.xray_job_repository import XRayJobRepository
+
+MODEL_PATH = os.path.join(XRAY_MODEL_DIR, "model.pth")
+
+# Eşzamanlı istekler tek bir forward pass'te birleştirilir
+XRAY_BATCH_MAX_SIZE = int(os.getenv("XRAY_BATCH_MAX_SIZE", "8"))
+XRAY_BATCH_MAX_WAIT_MS = float(os.getenv("XRAY_BATCH_MAX_WAIT_MS", "5"))
+# Başlangıçta kernel ve allocator'ları ısıtmak için çalıştırılan forward pass sayısı
+XRAY_WARMUP_ITERATIONS = int(os.getenv("XRAY_WARMUP_ITERATIONS", "2"))
+# Model değişiminde eski sürümdeki isteklerin bitmesi için beklenecek en uzun süre
+XRAY_MODEL_DRAIN_TIMEOUT_SECONDS = float(os.getenv("XRAY_MODEL_DRAIN_TIMEOUT_SECONDS", "30"))
+# Özel modelin backbone'una ön-eğitimli 18 patoloji başını da ekler (tek forward pass).
+# Yalnızca özel model ön-eğitimli backbone'u değiştirmeden eğitildiyse uygulanır;
+# fine-tune edilmiş bir backbone'da ön-eğitimli baş kalibre olmayan skorlar üretir.
+XRAY_MULTI_HEAD = os.getenv("XRAY_MULTI_HEAD", "false").lower() == "true"
+# local: inference bu süreçte çalışır; queue: tek görüntü istekleri Postgres kuyruğuna
+# yazılır ve ayrı inference worker'ları (`python -m app.inference.worker`) tarafından işlenir
+XRAY_INFERENCE_MODE = os.getenv("XRAY_INFERENCE_MODE", "local").lower()
 
 
 class XRayScanEvaluationRepository:
     _instance = None
-    _model = None
+    _registry = None
+    _active_version = None
+    _batcher = None
+    _executor = None
+    _model_lock = threading.RLock()
+    _swap_lock = None
+    _ready = False
+    _first_request_logged = False
+    startup_report: dict = {"status": "loading"}
     
     # Modelin eğitildiği hedef hastalıklar
     TARGET_PATHOLOGIES = ["Cardiomegaly", "Hernia", "Infiltration"]
@@ -18,147 +60,482 @@ class XRayScanEvaluationRepository:
             cls._instance = super(XRayScanEvaluationRepository, cls).__new__(cls)
         return cls._instance
 
-    def _get_model(self):
-        if self._model is None:
-            try:
-                model_path = "/app/models/model.pth"
-                if os.path.exists(model_path):
-                    print("Loading custom model from model.pth...")
+    def _get_registry(self) -> ModelRegistry:
+        if self._registry is None:
+            with self._model_lock:
+                if self._registry is None:
+                    self._registry = ModelRegistry(load=self._load_version)
+        return self._registry
+
+    def _get_active_version(self) -> ModelVersion:
+        """
+        - **Raises**: ModelUnavailableError if there are no local weights or their checksum does not match the bundle.
+        """
+        if self._active_version is None:
+            with self._model_lock:
+                if self._active_version is None:
+                    self._active_version = self._resolve_version(
+                        MODEL_PATH if os.path.exists(MODEL_PATH) else PRETRAINED_PATH,
+                        XRAY_MODEL_BACKEND,
+                        XRAY_EXPORT_DIR,
+                    )
+        return self._active_version
 
-                    # Eğitimde kullanılan orijinal sınıf sayısı 15'ti
-                    base_model = xrv.models.DenseNet(num_classes=15)
-                    num_ftrs = base_model.classifier.in_features
-                    base_model.classifier = nn.Linear(num_ftrs, 3)  # 3 hedef sınıf
+    def _resolve_version(self, path: str, backend: str, export_dir: str) -> ModelVersion:
+        # Ağırlıklar yalnızca yerel diskten okunur; eksikse indirmek yerine açıkça hata verilir
+        if not os.path.exists(path):
+            raise ModelUnavailableError(
+                f"No model weights at {path}, run `python -m app.inference.bundle` when building the image"
+            )
+        checksum = file_checksum(path)
+        verified = verify_checkpoint(path, checksum)
+        pretrained = path == PRETRAINED_PATH
 
-                    checkpoint = torch.load(model_path, map_location='cpu')
-                    base_model.load_state_dict(checkpoint)
-                    base_model.eval()
+        head_path = head_checksum = ""
+        if XRAY_MULTI_HEAD and not pretrained and os.path.exists(PRETRAINED_PATH):
+            if shares_backbone(load_state_dict(path), load_state_dict(PRETRAINED_PATH)):
+                head_path = PRETRAINED_PATH
+                head_checksum = file_checksum(head_path)
+                verify_checkpoint(head_path, head_checksum)
+            else:
+                print(f"Pretrained head not attached to {path}: it was trained on a different backbone")
+        return ModelVersion(
+            path, checksum, backend, export_dir,
+            pretrained=pretrained, verified=verified, head_path=head_path, head_checksum=head_checksum,
+        )
 
-                    self._model = base_model
-                    print("Custom model loaded successfully from model.pth")
-                else:
-                    print("model.pth not found, using pretrained base model...")
-                    self._model = xrv.models.DenseNet(weights="densenet121-res224-all")
+    @property
+    def model_version(self) -> str:
+        """
+        Identifies the active weights and inference backend; part of the result cache key.
+        """
+        return self._get_active_version().version
+
+    def _get_model(self, version: Optional[ModelVersion] = None):
+        return self._get_registry().get(version or self._get_active_version()).model
+
+    def _build_model(self, version: ModelVersion) -> nn.Module:
+        # Parametreler meta cihazında oluşturulur, ardından mmap'li checkpoint
+        # tensörleri doğrudan atanır (kopya yok)
+        with torch.device("meta"):
+            if version.pretrained:
+                base_model = xrv.models.DenseNet(
+                    num_classes=len(PRETRAINED_LABELS), op_threshs=torch.zeros(len(PRETRAINED_LABELS))
+                )
+            else:
+                # Eğitimde kullanılan orijinal sınıf sayısı 15'ti
+                base_model = xrv.models.DenseNet(num_classes=15)
+                num_ftrs = base_model.classifier.in_features
+                base_model.classifier = nn.Linear(num_ftrs, 3)  # 3 hedef sınıf
+        base_model.load_state_dict(load_state_dict(version.path), assign=True)
+        if version.pretrained:
+            base_model.weights = PRETRAINED_WEIGHTS
+            base_model.pathologies = base_model.targets = list(PRETRAINED_LABELS)
+        if not version.head_path:
+            return base_model.eval()
+
+        # Ön-eğitimli sınıflandırıcı, aynı (değiştirilmemiş) backbone'un özelliklerine uygulanır
+        head_state = load_state_dict(version.head_path)
+        out_features, in_features = head_state["classifier.weight"].shape
+        with torch.device("meta"):
+            pretrained_classifier = nn.Linear(in_features, out_features)
+        pretrained_classifier.load_state_dict(
+            {"weight": head_state["classifier.weight"], "bias": head_state["classifier.bias"]}, assign=True
+        )
+        return MultiHeadDenseNet(base_model.features, [
+            (Head("custom", tuple(self.TARGET_PATHOLOGIES)), base_model.classifier),
+            (Head(PRETRAINED_WEIGHTS, PRETRAINED_LABELS, tuple(head_state["op_threshs"].tolist())), pretrained_classifier),
+        ]).eval()
+
+    def _load_version(self, version: ModelVersion):
+        try:
+            print(f"Loading {'pretrained' if version.pretrained else 'custom'} model from {version.path} (memory-mapped)...")
+            model = self._build_model(version)
+            print(f"Model {version.version} loaded successfully")
+        except Exception as e:
+            metrics.counter("xray_model_load_failures").inc()
+            raise ModelUnavailableError(f"Error loading {version.path}: {e}")
+
+        # Sürüm (ve sonuç önbelleği anahtarı) backend'i içerdiğinden sessizce eager'a düşülmez
+        try:
+            predictor = load_predictor(version.backend, model, version.artifact_key, version.export_dir)
+            print(f"Using {version.backend} inference backend")
+        except Exception as e:
+            metrics.counter("xray_model_load_failures").inc()
+            raise ModelUnavailableError(f"Error loading {version.backend} backend for {version.path}: {e}")
+        return model, predictor
+
+    def predict_batch(self, batch: np.ndarray, version: Optional[ModelVersion] = None) -> np.ndarray:
+        """
+        Run one forward pass over a (N, 1, 224, 224) batch.
+        - **version**: Model version to use, the active one by default.
+        - **Returns**: A (N, len(TARGET_PATHOLOGIES)) array of probabilities, followed by
+          the pretrained head's probabilities when the model has several heads.
+        """
+        loaded = self._get_registry().get(version or self._get_active_version())
+        outputs = loaded.predictor(batch)
+        if isinstance(loaded.model, MultiHeadDenseNet):
+            return head_probabilities(outputs, loaded.model.heads)
+        if loaded.version.pretrained:
+            # Ön-eğitimli model 18 patoloji döndürür; hedefler adlarıyla seçilir
+            outputs = outputs[:, [PRETRAINED_LABELS.index(pathology) for pathology in self.TARGET_PATHOLOGIES]]
+            if getattr(loaded.model, "op_threshs", None) is not None:
+                # torchxrayvision DenseNet'in forward'ı zaten sigmoid + op_norm uygular
+                return outputs
+            return torch.sigmoid(torch.from_numpy(outputs)).numpy()
+        # Model.pth 3 sınıf için eğitilmiş: Cardiomegaly, Hernia, Infiltration
+        return torch.sigmoid(torch.from_numpy(outputs[:, :len(self.TARGET_PATHOLOGIES)])).numpy()
+
+    def _to_result(self, probabilities: np.ndarray) -> dict:
+        # Convert NumPy objects to native Python types for serialization
+        preds_dict = {
+            pathology: float(value)
+            for pathology, value in zip(self.TARGET_PATHOLOGIES, probabilities)
+        }
+        if len(probabilities) > len(self.TARGET_PATHOLOGIES):
+            # Ön-eğitimli başın tüm patolojileri, aynı forward pass'ten
+            preds_dict["pathologies"] = {
+                pathology: float(value)
+                for pathology, value in zip(PRETRAINED_LABELS, probabilities[len(self.TARGET_PATHOLOGIES):])
+            }
+        print(f"X-ray evaluation results: {preds_dict}")
+        return preds_dict
+
+    def _get_batcher(self) -> MicroBatcher:
+        if self._batcher is None:
+            self._batcher = MicroBatcher(
+                run_batch=self._run_batch,
+                max_batch_size=XRAY_BATCH_MAX_SIZE,
+                max_wait_ms=XRAY_BATCH_MAX_WAIT_MS,
+            )
+        return self._batcher
+
+    def _get_executor(self) -> InferenceExecutor:
+        if self._executor is None:
+            self._executor = InferenceExecutor(
+                predict=_predict_batch_in_worker,
+                initializer=_load_model_in_worker,
+            )
+        return self._executor
+
+    async def _run_batch(self, batch: np.ndarray) -> np.ndarray:
+        # Sürüm batch başında sabitlenir; model değişimi sırasındaki batch'ler eski sürümde biter
+        version = self._get_active_version()
+        with self._get_registry().lease(version):
+            return await self._get_executor().run(batch, version)
+
+    async def _describe_workers(self) -> list:
+        executor = self._get_executor()
+        workers = await asyncio.gather(*(executor.call(_describe_worker) for _ in range(executor.max_concurrency)))
+        return list({worker["pid"]: worker for worker in workers}.values())
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready
+
+    async def warm_up(self) -> dict:
+        """
+        Load the model in every inference worker and run warm-up forward passes
+        so kernels and allocators are primed before traffic arrives.
+        - **Returns**: Cold-start and warm latency figures.
+        """
+        # Ağırlık checksum'ı ilk istekte event loop'u bloklamasın
+        version = await asyncio.get_running_loop().run_in_executor(None, self._get_active_version)
+        if XRAY_INFERENCE_MODE == "queue":
+            # Model bu süreçte yüklenmez; API yalnızca iş gönderir
+            XRayJobRepository().start_listener()
+            self.startup_report = {
+                "status": "ready",
+                "mode": "queue",
+                "model": version.to_dict(),
+                "rss_mb": round(rss_mb(), 1),
+            }
+            self._ready = True
+            print(f"X-ray inference delegated to queue workers, model {version.version}")
+            return self.startup_report
+
+        executor = self._get_executor()
+        batch = np.zeros((XRAY_BATCH_MAX_SIZE, 1, 224, 224), np.float32)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(executor.run(batch[:1], version) for _ in range(executor.max_concurrency)))
+        cold_start_ms = (time.perf_counter() - started) * 1000
+
+        warm_batch_ms = 0.0
+        for _ in range(XRAY_WARMUP_ITERATIONS):
+            iteration_started = time.perf_counter()
+            await executor.run(batch, version)
+            warm_batch_ms = (time.perf_counter() - iteration_started) * 1000
+
+        single_started = time.perf_counter()
+        await executor.run(batch[:1], version)
+        warm_single_ms = (time.perf_counter() - single_started) * 1000
+
+        self.startup_report = {
+            "status": "ready",
+            "backend": XRAY_MODEL_BACKEND,
+            "model": version.to_dict(),
+            "cold_start_ms": round(cold_start_ms, 1),
+            "warm_single_ms": round(warm_single_ms, 1),
+            "warm_batch_ms": round(warm_batch_ms, 1),
+            "warm_batch_size": XRAY_BATCH_MAX_SIZE,
+            "rss_mb": round(rss_mb(), 1),
+            "workers": await self._describe_workers(),
+        }
+        self._ready = True
+        print(
+            f"X-ray model ready: cold start {cold_start_ms:.0f} ms, "
+            f"warm single {warm_single_ms:.0f} ms, warm batch of {XRAY_BATCH_MAX_SIZE} {warm_batch_ms:.0f} ms"
+        )
+        return self.startup_report
+
+    def describe_models(self) -> dict:
+        """
+        - **Returns**: The active model version and the versions loaded in this process.
+        """
+        report = {
+            "active": self._get_active_version().to_dict(),
+            "loaded": self._get_registry().describe(),
+            "rss_mb": round(rss_mb(), 1),
+        }
+        if XRAY_INFERENCE_MODE == "queue":
+            report["queue"] = XRayJobRepository().describe()
+        return report
+
+    async def swap_model(
+            self,
+            path: str,
+            checksum: Optional[str] = None,
+            backend: str = "eager",
+            export_dir: str = XRAY_EXPORT_DIR,
+        ) -> dict:
+        """
+        Atomically switch inference to another checkpoint. The new version is
+        loaded and warmed up in every worker first; batches already running on
+        the old version finish on it before it is released.
+        - **path**: Checkpoint path, relative to or inside the model directory.
+        - **checksum**: Optional expected sha256 of the checkpoint.
+        - **backend**: Inference backend; non-eager backends need artifacts exported from this checkpoint in `export_dir`.
+        - **Returns**: The previous and new versions with load and drain timings.
+        - **Raises**: ValueError if the checkpoint is invalid or does not match `checksum`,
+          or in queue mode, where the workers own the model.
+        """
+        if XRAY_INFERENCE_MODE == "queue":
+            raise ValueError("Model swap is not available in queue mode; restart the inference workers with the new weights")
+        if self._swap_lock is None:
+            self._swap_lock = asyncio.Lock()
+        async with self._swap_lock:
+            loop = asyncio.get_running_loop()
+            resolved = resolve_checkpoint_path(path)
+            export_dir = resolve_model_path(export_dir)
+            try:
+                version = await loop.run_in_executor(None, self._resolve_version, resolved, backend, export_dir)
+            except ModelUnavailableError as e:
+                raise ValueError(e.message)
+            if backend != "eager" and not os.path.exists(backend_path(backend, version.artifact_key, export_dir)):
+                raise ValueError(f"{backend} artifact of {path} not found in {export_dir}")
+            if checksum and checksum.lower() != version.checksum:
+                raise ValueError(f"Checksum mismatch for {path}: {version.checksum}")
+            previous = self._get_active_version()
+            if version == previous:
+                return {"previous": previous.to_dict(), "active": version.to_dict(), "swapped": False}
+
+            # Uyumsuz checkpoint'ler (ör. farklı sınıf sayısı) aktif olmadan reddedilir
+            try:
+                await loop.run_in_executor(None, self._build_model, version)
             except Exception as e:
-                print(f"Error loading model.pth: {e}")
-                self._model = self._create_dummy_model()
-        return self._model
-
-    def _create_dummy_model(self):
-        """Create a dummy model that returns safe predictions when the real model fails"""
-        class DummyModel:
-            def __init__(self):
-                self.pathologies = XRayScanEvaluationRepository.TARGET_PATHOLOGIES
-            
-            def to(self, device):
-                return self
-            
-            def eval(self):
-                return self
-            
-            def __call__(self, image):
-                # Return dummy predictions
-                return torch.tensor([[0.1, 0.1, 0.1]])  # Low probability for all pathologies
-        
-        return DummyModel()
-
-    def evaluate_xray_scan(self, xray_scan: np.array) -> dict:
-        """
-        Evaluate X-ray scan and provide diagnosis.
-        - **xray_scan**: The X-ray scan file to be evaluated.
+                raise ValueError(f"Checkpoint {path} cannot be loaded: {e}")
+
+            started = time.perf_counter()
+            executor = self._get_executor()
+            batch = np.zeros((1, 1, 224, 224), np.float32)
+            await asyncio.gather(*(executor.run(batch, version) for _ in range(executor.max_concurrency)))
+            load_ms = (time.perf_counter() - started) * 1000
+
+            self._active_version = version
+            drain_started = time.perf_counter()
+            registry = self._get_registry()
+            while registry.inflight(previous) and time.perf_counter() - drain_started < XRAY_MODEL_DRAIN_TIMEOUT_SECONDS:
+                await asyncio.sleep(0.01)
+            drain_ms = (time.perf_counter() - drain_started) * 1000
+            # Process modunda her worker'ın kendi registry'si vardır; eski sürüm hepsinden bırakılır
+            await executor.broadcast(_release_model_in_worker, previous)
+
+            report = {
+                "previous": previous.to_dict(),
+                "active": version.to_dict(),
+                "swapped": True,
+                "load_ms": round(load_ms, 1),
+                "drain_ms": round(drain_ms, 1),
+                "rss_mb": round(rss_mb(), 1),
+                "workers": await self._describe_workers(),
+            }
+            self.startup_report = dict(self.startup_report, model=version.to_dict())
+            print(f"Swapped X-ray model {previous.version} -> {version.version} (load {load_ms:.0f} ms, drain {drain_ms:.0f} ms)")
+            return report
+
+    async def shutdown(self) -> None:
+        if self._batcher is not None:
+            await self._batcher.close()
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    async def _infer(self, image: np.ndarray, started: float) -> dict:
+        probabilities = await self._get_batcher().submit(image)
+        if not self._first_request_logged:
+            self._first_request_logged = True
+            print(f"First X-ray request served in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return self._to_result(probabilities)
+
+    async def evaluate_image_bytes(self, image_bytes: bytes) -> dict:
+        """
+        Decode an uploaded X-ray at reduced resolution, preprocess it and
+        evaluate it through the micro-batching scheduler, or through the job
+        queue in queue mode. Results are cached by image content, model version
+        and preprocessing version.
+        - **image_bytes**: The raw uploaded image file.
         - **Returns**: A JSON response with the evaluation result.
-        - **Raises**: 400 if the input is invalid, 500 for internal server errors.
+        - **Raises**: ValueError if the image cannot be decoded, ModelUnavailableError if the model could not be loaded;
+          any other inference error propagates to the caller.
         """
+        started = time.perf_counter()
+
+        async def evaluate() -> dict:
+            if XRAY_INFERENCE_MODE == "queue":
+                return await XRayJobRepository().evaluate(image_bytes, self.model_version)
+            loop = asyncio.get_running_loop()
+            image = await loop.run_in_executor(None, preprocess_image_bytes, image_bytes)
+            return await self._infer(image, started)
+
+        return await XRayEvaluationCacheRepository().get_or_compute(
+            image_bytes, self.model_version, PREPROCESSING_VERSION, evaluate
+        )
+
+    async def _evaluate_batch(self, batch: np.ndarray, names: List[str], preprocessing: list) -> List[dict]:
+        outcomes = await asyncio.gather(*preprocessing, return_exceptions=True)
+        rows = [i for i, outcome in enumerate(outcomes) if not isinstance(outcome, Exception)]
+        probabilities = iter(await self._run_batch(batch[rows]) if rows else [])
+        return [
+            {"name": name, "error": str(outcome)} if isinstance(outcome, Exception)
+            else {"name": name, "result": self._to_result(next(probabilities))}
+            for name, outcome in zip(names, outcomes)
+        ]
+
+    async def _evaluate_queued(self, names: List[str], images: List[Union[bytes, Exception]]) -> List[dict]:
+        async def evaluate(image_bytes: Union[bytes, Exception]) -> dict:
+            if isinstance(image_bytes, Exception):
+                return {"error": str(image_bytes)}
+            try:
+                return {"result": await self.evaluate_image_bytes(image_bytes)}
+            except ValueError as e:
+                return {"error": str(e)}
+
+        outcomes = await asyncio.gather(*(evaluate(image_bytes) for image_bytes in images))
+        return [{"name": name, **outcome} for name, outcome in zip(names, outcomes)]
+
+    async def _evaluate_stream_queued(
+            self,
+            images: AsyncIterator[Tuple[str, Union[bytes, Exception]]],
+            batch_size: int,
+        ) -> AsyncIterator[dict]:
+        names: List[str] = []
+        pending: List[Union[bytes, Exception]] = []
+        running = None
         try:
-            # Load the X-ray model
-            model = self._get_model()
-            
-            # Move model to CPU (GPU yoksa)
-            device = torch.device("cpu")
-            model.to(device)
-            model.eval()
-
-            # Normalize image
-            image = xrv.datasets.normalize(xray_scan, 255)
-
-            # Handle different image formats
-            if len(image.shape) > 2:
-                image = image[:, :, 0]  # Use the first channel if RGB
-            if len(image.shape) < 2:
-                raise ValueError("Error: Image is not valid.")
-
-            # Add batch dimension
-            image = image[None, :, :]
-            
-            # Apply transforms
-            transform = torchvision.transforms.Compose([
-                xrv.datasets.XRayCenterCrop(), 
-                xrv.datasets.XRayResizer(224)
-            ])
-            image = transform(image)
-            
-            # Convert to tensor
-            image = torch.from_numpy(image).unsqueeze(0).to(device)
-
-            # Get predictions
-            with torch.no_grad():
-                preds = model(image).cpu()
-
-            # Model.pth 3 sınıf için eğitilmiş: Cardiomegaly, Hernia, Infiltration
-            pathologies = self.TARGET_PATHOLOGIES
-
-            # Convert predictions to numpy and apply sigmoid
-            preds_numpy = torch.sigmoid(preds[0]).detach().numpy()
-            
-            # Create predictions dictionary
-            preds_dict = dict(zip(pathologies, preds_numpy))
-            
-            # Convert NumPy objects to native Python types for serialization
-            preds_dict = {key: float(value) for key, value in preds_dict.items()}
-            
-            print(f"X-ray evaluation results: {preds_dict}")
-            return preds_dict
-            
-        except Exception as e:
-            print(f"Error in X-ray prediction: {e}")
-            # Return safe default predictions
-            return {pathology: 0.1 for pathology in self.TARGET_PATHOLOGIES}
+            async for name, image_bytes in images:
+                names.append(name)
+                pending.append(image_bytes)
+                if len(names) < batch_size:
+                    continue
+                if running is not None:
+                    for result in await running:
+                        yield result
+                running = asyncio.ensure_future(self._evaluate_queued(names, pending))
+                names, pending = [], []
+
+            if running is not None:
+                for result in await running:
+                    yield result
+                running = None
+            if names:
+                for result in await self._evaluate_queued(names, pending):
+                    yield result
+        finally:
+            if running is not None and not running.done():
+                running.cancel()
 
-    def evaluate_xray(self, image_path: str) -> dict:
+    async def evaluate_stream(
+            self,
+            images: AsyncIterator[Tuple[str, Union[bytes, Exception]]],
+            batch_size: int = XRAY_BATCH_MAX_SIZE,
+        ) -> AsyncIterator[dict]:
         """
-        Evaluate X-ray scan for LLM integration.
-        - **image_path**: Path to the image file.
-        - **Returns**: A dictionary with the evaluation result.
+        Evaluate a stream of images in fixed-size batches. Images of a batch are
+        decoded in parallel straight into a preallocated batch buffer, and the
+        next batch is decoded while the previous one is on the model, so memory
+        stays at two batches regardless of how many images are streamed.
+        In queue mode each batch's images are submitted as jobs for the
+        inference workers instead, and the model is never loaded here.
+        - **images**: (name, image bytes) pairs; an exception in place of the bytes is reported as that item's error.
+        - **Returns**: One {"name", "result"} or {"name", "error"} dict per image, in input order, per finished batch.
         """
+        if XRAY_INFERENCE_MODE == "queue":
+            # API süreci modeli yüklemez; görüntüler iş kuyruğu üzerinden değerlendirilir
+            async for result in self._evaluate_stream_queued(images, batch_size):
+                yield result
+            return
+
+        loop = asyncio.get_running_loop()
+        buffers = [np.empty((batch_size, 1, 224, 224), np.float32) for _ in range(2)]
+        current = 0
+        names: List[str] = []
+        preprocessing: list = []
+        running = None
+
         try:
-            model = self._get_model()
-            model.eval()
-            
-            # Image preprocessing
-            transform = xrv.datasets.XRayCenterCrop()
-            img = xrv.datasets.normalize(image_path, 255)
-            img = transform(img)
-            img = torch.from_numpy(img).unsqueeze(0)
-            
-            with torch.no_grad():
-                pred = model(img)
-                
-                # Model.pth 3 sınıf için eğitilmiş: Cardiomegaly, Hernia, Infiltration
-                pathologies = ["Cardiomegaly", "Hernia", "Infiltration"]
-                predictions = torch.sigmoid(pred).squeeze().numpy()
-                
-                results = {}
-                for i, pathology in enumerate(pathologies):
-                    results[pathology] = float(predictions[i])
-                
-                print(f"X-ray evaluation results: {results}")
-                return results
-                
-        except Exception as e:
-            print(f"Error in X-ray prediction: {e}")
-            # Fallback to dummy results
-            return {
-                "Cardiomegaly": 0.1,
-                "Hernia": 0.05,
-                "Infiltration": 0.15
-            } 
\ No newline at end of file
+            async for name, image_bytes in images:
+                if isinstance(image_bytes, Exception):
+                    failed = loop.create_future()
+                    failed.set_exception(image_bytes)
+                    preprocessing.append(failed)
+                else:
+                    row = buffers[current][len(names)]
+                    preprocessing.append(loop.run_in_executor(None, preprocess_image_bytes, image_bytes, row))
+                names.append(name)
+                if len(names) < batch_size:
+                    continue
+                if running is not None:
+                    for result in await running:
+                        yield result
+                running = asyncio.ensure_future(self._evaluate_batch(buffers[current], names, preprocessing))
+                current, names, preprocessing = 1 - current, [], []
+
+            if running is not None:
+                for result in await running:
+                    yield result
+                running = None
+            if names:
+                for result in await self._evaluate_batch(buffers[current][:len(names)], names, preprocessing):
+                    yield result
+        finally:
+            # İstemci bağlantıyı kestiğinde bekleyen batch iptal edilir
+            if running is not None and not running.done():
+                running.cancel()
+
+
+# Inference executor'ın worker'larında (thread ya da spawn edilmiş süreç) çalışan fonksiyonlar;
+# process modunda pickle edilebilmeleri için modül seviyesinde tanımlı.
+def _load_model_in_worker() -> None:
+    XRayScanEvaluationRepository()._get_model()
+
+
+def _release_model_in_worker(version: ModelVersion) -> None:
+    XRayScanEvaluationRepository()._get_registry().release(version)
+
+
+def _predict_batch_in_worker(batch: np.ndarray, version: Optional[ModelVersion] = None) -> np.ndarray:
+    return XRayScanEvaluationRepository().predict_batch(batch, version)
+
+
+def _describe_worker() -> dict:
+    return {"pid": os.getpid(), "rss_mb": round(rss_mb(), 1)}
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends, HTTPException
+from app.infrastructure.security import require_admin_token
+from app.inference.backends import XRAY_EXPORT_DIR
+from app.repositories.prompt_template_repository import PromptTemplateRepository
+from app.repositories.xray_scan_evaluation_repository import XRayScanEvaluationRepository
+from app.schemes.model_schemes import ModelSwapRequest
+
+admin_router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(require_admin_token)],
+    responses={404: {"description": "Not found"}},
+)
+
+@admin_router.get(
+    '/model',
+    summary="Describe X-ray models",
+    description="Active X-ray model version and the versions loaded in this process",
+    status_code=200,
+)
+async def describe_models():
+    """
+    Describe the active X-ray model.
+    - **Returns**: Active version, loaded versions and process RSS.
+    """
+    return XRayScanEvaluationRepository().describe_models()
+
+@admin_router.post(
+    '/model',
+    summary="Swap X-ray model",
+    description="Atomically switch X-ray inference to another checkpoint",
+    status_code=200,
+    responses={
+        200: {"description": "Model swapped"},
+        400: {"description": "Invalid checkpoint"},
+    }
+)
+async def swap_model(request: ModelSwapRequest):
+    """
+    Hot-swap the X-ray model. In-flight requests finish on the old version.
+    - **request**: Checkpoint path (inside the model directory), optional sha256 and backend.
+    - **Returns**: Previous and new versions with load and drain timings.
+    - **Raises**: 400 if the checkpoint is invalid or its checksum does not match.
+    """
+    try:
+        return await XRayScanEvaluationRepository().swap_model(
+            request.path,
+            checksum=request.checksum,
+            backend=request.backend.value,
+            export_dir=request.export_dir or XRAY_EXPORT_DIR,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@admin_router.get(
+    '/prompts',
+    summary="Describe prompt templates",
+    description="Versions of the prompt templates loaded in this process",
+    status_code=200,
+)
+async def describe_prompts():
+    """
+    Describe the loaded prompt templates.
+    - **Returns**: Version (content hash) and message count per template.
+    """
+    return PromptTemplateRepository().describe()
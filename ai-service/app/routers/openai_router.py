@@ -1,17 +1,20 @@
 from fastapi import APIRouter, File, HTTPException, Depends, UploadFile, Form, Request
-from datetime import datetime, timezone
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-import io
-import skimage.io
+import anyio
+import json
 import requests
-from app.db.base import get_db
+from app.db.base import SessionLocal, get_db
 from app.repositories.openai_repository import OpenAIRepository
 from app.repositories.chat_repository import ChatRepository
+from app.repositories.chat_context_repository import ChatContextRepository
 from app.repositories.xray_scan_evaluation_repository import XRayScanEvaluationRepository
+from app.inference.weights import ModelUnavailableError
+from app.infrastructure.llm_providers import LLMUnavailableError
 from app.schemes.message_schemes import MessageToSend, MessageSent, RoleEnum
 from app.schemes.message_schemes import ChatToLoad, ChatToSend, ChatLoaded
 from app.infrastructure.security import get_current_user
-from typing import List
+from typing import Callable, List
 import uuid
 import os
 
@@ -29,7 +32,8 @@ openai_router = APIRouter(
     status_code=200,
     responses={
         200: {"description": "Demo response successful"},
-        500: {"description": "Internal server error"}
+        500: {"description": "Internal server error"},
+        503: {"description": "LLM provider unavailable"}
     }
 )
 async def get_azure_demo_response() -> str:
@@ -39,8 +43,10 @@ async def get_azure_demo_response() -> str:
     """
     openai_repo = OpenAIRepository()
     try:
-        response = openai_repo.get_azure_demo_prediction()
+        response = await openai_repo.get_azure_demo_prediction()
         return response
+    except LLMUnavailableError as e:
+        raise HTTPException(status_code=503, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -53,18 +59,20 @@ async def __create_new_chat(
     Create a new chat with the OpenAI model.
     - **chat**: The chat object to be sent to the OpenAI model.
     - **Returns**: A JSON response with the chat result.
-    - **Raises**: 400 if the input is invalid, 500 for internal server errors.
+    - **Raises**: 400 if the input is invalid, 503 if the LLM provider is unavailable, 500 for internal server errors.
     """
     try:
         openai_repo = OpenAIRepository()
         new_chat = openai_repo.get_new_chat_with_base_assistant(message)
-        chat_repo = ChatRepository()
-        new_chat = chat_repo.insert_chat(db, new_chat)
-        completion = openai_repo.get_chat_completion(new_chat)
-        completion_inserted = chat_repo.insert_message(db, completion)
-        return completion_inserted
+        completion = await openai_repo.get_chat_completion(new_chat)
+        new_chat.append(completion)
+        # Sistem mesajı, ilk mesaj ve yanıt tek işlemde yazılır
+        inserted_chat = ChatRepository().insert_chat(db, new_chat)
+        return inserted_chat.messages[-1]
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except LLMUnavailableError as e:
+        raise HTTPException(status_code=503, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
@@ -79,7 +87,8 @@ async def __create_new_chat(
     responses={
         200: {"description": "Chat created successfully"},
         400: {"description": "Invalid input"},
-        500: {"description": "Internal server error"}
+        500: {"description": "Internal server error"},
+        503: {"description": "LLM provider unavailable"}
     }
 )
 async def create_new_chat(
@@ -90,11 +99,118 @@ async def create_new_chat(
     Create a new chat with the OpenAI model.
     - **chat**: The chat object to be sent to the OpenAI model.
     - **Returns**: A JSON response with the chat result.
-    - **Raises**: 400 if the input is invalid, 500 for internal server errors.
+    - **Raises**: 400 if the input is invalid, 503 if the LLM provider is unavailable, 500 for internal server errors.
     """
     return await __create_new_chat(message, db)
 
 
+def __sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def __persist_new_chat(chat: ChatToSend) -> Callable[[Session, MessageToSend], MessageSent]:
+    def persist(db: Session, completion: MessageToSend) -> MessageSent:
+        new_chat = ChatToSend(id=chat.id, user_id=chat.user_id, messages=chat.messages + [completion])
+        return ChatRepository().insert_chat(db, new_chat).messages[-1]
+    return persist
+
+
+def __persist_turn(message: MessageToSend) -> Callable[[Session, MessageToSend], MessageSent]:
+    def persist(db: Session, completion: MessageToSend) -> MessageSent:
+        return ChatRepository().append_messages(db, [message, completion])[-1]
+    return persist
+
+
+def __stream_completion(
+    chat: ChatToSend,
+    persist: Callable[[Session, MessageToSend], MessageSent],
+    ) -> StreamingResponse:
+    """
+    Relay a chat completion to the client as server-sent events, then persist
+    the turn with the assembled assistant message. If the client disconnects,
+    the upstream completion is cancelled and nothing is persisted.
+    - **chat**: The chat object to be sent to the OpenAI model.
+    - **persist**: Stores the turn in one transaction and returns the stored assistant message.
+    - **Returns**: `token` events ({"content"}) as they arrive, then a `done`
+      event with the stored message, or an `error` event.
+    """
+    async def stream():
+        completion_stream = OpenAIRepository().stream_chat_completion(chat)
+        parts = []
+        try:
+            async for content in completion_stream:
+                parts.append(content)
+                yield __sse("token", {"content": content})
+        except LLMUnavailableError as e:
+            # Başlıklar gönderildiği için hata bir olay olarak bildirilir
+            print(f"Error in streamed chat completion: {e}")
+            yield __sse("error", {"detail": e.message})
+            return
+        except Exception as e:
+            print(f"Error in streamed chat completion: {e}")
+            yield __sse("error", {"detail": "Internal server error"})
+            return
+        finally:
+            # İptal edilse bile upstream bağlantısı kapatılır
+            with anyio.CancelScope(shield=True):
+                await completion_stream.aclose()
+
+        completion = MessageToSend(
+            role=RoleEnum.assistant,
+            content="".join(parts).strip(),
+            chat_id=chat.id,
+            user_id=chat.user_id,
+        )
+        # İstek bağımlılığındaki oturum akış sürerken kapanmış olabilir
+        db = SessionLocal()
+        try:
+            completion_inserted = persist(db, completion)
+        except Exception as e:
+            print(f"Error persisting streamed completion: {e}")
+            yield __sse("error", {"detail": "Internal server error"})
+            return
+        finally:
+            db.close()
+        yield __sse("done", completion_inserted.model_dump(mode="json"))
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@openai_router.post(
+    '/new_chat/stream',
+    summary="Create a new chat, streaming the response",
+    description="Create a new chat with the OpenAI model and stream the response as server-sent events",
+    response_description="Event stream",
+    status_code=200,
+    responses={
+        200: {"description": "`token` events, then a `done` event with the stored message"},
+        400: {"description": "Invalid input"},
+        500: {"description": "Internal server error"}
+    }
+)
+async def create_new_chat_stream(
+    message: MessageToSend,
+    db: Session = Depends(get_db),
+    ) -> StreamingResponse:
+    """
+    Create a new chat with the OpenAI model, streaming the response.
+    - **message**: The first message of the chat.
+    - **Returns**: A server-sent event stream of the response.
+    - **Raises**: 400 if the input is invalid, 500 for internal server errors.
+    """
+    try:
+        new_chat = OpenAIRepository().get_new_chat_with_base_assistant(message)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Internal server error")
+    return __stream_completion(new_chat, __persist_new_chat(new_chat))
+
+
 @openai_router.post(
     '/load_chat',
     summary="Load a chat",
@@ -115,8 +231,9 @@ async def load_chat(
     ) -> ChatLoaded:
     """
     Load a chat with the OpenAI model.
-    - **chat**: The chat object to be sent to the OpenAI model.
-    - **Returns**: A JSON response with the chat result.
+    - **chat**: The chat to load; pass `before_id` (the oldest loaded message id) to page
+      back through older messages, or `after_id` to fetch newer ones.
+    - **Returns**: A JSON response with the chat result and `has_more`.
     - **Raises**: 400 if the input is invalid, 500 for internal server errors.
     """
     try:
@@ -140,7 +257,8 @@ async def load_chat(
     responses={
         200: {"description": "Response received successfully"},
         400: {"description": "Invalid input"},
-        500: {"description": "Internal server error"}
+        500: {"description": "Internal server error"},
+        503: {"description": "LLM provider unavailable"}
     }
 )
 async def message(
@@ -152,47 +270,79 @@ async def message(
     It loads the previous chat from the database if it exists.
     - **message**: The message object to be sent to the OpenAI model.
     - **Returns**: A JSON response with the message result.
-    - **Raises**: 400 if the input is invalid, 500 for internal server errors.
+    - **Raises**: 400 if the input is invalid, 503 if the LLM provider is unavailable, 500 for internal server errors.
     """
     try:
         chat_repo = ChatRepository()
         loaded_chat = chat_repo.load_chat_by_message(db, message)
         if not loaded_chat.messages:
             return await __create_new_chat(message, db)
-        messageSent = chat_repo.insert_message(db, message)
-        loaded_chat.append(messageSent)
+        # Sistem mesajı, eski mesajların özeti, bütçeye sığan en yeni mesajlar ve yeni mesaj
+        context = await ChatContextRepository().build_context(
+            db, message.chat_id, message.user_id, pending_messages=[message],
+        )
         openai_repo = OpenAIRepository()
-        completion = openai_repo.get_chat_completion(loaded_chat)
-        completion_inserted = chat_repo.insert_message(db, completion)
-        return completion_inserted
+        completion = await openai_repo.get_chat_completion(context)
+        # Kullanıcı mesajı ve yanıt tek işlemde yazılır
+        return chat_repo.append_messages(db, [message, completion])[-1]
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except LLMUnavailableError as e:
+        raise HTTPException(status_code=503, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@openai_router.post(
+    '/message/stream',
+    summary="Send a message, streaming the response",
+    description="Send a message to the OpenAI model and stream the response as server-sent events",
+    response_description="Event stream",
+    status_code=200,
+    responses={
+        200: {"description": "`token` events, then a `done` event with the stored message"},
+        400: {"description": "Invalid input"},
+        500: {"description": "Internal server error"}
+    }
+)
+async def message_stream(
+    message: MessageToSend,
+    db: Session = Depends(get_db),
+    ) -> StreamingResponse:
+    """
+    Send a message to the OpenAI model and stream the response.
+    It loads the previous chat from the database if it exists.
+    - **message**: The message object to be sent to the OpenAI model.
+    - **Returns**: A server-sent event stream of the response.
+    - **Raises**: 400 if the input is invalid, 500 for internal server errors.
+    """
+    try:
+        chat_repo = ChatRepository()
+        loaded_chat = chat_repo.load_chat_by_message(db, message)
+        if not loaded_chat.messages:
+            new_chat = OpenAIRepository().get_new_chat_with_base_assistant(message)
+            return __stream_completion(new_chat, __persist_new_chat(new_chat))
+        context = await ChatContextRepository().build_context(
+            db, message.chat_id, message.user_id, pending_messages=[message],
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Internal server error")
+    return __stream_completion(context, __persist_turn(message))
+
 async def __get_xray_evaluation(xray_scan_upload: UploadFile) -> dict:
     """
     Get the prediction for the X-ray scan.
     - **xray_scan**: The X-ray scan file to be evaluated.
     - **Returns**: A dict response with the evaluation result.
     """
-    try:
-        evaluater = XRayScanEvaluationRepository()
-        # Read the image file
-        image_bytes = await xray_scan_upload.read()
-        xray_scan = skimage.io.imread(io.BytesIO(image_bytes))
-        if xray_scan is None:
-            raise ValueError("Error: Image is not valid.")
-        result = evaluater.evaluate_xray_scan(xray_scan)
-        return result
-    except Exception as e:
-        print(f"Error in __get_xray_evaluation: {e}")
-        # Return dummy result in case of any error
-        return {
-            "Cardiomegaly": 0.1,
-            "Hernia": 0.1,
-            "Infiltration": 0.1
-        }
+    evaluater = XRayScanEvaluationRepository()
+    # Read the image file
+    image_bytes = await xray_scan_upload.read()
+    # Hatalar çağırana iletilir; uydurma sonuçla yorum üretilmez
+    return await evaluater.evaluate_image_bytes(image_bytes)
 
 @openai_router.post(
     '/interpret_xray_scan',
@@ -203,7 +353,8 @@ async def __get_xray_evaluation(xray_scan_upload: UploadFile) -> dict:
     responses={
         200: {"description": "Interpretation successful"},
         400: {"description": "Invalid input"},
-        500: {"description": "Internal server error"}
+        500: {"description": "Internal server error"},
+        503: {"description": "Model or LLM provider unavailable"}
     }
 )
 async def evaluate_xray_scan(
@@ -219,7 +370,7 @@ async def evaluate_xray_scan(
     Evaluate X-ray scan and provide diagnosis.
     - **xray_scan**: The X-ray scan file to be evaluated.
     - **Returns**: A JSON response with the evaluation result.
-    - **Raises**: 400 if the input is invalid, 500 for internal server errors.
+    - **Raises**: 400 if the input is invalid, 503 if the model or the LLM provider is unavailable, 500 for internal server errors.
     """
     try:
         # user_id parametresi zaten HSM tarafından encrypt edilmiş pseudo_user_id
@@ -227,49 +378,36 @@ async def evaluate_xray_scan(
         pseudo_user_id = user_id
         
         xray_scan_evaluation = await __get_xray_evaluation(xray_scan_upload)
-        
-        # Eğer chat işlemlerinde hata olursa, dummy mesaj döndür
-        try:
-            openai_repo = OpenAIRepository()
-            message = MessageToSend(
-                role=RoleEnum.user,
-                content=content,
-                user_id=pseudo_user_id,  # Use encrypted user ID directly
-                chat_id=chat_id,
-            )
-            chat_repo = ChatRepository()
-            previous_chat = chat_repo.load_chat_by_message(db, message)
-            if previous_chat is None:
-                previous_chat = ChatToSend(
-                    id=message.chat_id,
-                    user_id=message.user_id,
-                    messages=[message]
-                )
-            evaluation_chat = openai_repo.interpret_xray_scan_evaluation(
-                xray_scan_evaluation=xray_scan_evaluation,
-                previous_chat=previous_chat,
-                first_message_from_user=message,
-            )
-            inserted_chat = chat_repo.insert_chat(db, evaluation_chat)
-            if not inserted_chat.messages:
-                raise Exception("Messages list is empty")
-            return inserted_chat.messages[-1]
-        except Exception as chat_error:
-            print(f"Chat processing error: {chat_error}")
-            # Dummy mesaj döndür
-            dummy_message = MessageSent(
-                id=1,  # int tipinde
-                role=RoleEnum.assistant,
-                content=f"X-ray analizi tamamlandı. Sonuçlar: Cardiomegaly: %{int(xray_scan_evaluation.get('Cardiomegaly', 0.1) * 100)}, Hernia: %{int(xray_scan_evaluation.get('Hernia', 0.1) * 100)}, Infiltration: %{int(xray_scan_evaluation.get('Infiltration', 0.1) * 100)}",
-                user_id=pseudo_user_id,
-                chat_id=chat_id,
-                created_at=datetime.now(timezone.utc)
-            )
-            return dummy_message
-            
+
+        openai_repo = OpenAIRepository()
+        message = MessageToSend(
+            role=RoleEnum.user,
+            content=content,
+            user_id=pseudo_user_id,  # Use encrypted user ID directly
+            chat_id=chat_id,
+        )
+        chat_repo = ChatRepository()
+        # Önceki mesajlar, X-ray istemi ve yeni mesaj için yer bırakılarak bütçeye sığdırılır
+        previous_chat = await ChatContextRepository().build_context(
+            db,
+            message.chat_id,
+            message.user_id,
+            system_messages=[],
+            reserve_tokens=openai_repo.xray_prompt_tokens(xray_scan_evaluation, message),
+        )
+        evaluation_chat = await openai_repo.interpret_xray_scan_evaluation(
+            xray_scan_evaluation=xray_scan_evaluation,
+            previous_chat=previous_chat,
+            first_message_from_user=message,
+        )
+        # Değerlendirme, kullanıcı mesajı ve yorum sohbetin sonuna tek işlemde eklenir
+        inserted_messages = chat_repo.append_messages(db, evaluation_chat.messages)
+        return inserted_messages[-1]
     except ValueError as e:
         print(e)
         raise HTTPException(status_code=400, detail=str(e))
+    except (ModelUnavailableError, LLMUnavailableError) as e:
+        raise HTTPException(status_code=503, detail=e.message)
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}") 
\ No newline at end of file
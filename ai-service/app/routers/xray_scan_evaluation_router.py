@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException, File, UploadFile
-from fastapi.responses import JSONResponse
-import io
-import skimage.io
-from app.repositories.xray_scan_evaluation_repository import XRayScanEvaluationRepository
+from fastapi import APIRouter, HTTPException, File, Query, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List
+import json
+import time
+from app.repositories.xray_scan_evaluation_repository import XRAY_BATCH_MAX_SIZE, XRayScanEvaluationRepository
+from app.inference.weights import ModelUnavailableError
+from app.infrastructure.archives import iter_uploads
 
 xray_scan_evaluation_router = APIRouter(
     prefix="/xray_scan_evaluation",
@@ -19,7 +22,8 @@ xray_scan_evaluation_router = APIRouter(
     responses={
         200: {"description": "Evaluation successful"},
         400: {"description": "Invalid input"},
-        500: {"description": "Internal server error"}
+        500: {"description": "Internal server error"},
+        503: {"description": "Model unavailable"}
     }
 )
 async def evaluate_xray_scan(xray_scan_upload: UploadFile = File(...)):
@@ -27,19 +31,70 @@ async def evaluate_xray_scan(xray_scan_upload: UploadFile = File(...)):
     Evaluate X-ray scan and provide diagnosis.
     - **xray_scan**: The X-ray scan file to be evaluated.
     - **Returns**: A JSON response with the evaluation result.
-    - **Raises**: 400 if the input is invalid, 500 for internal server errors.
+    - **Raises**: 400 if the input is invalid, 500 for internal server errors, 503 if the model is unavailable.
     """
     evaluater = XRayScanEvaluationRepository()
     try:
         # Read the image file
         image_bytes = await xray_scan_upload.read()
-        xray_scan = skimage.io.imread(io.BytesIO(image_bytes))
-        if xray_scan is None:
-            raise ValueError("Error: Image is not valid.")
-        result = evaluater.evaluate_xray_scan(xray_scan)
+        result = await evaluater.evaluate_image_bytes(image_bytes)
         # Convert the result to a JSON response
         return JSONResponse(content=result, status_code=200)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except ModelUnavailableError as e:
+        raise HTTPException(status_code=503, detail=e.message)
     except Exception as e:
-        raise HTTPException(status_code=500, detail="Internal server error") 
\ No newline at end of file
+        print(f"Error in X-ray prediction: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error") 
+
+@xray_scan_evaluation_router.post(
+    '/evaluate_batch',
+    summary="Evaluate many X-ray scans",
+    description="Evaluate many X-ray scans, or tar/zip archives of scans, streaming one NDJSON line per image",
+    response_description="Evaluation stream",
+    status_code=200,
+    responses={
+        200: {"description": "NDJSON stream of per-image results, followed by a summary line"},
+        503: {"description": "Model unavailable"}
+    }
+)
+async def evaluate_xray_scan_batch(
+    xray_scan_uploads: List[UploadFile] = File(...),
+    batch_size: int = Query(XRAY_BATCH_MAX_SIZE, ge=1, le=64),
+):
+    """
+    Evaluate many X-ray scans in fixed-size batches. With XRAY_INFERENCE_MODE=queue
+    the images are evaluated as jobs by the inference workers, like /evaluate.
+    - **xray_scan_uploads**: Image files and/or .tar, .tar.gz, .zip archives of images.
+    - **batch_size**: Images per forward pass.
+    - **Returns**: NDJSON; one {"index", "name", "result"|"error"} line per image as each batch finishes, then {"summary": ...}.
+    - **Raises**: 503 if the model is unavailable.
+    """
+    evaluater = XRayScanEvaluationRepository()
+    try:
+        evaluater.model_version
+    except ModelUnavailableError as e:
+        raise HTTPException(status_code=503, detail=e.message)
+
+    async def stream():
+        started = time.perf_counter()
+        count = errors = 0
+        try:
+            async for item in evaluater.evaluate_stream(iter_uploads(xray_scan_uploads), batch_size):
+                errors += "error" in item
+                yield json.dumps({"index": count, **item}) + "\n"
+                count += 1
+        except Exception as e:
+            # Başlıklar gönderildiği için hata akışın son satırı olarak bildirilir
+            print(f"Error in batch X-ray evaluation: {e}")
+            yield json.dumps({"error": str(e), "fatal": True}) + "\n"
+        elapsed = time.perf_counter() - started
+        yield json.dumps({"summary": {
+            "count": count,
+            "errors": errors,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "images_per_second": round(count / elapsed, 2) if elapsed else None,
+        }}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -33,6 +33,9 @@ class ChatToLoad(BaseModel):
     id: str
     user_id: str
     message_count_limit: int = 10
+    # Keyset sayfalama: yalnızca bu id'lerden önceki / sonraki mesajlar
+    before_id: Optional[int] = None
+    after_id: Optional[int] = None
 
 
 class ChatToSend(ChatToLoad):
@@ -58,4 +61,5 @@ class ChatToSend(ChatToLoad):
 
 
 class ChatLoaded(ChatToSend):
-    pass 
\ No newline at end of file
+    # Sayfanın ötesinde (before_id ile daha eski, after_id ile daha yeni) mesaj var mı
+    has_more: bool = False 
\ No newline at end of file
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Optional
+from enum import Enum
+
+
+class BackendEnum(str, Enum):
+    eager = "eager"
+    torchscript = "torchscript"
+    onnx = "onnx"
+    int8 = "int8"
+
+
+class ModelSwapRequest(BaseModel):
+    path: str
+    checksum: Optional[str] = None
+    backend: BackendEnum = BackendEnum.eager
+    export_dir: Optional[str] = None
@@ -0,0 +1,84 @@
+"""
+Latency, throughput and RSS per inference backend.
+
+    cd ai-service && python -m app.inference.export --output-dir DIR
+    cd ai-service && python -m benchmarks.bench_backends [--export-dir DIR]
+
+Each backend runs in its own process so peak RSS is measured in isolation.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from app.inference.backends import BACKENDS, XRAY_EXPORT_DIR
+
+
+def run_single(iterations: int, batch_size: int) -> dict:
+    from app.repositories.xray_scan_evaluation_repository import XRayScanEvaluationRepository
+
+    repository = XRayScanEvaluationRepository()
+    start = time.perf_counter()
+    repository.predict_batch(np.zeros((1, 1, 224, 224), np.float32))
+    load_ms = (time.perf_counter() - start) * 1000
+
+    rng = np.random.default_rng(0)
+    single = rng.uniform(-1024, 1024, (1, 1, 224, 224)).astype(np.float32)
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        repository.predict_batch(single)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    batch = rng.uniform(-1024, 1024, (batch_size, 1, 224, 224)).astype(np.float32)
+    start = time.perf_counter()
+    for _ in range(max(1, iterations // batch_size)):
+        repository.predict_batch(batch)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "load_ms": load_ms,
+        "p50_ms": statistics.median(latencies),
+        "throughput": max(1, iterations // batch_size) * batch_size / elapsed,
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--export-dir", default=XRAY_EXPORT_DIR)
+    parser.add_argument("--iterations", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.iterations, args.batch_size)))
+        return
+
+    print(f"{'backend':<12} {'load ms':>8} {'p50 ms':>8} {'img/s':>8} {'RSS MB':>8}")
+    for backend in BACKENDS:
+        env = dict(os.environ, XRAY_MODEL_BACKEND=backend, XRAY_EXPORT_DIR=args.export_dir)
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_backends", "--single", backend,
+             "--iterations", str(args.iterations), "--batch-size", str(args.batch_size)],
+            env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"{backend:<12} failed: {proc.stderr.strip().splitlines()[-1:]}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(
+            f"{backend:<12} {result['load_ms']:>8.0f} {result['p50_ms']:>8.1f} "
+            f"{result['throughput']:>8.1f} {result['rss_mb']:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
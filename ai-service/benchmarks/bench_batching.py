@@ -0,0 +1,82 @@
+"""
+Throughput and tail latency of the micro-batching scheduler.
+
+    cd ai-service && python -m benchmarks.bench_batching [--requests 256]
+
+Uses a randomly initialised DenseNet with the same 3-class head as
+model.pth, so it runs offline and has the same compute cost.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torchxrayvision as xrv
+
+from app.inference.batcher import MicroBatcher
+
+
+def build_model() -> nn.Module:
+    model = xrv.models.DenseNet(num_classes=15)
+    model.classifier = nn.Linear(model.classifier.in_features, 3)
+    return model.eval()
+
+
+async def run_load(batcher: MicroBatcher, concurrency: int, total: int) -> dict:
+    sample = np.random.uniform(-1024, 1024, (1, 224, 224)).astype(np.float32)
+    latencies = []
+    remaining = total
+
+    async def client():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            await batcher.submit(sample)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "throughput": total / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    args = parser.parse_args()
+
+    model = build_model()
+    loop = asyncio.get_running_loop()
+
+    def predict(batch: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            return torch.sigmoid(model(torch.from_numpy(batch))).numpy()
+
+    async def run_batch(batch: np.ndarray) -> np.ndarray:
+        return await loop.run_in_executor(None, predict, batch)
+
+    print(f"torch threads: {torch.get_num_threads()}")
+    print(f"{'max_batch':>9} {'wait_ms':>7} {'conc':>5} {'img/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for max_batch_size, max_wait_ms in [(1, 0), (8, 5), (16, 10)]:
+        for concurrency in args.concurrency:
+            batcher = MicroBatcher(run_batch, max_batch_size, max_wait_ms, name=f"bench{max_batch_size}")
+            result = await run_load(batcher, concurrency, args.requests)
+            await batcher.close()
+            print(
+                f"{max_batch_size:>9} {max_wait_ms:>7} {concurrency:>5} "
+                f"{result['throughput']:>8.1f} {result['p50']:>8.1f} {result['p99']:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
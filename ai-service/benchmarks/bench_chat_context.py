@@ -0,0 +1,101 @@
+"""
+Prompt size and LLM latency of follow-up messages as chats grow: the whole
+history versus the token-budgeted context with a rolling summary. Uses the
+stub LLM server from bench_llm_client, whose latency grows with prompt size.
+
+    cd ai-service && python -m benchmarks.bench_chat_context [--lengths 10 100 1000] [--budget 8000]
+
+Needs the database configured for the service (DB_* variables).
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer
+
+from sqlalchemy import delete, insert
+
+from app.db.base import SessionLocal, init_db
+from app.db.models.chat_summary_model import ChatSummaryModel
+from app.db.models.message_model import MessageModel
+from app.infrastructure.tokens import count_message_tokens
+from benchmarks.bench_llm_client import StubState, make_handler
+
+TURN = "Göğüs ağrım ve nefes darlığım var, X-ray sonucumda kardiyomegali olasılığı yüksek çıktı. " * 6
+
+
+def create_chat(db, length: int) -> str:
+    chat_id = f"bench-context-{uuid.uuid4()}"
+    rows = [{"user_id": "bench_user", "chat_id": chat_id, "role": "system", "content": "Sen bir tıbbi asistansın.", "seq": 1}]
+    rows += [
+        {"user_id": "bench_user", "chat_id": chat_id, "role": "user" if i % 2 == 0 else "assistant", "content": TURN,
+         "seq": i + 2}
+        for i in range(length)
+    ]
+    db.execute(insert(MessageModel), rows)
+    db.commit()
+    return chat_id
+
+
+async def follow_up(repository, openai_repository, db, chat_id: str, full_history: bool):
+    if full_history:
+        rows = db.query(MessageModel).filter(MessageModel.chat_id == chat_id).order_by(MessageModel.id).all()
+        messages = [{"role": m.role, "content": m.content} for m in rows]
+    else:
+        context = await repository.build_context(db, chat_id, "bench_user")
+        messages = context.to_llm_chat()
+    started = time.perf_counter()
+    await openai_repository.create_completion(messages, max_completion_tokens=50)
+    return count_message_tokens(messages), (time.perf_counter() - started) * 1000
+
+
+async def run(lengths, turns_per_chat: int):
+    from app.repositories.chat_context_repository import ChatContextRepository
+    from app.repositories.openai_repository import OpenAIRepository
+
+    repository, openai_repository = ChatContextRepository(), OpenAIRepository()
+    db = SessionLocal()
+    chat_ids = []
+    print(f"{'messages':>8} {'mode':<10} {'prompt tokens':>14} {'LLM ms':>8}")
+    try:
+        for length in lengths:
+            chat_id = create_chat(db, length)
+            chat_ids.append(chat_id)
+            tokens, ms = await follow_up(repository, openai_repository, db, chat_id, full_history=True)
+            print(f"{length:>8} {'full':<10} {tokens:>14} {ms:>8.0f}")
+            for _ in range(turns_per_chat):
+                tokens, ms = await follow_up(repository, openai_repository, db, chat_id, full_history=False)
+                # Arka plandaki özetleme bir sonraki tura yetişsin
+                await asyncio.gather(*repository._tasks)
+            print(f"{length:>8} {'budgeted':<10} {tokens:>14} {ms:>8.0f}")
+    finally:
+        db.execute(delete(MessageModel).where(MessageModel.chat_id.in_(chat_ids)))
+        db.execute(delete(ChatSummaryModel).where(ChatSummaryModel.chat_id.in_(chat_ids)))
+        db.commit()
+        db.close()
+        await openai_repository.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--budget", type=int, default=8000)
+    parser.add_argument("--turns", type=int, default=2, help="Budgeted follow-ups per chat; the first one folds")
+    args = parser.parse_args()
+
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(StubState(50, prompt_token_ms=0.02)))
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    # app.db modülü .env.prod'u yüklediği için stub ayarları ondan sonra yapılır
+    os.environ["AZURE_OPENAI_ENDPOINT"] = f"http://127.0.0.1:{stub.server_port}/"
+    os.environ["AZURE_OPENAI_API_KEY"] = "stub"
+    os.environ["LLM_CONTEXT_TOKEN_BUDGET"] = str(args.budget)
+
+    init_db()
+    asyncio.run(run(args.lengths, args.turns))
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
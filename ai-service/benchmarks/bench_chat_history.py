@@ -0,0 +1,136 @@
+"""
+`/openai/load_chat` reads on a long chat: the previous path (single-column
+indexes, ORM entities converted through `to_dict` ISO strings) versus the
+(chat_id, user_id, id) index with column tuples validated `from_attributes`,
+for several page sizes, plus paging through the whole chat with `before_id`.
+
+    cd ai-service && python -m benchmarks.bench_chat_history [--messages 10000] [--other-messages 500000] [--repeat 20]
+
+Messages of other chats are written after the benchmarked chat, as in a
+table where the chat being read is not the newest one. With few other
+messages the planner may prefer a backward primary-key scan for small
+pages, which makes both paths look alike.
+
+Needs the database configured for the service (DB_* variables). The previous
+index set is recreated inside a transaction that is rolled back, which locks
+the messages table while the benchmark runs.
+"""
+import argparse
+import statistics
+import time
+import uuid
+
+from sqlalchemy import delete, insert, text
+
+from app.db.base import SessionLocal, init_db
+from app.db.models.message_model import MessageModel
+from app.repositories.chat_repository import ChatRepository
+from app.schemes.message_schemes import ChatToLoad, MessageSent, RoleEnum
+
+TURN = "Göğüs ağrım ve nefes darlığım var, X-ray sonucumda kardiyomegali olasılığı yüksek çıktı."
+
+
+def create_chat(db, length: int) -> str:
+    chat_id = f"bench-history-{uuid.uuid4()}"
+    rows = [{"user_id": "bench_user", "chat_id": chat_id, "role": "system", "content": "Sen bir tıbbi asistansın.", "seq": 1}]
+    rows += [
+        {"user_id": "bench_user", "chat_id": chat_id, "role": "user" if i % 2 == 0 else "assistant", "content": TURN,
+         "seq": i + 2}
+        for i in range(length)
+    ]
+    db.execute(insert(MessageModel), rows)
+    db.commit()
+    return chat_id
+
+
+def create_other_chats(db, length: int, per_chat: int = 100) -> str:
+    prefix = f"bench-history-other-{uuid.uuid4()}"
+    for start in range(0, length, 10000):
+        db.execute(insert(MessageModel), [
+            {"user_id": "bench_user", "chat_id": f"{prefix}-{i // per_chat}", "role": "user", "content": TURN,
+             "seq": i % per_chat + 1}
+            for i in range(start, min(length, start + 10000))
+        ])
+    db.commit()
+    return prefix
+
+
+def legacy_load(db, chat: ChatToLoad):
+    limit = chat.message_count_limit if chat.message_count_limit >= 0 else 1000000
+    db_messages = db.query(MessageModel).filter(
+        MessageModel.chat_id == chat.id,
+        MessageModel.user_id == chat.user_id,
+        MessageModel.role != RoleEnum.system,
+    ).order_by(MessageModel.id.desc()).limit(limit).all()
+    messages = [MessageSent.model_validate(m.to_dict()) for m in reversed(db_messages)]
+    # Kimlik haritası sonraki ölçümü hızlandırmasın
+    db.expunge_all()
+    return messages
+
+
+def timed(repeat: int, load) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        load()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def page_through(repository: ChatRepository, db, chat_id: str, page_size: int) -> int:
+    pages, before_id = 0, None
+    while True:
+        page = repository.load_chat(db, ChatToLoad(
+            id=chat_id, user_id="bench_user", message_count_limit=page_size, before_id=before_id,
+        ))
+        pages += 1
+        if not page.has_more:
+            return pages
+        before_id = page.messages[0].id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--other-messages", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limits", type=int, nargs="+", default=[10, 100, 1000, -1])
+    args = parser.parse_args()
+
+    init_db()
+    repository = ChatRepository()
+    db = SessionLocal()
+    chat_id = create_chat(db, args.messages)
+    other_prefix = create_other_chats(db, args.other_messages)
+    db.execute(text("ANALYZE messages"))
+    db.commit()
+    try:
+        before = {}
+        # Önceki indeksler: yalnızca tek sütunlu chat_id / user_id
+        db.execute(text("DROP INDEX ix_messages_chat_id_user_id_id"))
+        db.execute(text("CREATE INDEX ix_messages_chat_id ON messages (chat_id)"))
+        for limit in args.limits:
+            chat = ChatToLoad(id=chat_id, user_id="bench_user", message_count_limit=limit)
+            before[limit] = timed(args.repeat, lambda: legacy_load(db, chat))
+        db.rollback()
+
+        print(f"{'limit':>6} {'before ms':>10} {'after ms':>9}")
+        for limit in args.limits:
+            chat = ChatToLoad(id=chat_id, user_id="bench_user", message_count_limit=limit)
+            after = timed(args.repeat, lambda: repository.load_chat(db, chat))
+            print(f"{'all' if limit < 0 else limit:>6} {before[limit]:>10.2f} {after:>9.2f}")
+
+        started = time.perf_counter()
+        pages = page_through(repository, db, chat_id, 100)
+        print(f"paged through {args.messages} messages with before_id: {pages} pages, "
+              f"{(time.perf_counter() - started) * 1000:.0f} ms")
+    finally:
+        db.rollback()
+        db.execute(delete(MessageModel).where(MessageModel.chat_id == chat_id))
+        db.execute(delete(MessageModel).where(MessageModel.chat_id.startswith(other_prefix)))
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
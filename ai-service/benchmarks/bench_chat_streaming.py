@@ -0,0 +1,102 @@
+"""
+Time to first token of `/openai/message` versus `/openai/message/stream`,
+against the local stub LLM server from bench_llm_client, plus a check that
+a client disconnect cancels the upstream completion.
+
+    cd ai-service && python -m benchmarks.bench_chat_streaming [--requests 10] [--tokens 100] [--token-ms 20]
+
+Needs the database configured for the service (DB_* variables).
+"""
+import argparse
+import os
+import socket
+import statistics
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from app.db.base import init_db
+from app.routers.openai_router import openai_router
+from benchmarks.bench_llm_client import StubState, make_handler
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def message(content: str) -> dict:
+    return {"content": content, "role": "user", "user_id": "bench_user", "chat_id": f"bench-{uuid.uuid4()}"}
+
+
+def measure(client: httpx.Client, path: str, stream: bool):
+    started = time.perf_counter()
+    if not stream:
+        client.post(path, json=message("Hello")).raise_for_status()
+        elapsed = (time.perf_counter() - started) * 1000
+        return elapsed, elapsed
+    ttft = None
+    with client.stream("POST", path, json=message("Hello")) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if ttft is None and line == "event: token":
+                ttft = (time.perf_counter() - started) * 1000
+            assert line != "event: error", "streamed completion failed"
+    return ttft, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--latency-ms", type=float, default=200, help="Stub delay before the first token")
+    args = parser.parse_args()
+
+    state = StubState(args.latency_ms, tokens=args.tokens, token_ms=args.token_ms)
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    # app.db modülü .env.prod'u yüklediği için stub ayarları ondan sonra yapılır
+    os.environ["AZURE_OPENAI_ENDPOINT"] = f"http://127.0.0.1:{stub.server_port}/"
+    os.environ["AZURE_OPENAI_API_KEY"] = "stub"
+
+    init_db()
+    app = FastAPI()
+    app.include_router(openai_router)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    print(f"{'endpoint':<24} {'TTFT p50 ms':>12} {'total p50 ms':>13}")
+    with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+        for path, stream in (("/openai/message", False), ("/openai/message/stream", True)):
+            timings = [measure(client, path, stream) for _ in range(args.requests)]
+            ttft = statistics.median(t for t, _ in timings)
+            total = statistics.median(t for _, t in timings)
+            print(f"{path:<24} {ttft:>12.1f} {total:>13.1f}")
+
+        # İlk token'dan sonra bağlantıyı kes; stub üretimin yarıda kesildiğini görmeli
+        before = state.cancelled_streams
+        with client.stream("POST", "/openai/message/stream", json=message("Hello")) as response:
+            for line in response.iter_lines():
+                if line == "event: token":
+                    break
+        deadline = time.time() + args.tokens * args.token_ms / 1000 + 5
+        while state.cancelled_streams == before and time.time() < deadline:
+            time.sleep(0.05)
+        print(f"upstream cancelled after client disconnect: {state.cancelled_streams > before}")
+
+    server.should_exit = True
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Chat write latency and row counts: the previous write path (one INSERT ...
+ON CONFLICT DO NOTHING and commit per message, a full re-query of the chat,
+and a commit + refresh per turn message, on a table without a uniqueness
+constraint) versus the seq-based multi-row INSERT ... RETURNING with one
+transaction per turn. Each chat is created, `--turns` follow-up turns are
+written, then the new-chat write is repeated as a client retry would.
+
+    cd ai-service && python -m benchmarks.bench_chat_writes [--chats 50] [--turns 10]
+
+Needs the database configured for the service (DB_* variables). The previous
+path writes to a temporary table with the old schema.
+"""
+import argparse
+import statistics
+import time
+import uuid
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, Text, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.db.base import SessionLocal, init_db
+from app.db.models.message_model import MessageModel
+from app.repositories.chat_repository import ChatRepository
+from app.schemes.message_schemes import ChatToSend, MessageToSend, RoleEnum
+
+legacy_messages = Table(
+    "bench_legacy_messages",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("user_id", String, nullable=False),
+    Column("chat_id", String, nullable=False),
+    Column("role", String(50), nullable=False),
+    Column("content", Text, nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    prefixes=["TEMPORARY"],
+)
+
+
+def new_chat(chat_id: str) -> ChatToSend:
+    return ChatToSend(id=chat_id, user_id="bench_user", messages=[
+        MessageToSend(role=RoleEnum.system, content="Sen bir tıbbi asistansın.", chat_id=chat_id, user_id="bench_user"),
+        MessageToSend(role=RoleEnum.user, content="Merhaba", chat_id=chat_id, user_id="bench_user"),
+        MessageToSend(role=RoleEnum.assistant, content="Merhaba, nasıl yardımcı olabilirim?", chat_id=chat_id, user_id="bench_user"),
+    ])
+
+
+def turn(chat_id: str, index: int):
+    return [
+        MessageToSend(role=RoleEnum.user, content=f"Soru {index}", chat_id=chat_id, user_id="bench_user"),
+        MessageToSend(role=RoleEnum.assistant, content=f"Yanıt {index}", chat_id=chat_id, user_id="bench_user"),
+    ]
+
+
+def legacy_insert_message(db, message: MessageToSend) -> None:
+    # db.add + commit + refresh
+    id = db.execute(insert(legacy_messages).values(
+        user_id=message.user_id, chat_id=message.chat_id, role=message.role.value, content=message.content,
+    ).returning(legacy_messages.c.id)).scalar()
+    db.commit()
+    db.execute(select(legacy_messages).where(legacy_messages.c.id == id)).first()
+
+
+def legacy_insert_chat(db, chat: ChatToSend) -> None:
+    for message in chat.messages:
+        db.execute(insert(legacy_messages).values(
+            user_id=message.user_id, chat_id=chat.id, role=message.role.value, content=message.content,
+        ).on_conflict_do_nothing())
+    db.commit()
+    db.execute(select(legacy_messages).where(
+        legacy_messages.c.chat_id == chat.id, legacy_messages.c.user_id == chat.user_id,
+    ).order_by(legacy_messages.c.id)).all()
+
+
+def run(db, chats: int, turns: int, legacy: bool):
+    repository = ChatRepository()
+    chat_ms, turn_ms, chat_ids = [], [], []
+    for _ in range(chats):
+        chat_id = f"bench-writes-{uuid.uuid4()}"
+        chat_ids.append(chat_id)
+        started = time.perf_counter()
+        if legacy:
+            # /new_chat: sohbet (sistem + kullanıcı), ardından ayrı commit ile yanıt
+            chat = new_chat(chat_id)
+            legacy_insert_chat(db, ChatToSend(id=chat_id, user_id="bench_user", messages=chat.messages[:2]))
+            legacy_insert_message(db, chat.messages[2])
+        else:
+            repository.insert_chat(db, new_chat(chat_id))
+        chat_ms.append((time.perf_counter() - started) * 1000)
+
+        for index in range(turns):
+            started = time.perf_counter()
+            if legacy:
+                for message in turn(chat_id, index):
+                    legacy_insert_message(db, message)
+            else:
+                repository.append_messages(db, turn(chat_id, index))
+            turn_ms.append((time.perf_counter() - started) * 1000)
+
+        # İstemci yeniden denemesi: aynı yeni sohbet tekrar yazılır
+        if legacy:
+            legacy_insert_chat(db, new_chat(chat_id))
+        else:
+            repository.insert_chat(db, new_chat(chat_id))
+
+    table = legacy_messages if legacy else MessageModel.__table__
+    rows = db.execute(select(func.count()).select_from(table).where(table.c.chat_id.in_(chat_ids))).scalar()
+    return chat_ms, turn_ms, rows, chat_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=10)
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    legacy_messages.create(db.connection())
+    db.commit()
+    expected = args.chats * (3 + 2 * args.turns)
+    print(f"{'path':<10} {'new chat p50':>13} {'turn p50 ms':>12} {'turn p99 ms':>12} {'rows':>7} {'expected':>9}")
+    try:
+        for legacy in (True, False):
+            chat_ms, turn_ms, rows, chat_ids = run(db, args.chats, args.turns, legacy)
+            turn_ms.sort()
+            print(
+                f"{'before' if legacy else 'after':<10} {statistics.median(chat_ms):>13.2f} "
+                f"{statistics.median(turn_ms):>12.2f} {turn_ms[int(0.99 * (len(turn_ms) - 1))]:>12.2f} "
+                f"{rows:>7} {expected:>9}"
+            )
+            if not legacy:
+                db.execute(delete(MessageModel).where(MessageModel.chat_id.in_(chat_ids)))
+                db.commit()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
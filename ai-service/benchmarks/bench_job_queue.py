@@ -0,0 +1,73 @@
+"""
+Claim throughput of the Postgres X-ray job queue with several concurrent
+claimers, and a check that SKIP LOCKED never hands the same job to two of
+them. No model is loaded; claimed jobs are finished with a dummy result.
+
+    cd ai-service && python -m benchmarks.bench_job_queue [--jobs 2000] [--claimers 1 4 8]
+
+Needs the database configured for the service (DB_* variables).
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import delete
+
+from app.db.base import SessionLocal, init_db
+from app.db.models.xray_job_model import XRayJobModel
+from app.repositories.xray_job_repository import XRayJobRepository
+
+BENCH_VERSION = "bench"
+
+
+def run(jobs: XRayJobRepository, total: int, claimers: int, batch_size: int) -> float:
+    for _ in range(total):
+        jobs.submit(b"\0" * 1024, BENCH_VERSION)
+
+    claimed = Counter()
+
+    def claimer(worker_id: str):
+        while True:
+            batch = jobs.claim(batch_size, worker_id)
+            if not batch:
+                return
+            claimed.update(job_id for job_id, _ in batch)
+            jobs.finish({job_id: {} for job_id, _ in batch}, {}, BENCH_VERSION)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=claimer, args=(f"bench-{i}",)) for i in range(claimers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    duplicates = sum(1 for count in claimed.values() if count > 1)
+    assert len(claimed) >= total and not duplicates, f"{duplicates} jobs claimed twice"
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--claimers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    init_db()
+    jobs = XRayJobRepository()
+    print(f"{'claimers':>8} {'jobs/sec':>10}")
+    try:
+        for claimers in args.claimers:
+            throughput = run(jobs, args.jobs, claimers, args.batch_size)
+            print(f"{claimers:>8} {throughput:>10.0f}")
+    finally:
+        db = SessionLocal()
+        db.execute(delete(XRayJobModel).where(XRayJobModel.requested_model_version == BENCH_VERSION))
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Azure OpenAI client against a local stub server: a new synchronous client per
+call (the previous behaviour, run in threads) versus the shared pooled async
+client, then the retry path with 429 + Retry-After responses.
+
+    cd ai-service && python -m benchmarks.bench_llm_client [--calls 200] [--concurrency 20] [--latency-ms 50]
+
+No network access or API key is needed; the stub counts TCP connections
+so connection reuse is visible even without TLS.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# app.db modülü .env.prod'u yüklediği için uygulama önce içe aktarılır, stub ayarları sonra yapılır
+from app.infrastructure.metrics import metrics
+from app.repositories import openai_repository
+from app.repositories.openai_repository import OpenAIRepository
+
+
+class StubState:
+    def __init__(self, latency_ms: float, tokens: int = 3, token_ms: float = 0.0, prompt_token_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        # Prompt işleme süresi prompt uzunluğuyla artar
+        self.prompt_token_ms = prompt_token_ms
+        # Tamamlama `tokens` parçadan oluşur, her biri `token_ms` sürer
+        self.tokens = tokens
+        self.token_ms = token_ms
+        self.rate_limit_every = 0
+        self.requests = 0
+        self.cancelled_streams = 0
+        self.connections = set()
+        self.lock = threading.Lock()
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with state.lock:
+                state.requests += 1
+                state.connections.add(self.client_address)
+                throttled = state.rate_limit_every and state.requests % state.rate_limit_every == 0
+            prompt_tokens = sum(len(m["content"]) // 4 for m in body["messages"])
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": state.tokens,
+                     "total_tokens": prompt_tokens + state.tokens}
+            if throttled:
+                payload = json.dumps({"error": {"code": "429", "message": "Rate limit"}}).encode()
+                self.send_response(429)
+                self.send_header("retry-after-ms", "200")
+            elif body.get("stream"):
+                return self.stream(body, usage)
+            else:
+                time.sleep((state.latency_ms + prompt_tokens * state.prompt_token_ms + state.tokens * state.token_ms) / 1000)
+                payload = json.dumps({
+                    "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "stub" + " answer" * (state.tokens - 1)}}],
+                    "usage": usage,
+                }).encode()
+                self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def stream(self, body: dict, usage: dict):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def event(data: dict):
+                chunk = f"data: {json.dumps(data)}\n\n".encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.flush()
+
+            base = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": body["model"]}
+            try:
+                time.sleep((state.latency_ms + usage["prompt_tokens"] * state.prompt_token_ms) / 1000)
+                for i in range(state.tokens):
+                    time.sleep(state.token_ms / 1000)
+                    event({**base, "choices": [{"index": 0, "finish_reason": None,
+                                                "delta": {"role": "assistant", "content": "stub" if i == 0 else " answer"}}]})
+                event({**base, "choices": [], "usage": usage})
+                chunk = b"data: [DONE]\n\n"
+                self.wfile.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(chunk), chunk))
+            except (BrokenPipeError, ConnectionResetError):
+                # İstemci akışı kapattı; üretim burada durur
+                with state.lock:
+                    state.cancelled_streams += 1
+                self.close_connection = True
+
+    return Handler
+
+
+MESSAGES = [{"role": "system", "content": "You are a helpful assistant. " * 20},
+            {"role": "user", "content": "Summarize the findings."}]
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return statistics.median(timings), timings[int(0.99 * (len(timings) - 1))]
+
+
+async def bench_per_call_client(calls: int, concurrency: int):
+    import openai
+
+    def call():
+        client = openai.AzureOpenAI(
+            api_key="stub", api_version=os.environ["AZURE_OPENAI_API_VERSION"],
+            azure_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
+        )
+        started = time.perf_counter()
+        client.chat.completions.create(messages=MESSAGES, max_completion_tokens=50, model="stub")
+        return (time.perf_counter() - started) * 1000
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await loop.run_in_executor(None, call)
+
+    return await asyncio.gather(*(one() for _ in range(calls)))
+
+
+async def bench_shared_client(calls: int, concurrency: int):
+    repository = OpenAIRepository()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await repository.create_completion(MESSAGES, max_completion_tokens=50)
+            return (time.perf_counter() - started) * 1000
+
+    try:
+        return await asyncio.gather(*(one() for _ in range(calls)))
+    finally:
+        await repository.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    state = StubState(args.latency_ms)
+    ThreadingHTTPServer.request_queue_size = 128
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["AZURE_OPENAI_ENDPOINT"] = f"http://127.0.0.1:{server.server_port}/"
+    os.environ["AZURE_OPENAI_API_KEY"] = "stub"
+    os.environ.setdefault("AZURE_OPENAI_API_VERSION", "2024-12-01-preview")
+    openai_repository.AZURE_OPENAI_BACKOFF_MAX_SECONDS = 1
+
+    print(f"{'client':<18} {'calls/sec':>10} {'p50 ms':>8} {'p99 ms':>8} {'connections':>12}")
+    for name, bench in (("per-call sync", bench_per_call_client), ("shared async", bench_shared_client)):
+        state.requests, state.connections = 0, set()
+        started = time.perf_counter()
+        timings = asyncio.run(bench(args.calls, args.concurrency))
+        elapsed = time.perf_counter() - started
+        p50, p99 = percentiles(timings)
+        print(f"{name:<18} {args.calls / elapsed:>10.1f} {p50:>8.1f} {p99:>8.1f} {len(state.connections):>12}")
+
+    # Her 5. istek 429 + retry-after-ms: 200 döner; tüm çağrılar yine de başarılı olmalı
+    state.requests, state.rate_limit_every = 0, 5
+    timings = asyncio.run(bench_shared_client(args.calls // 4, args.concurrency))
+    counters = metrics.snapshot()["counters"]
+    print(
+        f"with 429s: {len(timings)} calls ok, {counters.get('llm_rate_limited', 0):.0f} rate limited, "
+        f"{counters.get('llm_retries', 0):.0f} retries, p99 {percentiles(timings)[1]:.0f} ms"
+    )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
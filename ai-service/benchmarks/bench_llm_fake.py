@@ -0,0 +1,107 @@
+"""
+Offline throughput and tail latency of the chat completion path with the
+fake LLM provider (LLM_PROVIDER=fake): non-streaming latency, streaming time
+to first token, and the retry path under injected 429/500 errors.
+
+    cd ai-service && python -m benchmarks.bench_llm_fake [--calls 500] [--concurrency 50] [--latency-ms 300] \
+        [--distribution lognormal] [--sigma 0.5] [--error-rate 0.05] [--rate-limit-rate 0.05]
+
+No network access, API key or database is needed.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.infrastructure.llm_providers import FakeLLMProvider, LLMUnavailableError
+from app.infrastructure.metrics import metrics
+from app.repositories.openai_repository import OpenAIRepository
+from app.schemes.message_schemes import ChatToSend, MessageToSend, RoleEnum
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def chat(index: int) -> ChatToSend:
+    return ChatToSend(id=f"bench-{index}", user_id="bench_user", messages=[
+        MessageToSend(role=RoleEnum.user, content=f"Soru {index}", chat_id=f"bench-{index}", user_id="bench_user"),
+    ])
+
+
+async def run(repo: OpenAIRepository, calls: int, concurrency: int, stream: bool):
+    semaphore = asyncio.Semaphore(concurrency)
+    timings, failures = [], 0
+
+    async def one(index: int):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if stream:
+                    ttft = None
+                    async for _ in repo.stream_chat_completion(chat(index)):
+                        if ttft is None:
+                            ttft = (time.perf_counter() - started) * 1000
+                else:
+                    await repo.get_chat_completion(chat(index))
+                    ttft = None
+            except LLMUnavailableError:
+                failures += 1
+                return
+            timings.append((ttft, (time.perf_counter() - started) * 1000))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(calls)))
+    return timings, failures, time.perf_counter() - started
+
+
+def report(label: str, timings, failures: int, elapsed: float) -> None:
+    totals = [total for _, total in timings]
+    ttfts = [ttft for ttft, _ in timings if ttft is not None]
+    ttft = f"{statistics.median(ttfts):>9.0f} {percentile(ttfts, 0.99):>9.0f}" if ttfts else f"{'-':>9} {'-':>9}"
+    print(
+        f"{label:<22} {len(timings) / elapsed:>8.1f} {statistics.median(totals):>9.0f} "
+        f"{percentile(totals, 0.99):>9.0f} {ttft} {failures:>6}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--distribution", default="lognormal")
+    parser.add_argument("--sigma", type=float, default=0.5)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    def provider(error_rate: float = 0.0, rate_limit_rate: float = 0.0) -> FakeLLMProvider:
+        return FakeLLMProvider(
+            latency_ms=args.latency_ms,
+            distribution=args.distribution,
+            sigma=args.sigma,
+            token_ms=args.token_ms,
+            completion_tokens=args.tokens,
+            error_rate=error_rate,
+            rate_limit_rate=rate_limit_rate,
+        )
+
+    repo = OpenAIRepository()
+    print(f"{'mode':<22} {'calls/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'ttft p50':>9} {'ttft p99':>9} {'failed':>6}")
+    repo._provider = provider()
+    report("completion", *await run(repo, args.calls, args.concurrency, stream=False))
+    report("stream", *await run(repo, args.calls, args.concurrency, stream=True))
+
+    repo._provider = provider(args.error_rate, args.rate_limit_rate)
+    retries = metrics.counter("llm_retries").snapshot()
+    report("completion + errors", *await run(repo, args.calls, args.concurrency, stream=False))
+    print(f"retries: {metrics.counter('llm_retries').snapshot() - retries:.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
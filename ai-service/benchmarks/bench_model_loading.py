@@ -0,0 +1,104 @@
+"""
+Per-worker load time and memory of copying the checkpoint into the heap
+(`torch.load`, before) versus memory-mapping it (`torch.load(mmap=True)` +
+`load_state_dict(assign=True)`, after).
+
+    cd ai-service && python -m benchmarks.bench_model_loading [--checkpoint /app/models/model.pth] [--workers 4]
+
+Workers of one method run concurrently, so PSS (proportional set size) shows
+how much of each worker's RSS is shared with the others.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from app.inference.registry import XRAY_MODEL_DIR
+
+MODEL_PATH = os.path.join(XRAY_MODEL_DIR, "model.pth")
+
+
+def memory_mb() -> dict:
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                values[key] = int(rest.split()[0]) / 1024
+    return {
+        "rss_mb": values["Rss"],
+        "pss_mb": values["Pss"],
+        "private_mb": values["Private_Clean"] + values["Private_Dirty"],
+    }
+
+
+def run_single(method: str, checkpoint: str) -> None:
+    import numpy as np
+    import torch
+    import torch.nn as nn
+    import torchxrayvision as xrv
+    from app.inference.registry import load_state_dict
+
+    start = time.perf_counter()
+    if method == "copy":
+        model = xrv.models.DenseNet(num_classes=15)
+        model.classifier = nn.Linear(model.classifier.in_features, 3)
+        model.load_state_dict(torch.load(checkpoint, map_location="cpu"))
+    else:
+        with torch.device("meta"):
+            model = xrv.models.DenseNet(num_classes=15)
+            model.classifier = nn.Linear(model.classifier.in_features, 3)
+        model.load_state_dict(load_state_dict(checkpoint), assign=True)
+    model.eval()
+    with torch.no_grad():
+        model(torch.from_numpy(np.zeros((1, 1, 224, 224), np.float32)))
+    load_ms = (time.perf_counter() - start) * 1000
+
+    # Diğer worker'lar da yüklenene kadar bekle, PSS paylaşımı yansıtsın
+    sys.stdout.write("loaded\n")
+    sys.stdout.flush()
+    sys.stdin.readline()
+    print(json.dumps(dict(memory_mb(), load_ms=load_ms)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--checkpoint", default=MODEL_PATH)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        run_single(args.single, args.checkpoint)
+        return
+
+    print(f"{'method':<8} {'load ms':>8} {'RSS MB':>8} {'PSS MB':>8} {'private MB':>11}")
+    for method in ("copy", "mmap"):
+        procs = [
+            subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.bench_model_loading", "--single", method,
+                 "--checkpoint", args.checkpoint],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+            )
+            for _ in range(args.workers)
+        ]
+        for proc in procs:
+            proc.stdout.readline()
+        results = []
+        for proc in procs:
+            out, _ = proc.communicate("\n")
+            results.append(json.loads(out.strip().splitlines()[-1]))
+
+        def mean(key: str) -> float:
+            return sum(r[key] for r in results) / len(results)
+
+        print(
+            f"{method:<8} {mean('load_ms'):>8.0f} {mean('rss_mb'):>8.0f} "
+            f"{mean('pss_mb'):>8.0f} {mean('private_mb'):>11.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
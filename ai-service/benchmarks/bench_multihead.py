@@ -0,0 +1,77 @@
+"""
+Latency of a combined evaluation (custom 3-class head + pretrained
+18-pathology head): running the two models one after another versus one
+shared-backbone pass with both heads.
+
+    cd ai-service && python -m benchmarks.bench_multihead [--iterations 20]
+
+Needs /app/models/model.pth and the bundled pretrained weights. The
+combined model is built even if model.pth was fine-tuned from the pretrained
+backbone, which the service refuses to serve. The benchmark also prints the
+drift of each head against its own standalone model. The custom head should
+match exactly. On a fine-tuned backbone, the pretrained head drifts.
+"""
+import argparse
+import dataclasses
+import os
+import statistics
+import time
+
+import numpy as np
+import torch
+
+from app.inference.multihead import head_probabilities
+from app.inference.registry import file_checksum
+from app.inference.weights import PRETRAINED_PATH
+from app.repositories.xray_scan_evaluation_repository import MODEL_PATH, XRayScanEvaluationRepository
+
+
+def p50_ms(fn, batch: torch.Tensor, iterations: int) -> float:
+    timings = []
+    with torch.no_grad():
+        fn(batch)
+        for _ in range(iterations):
+            start = time.perf_counter()
+            fn(batch)
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    args = parser.parse_args()
+
+    repository = XRayScanEvaluationRepository()
+    if not os.path.exists(PRETRAINED_PATH):
+        raise SystemExit(f"Pretrained weights not bundled at {PRETRAINED_PATH}")
+    custom_version = repository._resolve_version(MODEL_PATH, "eager", "")
+    multi_version = dataclasses.replace(custom_version, head_path=PRETRAINED_PATH, head_checksum=file_checksum(PRETRAINED_PATH))
+    custom = repository._build_model(dataclasses.replace(custom_version, head_path="", head_checksum=""))
+    pretrained = repository._build_model(repository._resolve_version(PRETRAINED_PATH, "eager", ""))
+    multi = repository._build_model(multi_version)
+
+    def sequential(batch):
+        return custom(batch), pretrained(batch)
+
+    print(f"{'batch':>6} {'sequential ms':>14} {'multi-head ms':>14} {'speedup':>8}")
+    for batch_size in args.batch_sizes:
+        batch = torch.from_numpy(
+            np.random.default_rng(0).uniform(-1024, 1024, (batch_size, 1, 224, 224)).astype(np.float32)
+        )
+        sequential_ms = p50_ms(sequential, batch, args.iterations)
+        multi_ms = p50_ms(multi, batch, args.iterations)
+        print(f"{batch_size:>6} {sequential_ms:>14.1f} {multi_ms:>14.1f} {sequential_ms / multi_ms:>7.2f}x")
+
+    with torch.no_grad():
+        probabilities = head_probabilities(multi(batch).numpy(), multi.heads)
+        custom_expected = torch.sigmoid(custom(batch)).numpy()
+        pretrained_expected = pretrained(batch).numpy()
+    n_custom = custom_expected.shape[1]
+    print(f"custom head max drift:     {np.max(np.abs(probabilities[:, :n_custom] - custom_expected)):.2e}")
+    print(f"pretrained head max drift: {np.max(np.abs(probabilities[:, n_custom:] - pretrained_expected)):.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Per-image time and peak memory of upload decoding + preprocessing:
+skimage full-resolution decode + torchxrayvision transforms (legacy)
+versus reduced-scale grayscale decode + one NumPy/OpenCV pass.
+
+    cd ai-service && python -m benchmarks.bench_preprocessing [--sizes 2048 8000 14000]
+
+Each (method, size) runs in its own process so peak RSS is isolated.
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+
+def make_sample(size: int) -> str:
+    path = os.path.join(tempfile.gettempdir(), f"xray_bench_{size}.jpg")
+    if not os.path.exists(path):
+        gradient = np.linspace(0, 255, size, dtype=np.float32)
+        image = (np.outer(gradient, gradient[::-1]) / 255).astype(np.uint8)
+        Image.fromarray(image).convert("RGB").save(path, quality=90)
+    return path
+
+
+def run_single(method: str, path: str, iterations: int) -> dict:
+    with open(path, "rb") as f:
+        image_bytes = f.read()
+
+    if method == "legacy":
+        import skimage.io
+        import torchvision
+        import torchxrayvision as xrv
+
+        transform = torchvision.transforms.Compose([xrv.datasets.XRayCenterCrop(), xrv.datasets.XRayResizer(224)])
+
+        def preprocess():
+            # Önceki XRayScanEvaluationRepository.preprocess
+            image = xrv.datasets.normalize(skimage.io.imread(io.BytesIO(image_bytes)), 255)
+            if len(image.shape) > 2:
+                image = image[:, :, 0]
+            return transform(image[None, :, :]).astype(np.float32)
+    else:
+        from app.inference.preprocessing import preprocess_image_bytes
+
+        out = np.empty((1, 224, 224), dtype=np.float32)
+
+        def preprocess():
+            return preprocess_image_bytes(image_bytes, out=out)
+
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = preprocess()
+        timings.append((time.perf_counter() - start) * 1000)
+    assert result.shape == (1, 224, 224)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "ms": min(timings),
+        "peak_delta_mb": (peak_rss - baseline_rss) / 1024,
+        "mean": float(result.mean()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2048, 8000])
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--single", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        method, path = args.single
+        print(json.dumps(run_single(method, path, args.iterations)))
+        return
+
+    print(f"{'size':>12} {'method':<8} {'ms/image':>10} {'peak +MB':>10} {'mean':>10}")
+    for size in args.sizes:
+        path = make_sample(size)
+        for method in ("legacy", "fast"):
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_preprocessing", "--single", method, path,
+                 "--iterations", str(args.iterations)],
+                capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                print(f"{size:>5}x{size:<6} {method:<8} failed: {proc.stderr.strip().splitlines()[-1:]}")
+                continue
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(
+                f"{size:>5}x{size:<6} {method:<8} {result['ms']:>10.1f} "
+                f"{result['peak_delta_mb']:>10.0f} {result['mean']:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
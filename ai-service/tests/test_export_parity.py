@@ -0,0 +1,91 @@
+"""
+Exported backends must serve the same probabilities as the fp32 eager model
+for uploads preprocessed like in production, and only for the checkpoint
+they were exported from.
+
+    cd ai-service && pip install -r requirements-dev.txt && python -m pytest tests
+
+Needs the model weights under XRAY_MODEL_DIR; skipped otherwise.
+"""
+import io
+import os
+from dataclasses import replace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.inference.backends import BACKENDS
+from app.inference.export import PARITY_TOLERANCES, export_version
+from app.inference.preprocessing import preprocess_image_bytes
+from app.inference.weights import ModelUnavailableError
+from app.repositories.xray_scan_evaluation_repository import XRayScanEvaluationRepository
+
+
+def xray_like_upload(seed: int, contrast: float) -> bytes:
+    # Kenarları koyu, ortası aydınlık, gürültülü gri tonlamalı bir JPEG;
+    # düşük kontrastta olasılıklar 0/1'e doymaz, sapma gerçekten ölçülür
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[-1:1:600j, -1:1:720j]
+    image = 128 + contrast * (210 * np.exp(-(x ** 2 + y ** 2) * rng.uniform(1, 3)) - 105 + rng.normal(0, 12, x.shape))
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(image, 0, 255).astype(np.uint8)).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def repository():
+    return XRayScanEvaluationRepository()
+
+
+@pytest.fixture(scope="module")
+def version(repository, tmp_path_factory):
+    try:
+        active = repository._get_active_version()
+    except ModelUnavailableError as e:
+        pytest.skip(e.message)
+    return replace(active, backend="eager", export_dir=str(tmp_path_factory.mktemp("exported")))
+
+
+@pytest.fixture(scope="module")
+def inputs():
+    contrasts = (0.0, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+    return np.stack([preprocess_image_bytes(xray_like_upload(seed, contrast)) for seed, contrast in enumerate(contrasts)])
+
+
+@pytest.fixture(scope="module")
+def exported(repository, version, inputs):
+    return {backend: export_version(repository, version, backend, inputs) for backend in BACKENDS if backend != "eager"}
+
+
+@pytest.mark.parametrize("backend", ["torchscript", "onnx", "int8"])
+def test_exported_backend_matches_eager(version, exported, backend):
+    path, drift = exported[backend]
+
+    assert os.path.basename(path).startswith(f"model.{version.artifact_key}.")
+    assert drift <= PARITY_TOLERANCES[backend]
+
+
+@pytest.mark.parametrize("backend", ["torchscript", "onnx", "int8"])
+def test_probabilities_do_not_depend_on_the_rest_of_the_batch(repository, version, inputs, exported, backend):
+    served = replace(version, backend=backend)
+
+    batched = repository.predict_batch(inputs, served)
+    one_by_one = np.concatenate([repository.predict_batch(inputs[i:i + 1], served) for i in range(len(inputs))])
+
+    np.testing.assert_allclose(batched, one_by_one, atol=1e-4)
+
+
+def test_missing_artifact_fails_instead_of_falling_back_to_eager(repository, version, inputs, tmp_path):
+    missing = replace(version, backend="torchscript", export_dir=str(tmp_path))
+
+    with pytest.raises(ModelUnavailableError):
+        repository.predict_batch(inputs, missing)
+
+
+def test_artifact_of_another_checkpoint_is_not_served(repository, version, inputs, tmp_path):
+    export_version(repository, replace(version, export_dir=str(tmp_path)), "torchscript", inputs)
+    other_checkpoint = replace(version, checksum="0" * 64, backend="torchscript", export_dir=str(tmp_path))
+
+    with pytest.raises(ModelUnavailableError):
+        repository.predict_batch(inputs, other_checkpoint)
@@ -0,0 +1,83 @@
+"""
+Rate-limited LLM calls are retried after the provider's Retry-After delay,
+and give up with LLMUnavailableError once the retries are exhausted. Runs
+against the local stub server of benchmarks.bench_llm_client; no network
+access or API key is needed.
+
+    cd ai-service && pip install -r requirements-dev.txt && python -m pytest tests
+"""
+import asyncio
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from app.infrastructure.llm_providers import LLMUnavailableError
+from app.infrastructure.metrics import metrics
+from app.repositories import openai_repository
+from app.repositories.openai_repository import OpenAIRepository, retry_after_seconds
+from benchmarks.bench_llm_client import MESSAGES, StubState, make_handler
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    state = StubState(latency_ms=0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", f"http://127.0.0.1:{server.server_port}/")
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "stub")
+    monkeypatch.setattr(openai_repository, "LLM_PROVIDER", "azure")
+    # Her test stub'a bağlanan yeni bir istemciyle başlar
+    monkeypatch.setattr(OpenAIRepository, "_instance", None)
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def complete(calls: int):
+    async def run():
+        repository = OpenAIRepository()
+        try:
+            return [await repository.create_completion(MESSAGES, max_completion_tokens=50) for _ in range(calls)]
+        finally:
+            await repository.close()
+
+    return asyncio.run(run())
+
+
+def test_rate_limited_calls_are_retried_after_retry_after(stub):
+    # Her 2. istek 429 + retry-after-ms: 200 alır
+    stub.rate_limit_every = 2
+    rate_limited = metrics.counter("llm_rate_limited").snapshot()
+    retries = metrics.counter("llm_retries").snapshot()
+
+    started = time.perf_counter()
+    responses = complete(3)
+    elapsed = time.perf_counter() - started
+
+    assert [response.choices[0].message.content for response in responses] == ["stub answer answer"] * 3
+    # 2. ve 4. istekler reddedilir; 2. ve 3. çağrılar birer kez tekrar denenir
+    assert stub.requests == 5
+    assert metrics.counter("llm_rate_limited").snapshot() - rate_limited == 2
+    assert metrics.counter("llm_retries").snapshot() - retries == 2
+    assert elapsed >= 2 * 0.2
+
+
+def test_gives_up_after_max_retries(stub, monkeypatch):
+    stub.rate_limit_every = 1
+    monkeypatch.setattr(openai_repository, "AZURE_OPENAI_MAX_RETRIES", 2)
+
+    with pytest.raises(LLMUnavailableError, match="after 3 attempts"):
+        complete(1)
+    assert stub.requests == 3
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "200"}, 0.2),
+    ({"retry-after": "3"}, 3.0),
+    ({}, None),
+])
+def test_retry_after_headers(headers, expected):
+    assert retry_after_seconds(httpx.Response(429, headers=headers)) == expected
@@ -0,0 +1,130 @@
+"""
+Concurrent requests for the same cache key share one computation. A failure
+of that computation is shared with the waiting requests; a cancellation of
+the request running it is not, one of the waiting requests takes over.
+
+    cd ai-service && pip install -r requirements-dev.txt && python -m pytest tests
+
+Runs without Postgres: the persistent tiers are turned off or stubbed.
+"""
+import asyncio
+
+import pytest
+
+from app.repositories import llm_interpretation_cache_repository, xray_evaluation_cache_repository
+from app.repositories.llm_interpretation_cache_repository import LLMInterpretationCacheRepository
+from app.repositories.xray_evaluation_cache_repository import XRayEvaluationCacheRepository
+
+
+class Computation:
+    """
+    Stand-in for an evaluation: the first call blocks until `release` is set
+    or it is cancelled, every call returns `result` or raises `error`.
+    """
+    def __init__(self, result, error: Exception = None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+
+    def bind(self) -> None:
+        # Python 3.9'da Event oluşturulduğu döngüye bağlanır; senaryonun içinde oluşturulur
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        self.started.set()
+        if self.calls == 1:
+            await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+@pytest.fixture
+def xray_cache(monkeypatch):
+    monkeypatch.setattr(xray_evaluation_cache_repository, "XRAY_RESULT_CACHE_ENABLED", True)
+    monkeypatch.setattr(xray_evaluation_cache_repository, "XRAY_RESULT_CACHE_PERSIST", False)
+    cache = XRayEvaluationCacheRepository()
+    cache._entries.clear()
+    yield lambda image, compute: cache.get_or_compute(image, "test-model", "test-preprocessing", compute)
+    cache._entries.clear()
+
+
+@pytest.fixture
+def llm_cache(monkeypatch):
+    monkeypatch.setattr(llm_interpretation_cache_repository, "LLM_INTERPRETATION_CACHE_ENABLED", True)
+    cache = LLMInterpretationCacheRepository()
+    monkeypatch.setattr(cache, "_get_db", lambda key: None)
+    monkeypatch.setattr(cache, "_put_db", lambda *args: None)
+    cache._entries.clear()
+    yield lambda key, compute: cache.get_or_compute(key, "test-template", "test-deployment", compute)
+    cache._entries.clear()
+
+
+def run_with_cancelled_leader(get_or_compute, key, compute):
+    async def scenario():
+        compute.bind()
+        leader = asyncio.ensure_future(get_or_compute(key, compute))
+        await compute.started.wait()
+        waiters = [asyncio.ensure_future(get_or_compute(key, compute)) for _ in range(2)]
+        # Bekleyenler (görüntü özeti thread'de hesaplanır) paylaşılan hesaplamaya bağlanır
+        await asyncio.sleep(0.2)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*waiters)
+
+    return asyncio.run(scenario())
+
+
+def run_with_failing_leader(get_or_compute, key, compute):
+    async def scenario():
+        compute.bind()
+        leader = asyncio.ensure_future(get_or_compute(key, compute))
+        await compute.started.wait()
+        waiters = [asyncio.ensure_future(get_or_compute(key, compute)) for _ in range(2)]
+        await asyncio.sleep(0.2)
+        compute.release.set()
+        return await asyncio.gather(leader, *waiters, return_exceptions=True)
+
+    return asyncio.run(scenario())
+
+
+def test_xray_waiters_take_over_when_the_leader_is_cancelled(xray_cache):
+    compute = Computation({"Cardiomegaly": 0.5})
+
+    results = run_with_cancelled_leader(xray_cache, b"cancelled leader", compute)
+
+    assert results == [{"Cardiomegaly": 0.5}] * 2
+    # İptal edilen hesaplamanın yerine yalnızca bir bekleyen yeniden hesaplar
+    assert compute.calls == 2
+
+
+def test_xray_waiters_share_the_leaders_failure(xray_cache):
+    error = RuntimeError("inference failed")
+    compute = Computation(None, error=error)
+
+    outcomes = run_with_failing_leader(xray_cache, b"failing leader", compute)
+
+    assert outcomes == [error] * 3
+    assert compute.calls == 1
+
+
+def test_llm_waiters_take_over_when_the_leader_is_cancelled(llm_cache):
+    compute = Computation(("interpretation", 100, 20))
+
+    results = run_with_cancelled_leader(llm_cache, "cancelled leader", compute)
+
+    assert results == ["interpretation"] * 2
+    assert compute.calls == 2
+
+
+def test_llm_waiters_share_the_leaders_failure(llm_cache):
+    error = RuntimeError("LLM failed")
+    compute = Computation(None, error=error)
+
+    outcomes = run_with_failing_leader(llm_cache, "failing leader", compute)
+
+    assert outcomes == [error] * 3
+    assert compute.calls == 1
@@ -0,0 +1,226 @@
+"""
+The Postgres X-ray job queue must hand every job to exactly one worker,
+requeue jobs whose worker died and fail jobs nobody waits for anymore.
+
+    cd ai-service && pip install -r requirements-dev.txt && python -m pytest tests
+
+Needs a disposable Postgres database (DB_* environment variables); skipped
+when it is unreachable or already has queued or running jobs, which the
+tests would otherwise claim.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.exc import OperationalError
+
+from app.db.base import Base, SessionLocal, engine
+from app.db.models.xray_job_model import XRayJobModel
+from app.inference.weights import ModelUnavailableError
+from app.repositories import xray_evaluation_cache_repository, xray_job_repository, xray_scan_evaluation_repository
+from app.repositories.xray_job_repository import XRAY_JOB_MAX_ATTEMPTS, XRayJobRepository
+from app.repositories.xray_scan_evaluation_repository import XRayScanEvaluationRepository
+
+TEST_MODEL_VERSION = "test-job-queue"
+
+
+@pytest.fixture(scope="module")
+def jobs():
+    try:
+        Base.metadata.create_all(bind=engine, tables=[XRayJobModel.__table__])
+    except (OperationalError, ValueError) as e:
+        pytest.skip(f"Postgres is not available: {e}")
+    with SessionLocal() as db:
+        pending = db.execute(
+            select(XRayJobModel.id).where(XRayJobModel.status.in_(("queued", "running")))
+        ).first()
+    if pending is not None:
+        pytest.skip("xray_jobs already has queued or running jobs")
+    yield XRayJobRepository()
+    with SessionLocal() as db:
+        db.execute(delete(XRayJobModel).where(XRayJobModel.requested_model_version == TEST_MODEL_VERSION))
+        db.commit()
+
+
+@pytest.fixture(autouse=True)
+def empty_queue(jobs):
+    yield
+    # Bir testin bıraktığı işler sonrakinin claim'ine karışmaz
+    with SessionLocal() as db:
+        db.execute(delete(XRayJobModel).where(XRayJobModel.requested_model_version == TEST_MODEL_VERSION))
+        db.commit()
+
+
+def job(job_id: int) -> XRayJobModel:
+    with SessionLocal() as db:
+        return db.get(XRayJobModel, job_id)
+
+
+def make_stale(job_id: int, **values) -> None:
+    # Worker'ı ölmüş bir iş gibi claimed_at bayatlık sınırının gerisine çekilir
+    with SessionLocal() as db:
+        db.execute(
+            update(XRayJobModel).where(XRayJobModel.id == job_id).values(
+                claimed_at=text(f"now() - interval '{int(xray_job_repository.XRAY_JOB_STALE_SECONDS) + 60} seconds'"),
+                **values,
+            )
+        )
+        db.commit()
+
+
+def test_concurrent_workers_never_claim_the_same_job(jobs):
+    submitted = [jobs.submit(f"image {i}".encode(), TEST_MODEL_VERSION) for i in range(60)]
+    workers = 8
+    start = threading.Barrier(workers)
+    claimed = {f"worker-{i}": [] for i in range(workers)}
+
+    def work(worker_id: str) -> None:
+        # Bağlantılar önceden açılır; yoksa ilk bağlanan worker tüm işleri alabilir
+        with SessionLocal() as db:
+            db.execute(text("SELECT 1"))
+        start.wait()
+        while True:
+            batch = jobs.claim(3, worker_id)
+            if not batch:
+                return
+            claimed[worker_id].extend(job_id for job_id, _ in batch)
+
+    threads = [threading.Thread(target=work, args=(worker_id,)) for worker_id in claimed]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    all_claimed = [job_id for ids in claimed.values() for job_id in ids]
+    assert sorted(all_claimed) == sorted(submitted)
+    assert sum(1 for ids in claimed.values() if ids) > 1
+    for worker_id, ids in claimed.items():
+        for job_id in ids:
+            row = job(job_id)
+            assert (row.status, row.worker_id, row.attempts) == ("running", worker_id, 1)
+
+
+def test_claim_returns_the_oldest_jobs_with_their_images(jobs):
+    first = jobs.submit(b"first", TEST_MODEL_VERSION)
+    second = jobs.submit(b"second", TEST_MODEL_VERSION)
+
+    assert jobs.claim(1, "worker") == [(first, b"first")]
+    assert jobs.claim(5, "worker") == [(second, b"second")]
+    assert jobs.claim(5, "worker") == []
+
+
+def test_stale_running_job_is_requeued_and_claimed_again(jobs):
+    job_id = jobs.submit(b"image", TEST_MODEL_VERSION)
+    fresh_id = jobs.submit(b"fresh", TEST_MODEL_VERSION)
+    assert [claimed for claimed, _ in jobs.claim(2, "dead-worker")] == [job_id, fresh_id]
+    make_stale(job_id)
+
+    report = jobs.maintain()
+
+    assert report["requeued"] == 1
+    row = job(job_id)
+    assert (row.status, row.worker_id, row.claimed_at, row.attempts) == ("queued", None, None, 1)
+    # Hâlâ çalışan bir worker'ın işine dokunulmaz
+    assert (job(fresh_id).status, job(fresh_id).worker_id) == ("running", "dead-worker")
+    assert jobs.claim(5, "new-worker") == [(job_id, b"image")]
+    assert job(job_id).attempts == 2
+
+
+def test_job_abandoned_too_often_fails(jobs):
+    job_id = jobs.submit(b"image", TEST_MODEL_VERSION)
+    jobs.claim(1, "dead-worker")
+    make_stale(job_id, attempts=XRAY_JOB_MAX_ATTEMPTS)
+
+    report = jobs.maintain()
+
+    assert report["failed"] == 1
+    row = job(job_id)
+    assert (row.status, row.error_type, row.image) == ("failed", "inference", None)
+
+
+def test_unfinished_job_is_cancelled_when_the_api_stops_waiting(jobs, monkeypatch):
+    monkeypatch.setattr(xray_job_repository, "XRAY_JOB_TIMEOUT_SECONDS", 0.5)
+
+    with pytest.raises(ModelUnavailableError, match="not finished"):
+        asyncio.run(jobs.evaluate(b"image", TEST_MODEL_VERSION))
+
+    with SessionLocal() as db:
+        row = db.execute(
+            select(XRayJobModel).where(XRayJobModel.requested_model_version == TEST_MODEL_VERSION)
+        ).scalar_one()
+    assert (row.status, row.error_type, row.image) == ("failed", "timeout", None)
+    # İptal edilen iş artık hiçbir worker'a verilmez
+    assert jobs.claim(5, "late-worker") == []
+
+
+def test_cancel_leaves_a_claimed_job_to_its_worker(jobs):
+    job_id = jobs.submit(b"image", TEST_MODEL_VERSION)
+    jobs.claim(1, "worker")
+
+    jobs.cancel(job_id, "gave up")
+
+    assert job(job_id).status == "running"
+    jobs.finish({job_id: {"Cardiomegaly": 0.5}}, {}, TEST_MODEL_VERSION)
+    assert (job(job_id).status, job(job_id).result) == ("done", {"Cardiomegaly": 0.5})
+
+
+def test_batch_evaluation_in_queue_mode_goes_through_the_workers(jobs, monkeypatch):
+    repository = XRayScanEvaluationRepository()
+    try:
+        repository.model_version
+    except ModelUnavailableError as e:
+        pytest.skip(e.message)
+    monkeypatch.setattr(xray_scan_evaluation_repository, "XRAY_INFERENCE_MODE", "queue")
+    monkeypatch.setattr(xray_evaluation_cache_repository, "XRAY_RESULT_CACHE_ENABLED", False)
+
+    def local_inference(*args):
+        raise AssertionError("the API process must not run the model in queue mode")
+
+    monkeypatch.setattr(XRayScanEvaluationRepository, "_get_batcher", local_inference)
+    monkeypatch.setattr(XRayScanEvaluationRepository, "_run_batch", local_inference)
+
+    # Modeli yüklemeden işleri bitiren sahte bir inference worker'ı
+    stopping = threading.Event()
+    served = []
+
+    def worker() -> None:
+        while not stopping.is_set():
+            claimed = jobs.claim(8, "fake-worker")
+            served.extend(job_id for job_id, _ in claimed)
+            jobs.finish(
+                {job_id: {"Cardiomegaly": 0.5} for job_id, image in claimed if image != b"junk"},
+                {job_id: ("invalid_image", "Error: cannot decode") for job_id, image in claimed if image == b"junk"},
+                "fake",
+            )
+            time.sleep(0.01)
+
+    async def images():
+        for i in range(5):
+            yield f"scan{i}.jpg", b"junk" if i == 3 else f"image {i}".encode()
+        yield "broken.zip", ValueError("Error: corrupt archive")
+
+    async def evaluate():
+        return [item async for item in repository.evaluate_stream(images(), batch_size=2)]
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    try:
+        items = asyncio.run(evaluate())
+    finally:
+        stopping.set()
+        thread.join()
+        with SessionLocal() as db:
+            db.execute(delete(XRayJobModel).where(XRayJobModel.id.in_(served)))
+            db.commit()
+
+    assert items == [
+        {"name": "scan0.jpg", "result": {"Cardiomegaly": 0.5}},
+        {"name": "scan1.jpg", "result": {"Cardiomegaly": 0.5}},
+        {"name": "scan2.jpg", "result": {"Cardiomegaly": 0.5}},
+        {"name": "scan3.jpg", "error": "Error: cannot decode"},
+        {"name": "scan4.jpg", "result": {"Cardiomegaly": 0.5}},
+        {"name": "broken.zip", "error": "Error: corrupt archive"},
+    ]
+    assert len(served) == 5
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request, Query
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from app.infrastructure.database import SessionLocal
-from app.domain.services import convert_pdf_to_jpg
+from app.domain.services import convert_pdf_document, DERIVATIVE_FORMATS
+from app.domain.triage import summarize_triage
+from app.domain.codecs import MEDIA_TYPES, OUTPUT_PROFILES
 from app.domain.models import ConversionLog
 import shutil
 import os
@@ -11,9 +13,14 @@ import requests
 from datetime import datetime
 from fastapi import Security 
 from app.infrastructure.security import get_current_user
-from fastapi.responses import FileResponse
+from app.infrastructure.http_cache import build_cached_file_response
+from app.infrastructure.signing import sign_download_url, verify_signed_url
+from app.infrastructure.image_store import evict_stale_images, get_or_create_derivative, touch
+from typing import Optional
 
 router = APIRouter()
+# İmzalı URL ile erişilir; bearer token veya auth-service çağrısı gerektirmez
+download_router = APIRouter()
 
 def get_db():
     db = SessionLocal()
@@ -26,6 +33,7 @@ def get_db():
 async def convert_pdf(  
     request: Request,
     file: UploadFile = File(...),
+    profile: Optional[str] = Query(None, description="Çıktı profili: default, viewer, web, inference, compact"),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
@@ -39,6 +47,9 @@ async def convert_pdf(
     
     token = auth_header.split(" ")[1]
 
+    if profile is not None and profile not in OUTPUT_PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown output profile: {profile}")
+
     # Dosya adını ve yolu oluştur
     filename = f"{uuid.uuid4()}_{file.filename}"
     file_path = f"/app/temp/{filename}"
@@ -55,41 +66,50 @@ async def convert_pdf(
         raise HTTPException(status_code=500, detail=f"Error saving PDF: {str(e)}")
 
     try:
-        # PDF'i JPG'e dönüştür
+        # PDF'i JPG'e dönüştür (yalnızca X-ray olması muhtemel sayfalar render edilir)
         print("Converting PDF to JPG...")
-        image_paths = convert_pdf_to_jpg(file_path)
+        conversion = convert_pdf_document(file_path, profile)
+        image_paths = conversion.image_paths
+        triage = summarize_triage(conversion.pages)
         print(f"Conversion result: {image_paths}")
+        print(
+            f"Triage skipped {triage['pages_skipped_for_inference']} of {triage['pages']} pages for inference, "
+            f"{len(conversion.text_context)} chars of text context"
+        )
 
         if not image_paths:
-            print("No images generated from PDF")
-            raise HTTPException(status_code=500, detail="No images generated from PDF")
+            print("No X-ray pages found in PDF, skipping AI evaluation")
 
-        # HSM Service'e kullanıcı ID'sini şifrelet
-        print("Encrypting user_id with HSM...")
-        hsm_encrypt_url = "http://hsm-service:8000/encrypt"
         hsm_headers = {"Authorization": f"Bearer {token}"}
-        hsm_payload = {"user_id": str(user_id)}
-        
-        try:
-            hsm_response = requests.post(hsm_encrypt_url, json=hsm_payload, headers=hsm_headers)
-            hsm_response.raise_for_status()
-            pseudo_user_id = hsm_response.json()["pseudo_user_id"]
-            print(f"User_id encrypted: {pseudo_user_id}")
-        except requests.exceptions.RequestException as e:
-            print(f"HSM Service error: {e}")
-            raise HTTPException(status_code=500, detail=f"HSM Service error: {str(e)}")
+        if image_paths:
+            # HSM Service'e kullanıcı ID'sini şifrelet
+            print("Encrypting user_id with HSM...")
+            hsm_encrypt_url = "http://hsm-service:8000/encrypt"
+            hsm_payload = {"user_id": str(user_id)}
+
+            try:
+                hsm_response = requests.post(hsm_encrypt_url, json=hsm_payload, headers=hsm_headers)
+                hsm_response.raise_for_status()
+                pseudo_user_id = hsm_response.json()["pseudo_user_id"]
+                print(f"User_id encrypted: {pseudo_user_id}")
+            except requests.exceptions.RequestException as e:
+                print(f"HSM Service error: {e}")
+                raise HTTPException(status_code=500, detail=f"HSM Service error: {str(e)}")
 
         # AI Service'e image'ları ve şifrelenmiş kullanıcı ID'sini gönder
         print("Sending to AI Service...")
         ai_service_url = "http://ai-service:8000/openai/interpret_xray_scan"
         
-        # İlk image'ı AI Service'e gönder
+        # İlk X-ray sayfasını AI Service'e gönder; metin sayfaları LLM bağlamı olarak eklenir
         ai_result = None
         if image_paths:
+            content = "Bu X-ray görüntüsünü analiz et ve detaylı bir rapor hazırla."
+            if conversion.text_context:
+                content += "\n\nBelgedeki diğer sayfaların metni (bağlam):\n" + conversion.text_context
             with open(image_paths[0], "rb") as img_file:
-                files = {"xray_scan_upload": (os.path.basename(image_paths[0]), img_file, "image/jpeg")}
+                files = {"xray_scan_upload": (os.path.basename(image_paths[0]), img_file, media_type_for(image_paths[0]))}
                 data = {
-                    "content": "Bu X-ray görüntüsünü analiz et ve detaylı bir rapor hazırla.",
+                    "content": content,
                     "user_id": pseudo_user_id,
                     "chat_id": f"chat_{uuid.uuid4()}"
                 }
@@ -138,14 +158,20 @@ async def convert_pdf(
         db.commit()
         print("Log entry created")
 
+        evict_stale_images()
+
         return JSONResponse(content={
-            "message": "Conversion and AI evaluation successful",
+            "message": (
+                "Conversion and AI evaluation successful" if image_paths
+                else "No X-ray pages found in PDF"
+            ),
             "user": user_email,
             "images": [
-                f"http://localhost:8001/download/{os.path.basename(p)}"
+                sign_download_url(f"/download/{os.path.basename(p)}")
                 for p in image_paths
             ],
-            "ai_evaluation": decrypted_ai_result if image_paths else None
+            "ai_evaluation": decrypted_ai_result if image_paths else None,
+            "triage": triage,
         })
     except Exception as e:
         print(f"Error in convert_pdf: {e}")
@@ -169,28 +195,61 @@ def get_logs(
         .order_by(ConversionLog.converted_at.desc())
         .all()
     )
-    return logs
-
-@router.get("/download/{filename}", tags=["PDF"])
-async def download_image(filename: str):
+    # Sunucu yolları yerine her istekte yeniden imzalanan indirme linkleri döner;
+    # saklama politikasıyla silinmiş görseller listelenmez
+    return [
+        {
+            "id": log.id,
+            "user_email": log.user_email,
+            "filename": log.filename,
+            "converted_at": log.converted_at,
+            "images": [
+                sign_download_url(f"/download/{os.path.basename(path)}")
+                for path in (log.jpg_output_path or "").split(", ")
+                if path and os.path.isfile(path)
+            ],
+        }
+        for log in logs
+    ]
+
+def media_type_for(path: str) -> Optional[str]:
+    """
+    - **Returns**: The media type of a served image, None for any other file.
+    """
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    return MEDIA_TYPES.get("jpeg" if extension in ("jpg", "jpeg") else extension)
+
+@download_router.get("/download/{filename}", tags=["PDF"])
+def download_image(
+    filename: str,
+    request: Request,
+    w: Optional[int] = Query(None, ge=16, le=2048, description="Türev görsel genişliği (px)"),
+    fmt: Optional[str] = Query(None, description="Türev görsel formatı: jpeg, webp, png"),
+    remaining_seconds: int = Depends(verify_signed_url),
+):
     # Docker container içinde doğru yol
     file_path = os.path.join("/app/temp", filename)
 
-    if not os.path.exists(file_path):
+    media_type = media_type_for(file_path)
+    # Yalnızca render edilen görseller sunulur; klasördeki diğer dosyalar (ör. PDF) yok sayılır
+    if media_type is None or not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail=f"File {filename} not found")
-
-    # Dosya boyutunu kontrol et
-    file_size = os.path.getsize(file_path)
-    if file_size == 0:
-        raise HTTPException(status_code=500, detail="File is empty")
-
-    return FileResponse(
-        path=file_path, 
-        filename=filename, 
-        media_type='image/jpeg',
-        headers={
-            "Cache-Control": "no-cache",
-            "Content-Disposition": f"attachment; filename={filename}",
-            "Content-Length": str(file_size)
-        }
+    if w is not None or fmt is not None:
+        # Küçük önizlemeler ilk istekte üretilir ve diskte önbelleğe alınır
+        fmt = fmt or "jpeg"
+        if fmt not in DERIVATIVE_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {fmt}")
+        file_path = get_or_create_derivative(file_path, w or 512, fmt)
+        filename = os.path.basename(file_path)
+        media_type = MEDIA_TYPES[fmt]
+    else:
+        touch(file_path)
+
+    # Görseller değişmez: ETag, 304 ve Range desteğiyle sun
+    return build_cached_file_response(
+        request,
+        file_path=file_path,
+        filename=filename,
+        media_type=media_type,
+        max_age=remaining_seconds,
     )
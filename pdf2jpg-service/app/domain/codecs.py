@@ -0,0 +1,97 @@
+import io
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+
+@dataclass(frozen=True)
+class OutputProfile:
+    """
+    Encoding settings for rendered PDF pages.
+    - **format**: "jpeg", "webp" or "png".
+    - **max_bytes**: Optional size target; quality is searched down to `min_quality`.
+    """
+    name: str
+    format: str
+    quality: int = 95
+    progressive: bool = False
+    lossless: bool = False
+    max_bytes: Optional[int] = None
+    min_quality: int = 40
+
+    @property
+    def extension(self) -> str:
+        return FILE_EXTENSIONS[self.format]
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES[self.format]
+
+
+FILE_EXTENSIONS = {"jpeg": "jpg", "webp": "webp", "png": "png"}
+MEDIA_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+
+OUTPUT_PROFILES: Dict[str, OutputProfile] = {
+    # pix.tobytes("jpeg") ile aynı çıktı (PyMuPDF varsayılan jpg_quality=95)
+    "default": OutputProfile("default", "jpeg", quality=95),
+    # Tarayıcı/mobil görüntüleme: progressive JPEG, ilk tarama hızlı gelir
+    "viewer": OutputProfile("viewer", "jpeg", quality=85, progressive=True),
+    "web": OutputProfile("web", "webp", quality=80),
+    # Model girişi: sıkıştırma artefaktı olmasın
+    "inference": OutputProfile("inference", "png", lossless=True),
+    # Boyut hedefli: kaliteyi 250 KB altına sığacak şekilde arar
+    "compact": OutputProfile("compact", "jpeg", quality=90, progressive=True, max_bytes=250_000),
+}
+
+DEFAULT_OUTPUT_PROFILE = os.environ.get("OUTPUT_PROFILE", "default")
+
+
+def get_output_profile(name: Optional[str] = None) -> OutputProfile:
+    name = name or DEFAULT_OUTPUT_PROFILE
+    if name not in OUTPUT_PROFILES:
+        raise ValueError(f"Unknown output profile: {name}")
+    return OUTPUT_PROFILES[name]
+
+
+def _encode(img: Image.Image, profile: OutputProfile, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if profile.format == "jpeg":
+        img.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=profile.progressive)
+    elif profile.format == "webp":
+        img.save(buffer, format="WEBP", quality=quality, lossless=profile.lossless, method=4)
+    elif profile.format == "png":
+        img.save(buffer, format="PNG", compress_level=6)
+    else:
+        raise ValueError(f"Unsupported output format: {profile.format}")
+    return buffer.getvalue()
+
+
+def encode_image(img: Image.Image, profile: OutputProfile) -> Tuple[bytes, int]:
+    """
+    Encode `img` according to `profile`.
+    With `max_bytes` set, a binary search over quality finds the highest
+    quality that fits (about log2(quality range) encodes, usually 5-6).
+    - **Returns**: The encoded bytes and the quality that was used.
+    """
+    data = _encode(img, profile, profile.quality)
+    if profile.max_bytes is None or profile.lossless or len(data) <= profile.max_bytes:
+        return data, profile.quality
+
+    low, high = profile.min_quality, profile.quality - 1
+    best: Optional[Tuple[bytes, int]] = None
+    while low <= high:
+        quality = (low + high) // 2
+        candidate = _encode(img, profile, quality)
+        if len(candidate) <= profile.max_bytes:
+            best = (candidate, quality)
+            low = quality + 1
+        else:
+            high = quality - 1
+
+    if best is None:
+        # Hedefe min_quality ile bile sığmıyor; en küçük çıktıyı döndür
+        print(f"Profile {profile.name}: {profile.max_bytes} bytes not reachable at quality {profile.min_quality}")
+        return _encode(img, profile, profile.min_quality), profile.min_quality
+    return best
@@ -4,6 +4,10 @@ from PIL import Image
 import fitz  # PyMuPDF
 from app.domain.models import ConversionLog
 from app.domain.exceptions import PDFConversionError, UnsupportedFileTypeError
+from app.domain.codecs import encode_image, get_output_profile
+from app.domain.triage import PAGE_TEXT, PAGE_XRAY, PageTriage, extract_text_context, triage_document
+from dataclasses import dataclass, field
+from typing import List, Optional
 import uuid 
 from sqlalchemy.orm import Session
 from app.domain.models import ConversionLog
@@ -14,13 +18,35 @@ Image.MAX_IMAGE_PIXELS = 300000000
 # Docker container içinde doğru yollar
 OUTPUT_DIR = "/app/temp"
 TEMP_DIR = "/app/temp"
+DERIVATIVE_DIR = os.path.join(OUTPUT_DIR, "derivatives")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 os.makedirs(TEMP_DIR, exist_ok=True)
+os.makedirs(DERIVATIVE_DIR, exist_ok=True)
 
-def convert_pdf_to_jpg(file_path: str):
+# Türev görseller için desteklenen formatlar -> (Pillow formatı, kayıt parametreleri)
+DERIVATIVE_FORMATS = {
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "png": ("PNG", {"optimize": True}),
+}
+
+@dataclass
+class ConversionResult:
+    image_paths: List[str]
+    pages: List[PageTriage] = field(default_factory=list)
+    text_context: str = ""
+
+
+def convert_pdf_document(file_path: str, profile_name: Optional[str] = None) -> ConversionResult:
+    """
+    Triage every page, render only the probable X-ray pages and extract the
+    text pages as markdown context for the LLM.
+    """
     if not file_path.endswith(".pdf"):
         raise UnsupportedFileTypeError(file_path)
 
+    profile = get_output_profile(profile_name)
+
     try:
         # Her PDF için benzersiz bir alt klasör oluştur
         unique_id = str(uuid.uuid4())
@@ -28,7 +54,7 @@ def convert_pdf_to_jpg(file_path: str):
         os.makedirs(pdf_temp_dir, exist_ok=True)
 
         def get_next_image_number(output_folder):
-            existing_files = glob.glob(os.path.join(output_folder, 'heart_xray_*.jpg'))
+            existing_files = glob.glob(os.path.join(output_folder, 'heart_xray_*.*'))
             if not existing_files:
                 return 1
             numbers = []
@@ -44,30 +70,41 @@ def convert_pdf_to_jpg(file_path: str):
 
         # PDF'i aç
         pdf_document = fitz.open(file_path)
-        
-        # İlk sayfayı al
-        page = pdf_document[0]
-        
-        # Sayfayı yüksek kalitede görsel olarak render et
+
+        # Sayfaları render etmeden metin katmanı ve görsel kaplamaya göre sınıflandır
+        pages = triage_document(pdf_document)
+        xray_pages = [p.page_number for p in pages if p.kind == PAGE_XRAY]
+        text_pages = [p.page_number for p in pages if p.kind == PAGE_TEXT]
+        print(f"Triage: {len(xray_pages)} X-ray, {len(text_pages)} text of {len(pages)} pages")
+
+        # Sayfaları yüksek kalitede görsel olarak render et
         mat = fitz.Matrix(2.0, 2.0)  # 2x zoom for higher quality
-        pix = page.get_pixmap(matrix=mat)
-        
-        # Görseli kaydet
-        output_filename = f"heart_xray_{next_number}.jpg"
-        output_path = os.path.join(OUTPUT_DIR, output_filename)
-        
-        # Pixmap'i PIL Image'e dönüştür
-        img_data = pix.tobytes("jpeg")
-        with open(output_path, "wb") as f:
-            f.write(img_data)
-        
+        image_paths = []
+        for page_number in xray_pages:
+            pix = pdf_document[page_number].get_pixmap(matrix=mat)
+
+            # Görseli kaydet
+            output_filename = f"heart_xray_{next_number}.{profile.extension}"
+            output_path = os.path.join(OUTPUT_DIR, output_filename)
+            next_number += 1
+
+            # Pixmap'i PIL Image'e dönüştür ve profile göre kodla
+            img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+            img_data, quality = encode_image(img, profile)
+            print(f"Encoded {output_filename} with profile {profile.name} (quality={quality}, {len(img_data)} bytes)")
+            with open(output_path, "wb") as f:
+                f.write(img_data)
+            image_paths.append(output_path)
+
+        text_context = extract_text_context(pdf_document, text_pages)
+
         # PDF'i kapat
         pdf_document.close()
         
         # Geçici klasörü temizle
         shutil.rmtree(pdf_temp_dir)
         
-        return [output_path]
+        return ConversionResult(image_paths=image_paths, pages=pages, text_context=text_context)
 
     except Exception as e:
         # Hata durumunda temizlik yap
@@ -77,5 +114,35 @@ def convert_pdf_to_jpg(file_path: str):
             pdf_document.close()
         raise PDFConversionError(str(e))
 
+def convert_pdf_to_jpg(file_path: str, profile_name: Optional[str] = None) -> List[str]:
+    return convert_pdf_document(file_path, profile_name).image_paths
+
+def render_derivative(source_path: str, output_path: str, width: int, fmt: str) -> str:
+    """
+    Render a downscaled copy of `source_path` into `output_path`.
+    JPEG sources are decoded at reduced size (DCT scaling via `Image.draft`),
+    so a thumbnail never pays for decoding the full 2x-rendered page.
+    """
+    if fmt not in DERIVATIVE_FORMATS:
+        raise UnsupportedFileTypeError(f"{source_path} -> {fmt}")
+    pil_format, save_params = DERIVATIVE_FORMATS[fmt]
+
+    with Image.open(source_path) as img:
+        height = max(1, round(img.height * width / img.width))
+        img.draft("RGB", (width, height))
+        img = img.convert("RGB")
+        if img.width > width:
+            img = img.resize((width, height), Image.LANCZOS)
+
+        # Yarım yazılmış dosya sunulmasın diye önce geçici dosyaya yaz
+        tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            img.save(tmp_path, format=pil_format, **save_params)
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return output_path
+
 def get_all_logs(db: Session):
  return db.query(ConversionLog).order_by(ConversionLog.converted_at.desc()).all()
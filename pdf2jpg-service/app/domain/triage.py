@@ -0,0 +1,95 @@
+import os
+from dataclasses import dataclass, asdict
+from typing import List
+
+import fitz  # PyMuPDF
+import pymupdf4llm
+
+# Sayfa sınıflandırma eşikleri (metin katmanı yoğunluğu ve görsel kaplama oranı)
+XRAY_MIN_IMAGE_COVERAGE = float(os.environ.get("XRAY_MIN_IMAGE_COVERAGE", "0.5"))
+# 1000 pt² başına karakter; A4 daktilo rapor sayfası ~6, film üzerindeki etiketler ~0-2
+XRAY_MAX_TEXT_DENSITY = float(os.environ.get("XRAY_MAX_TEXT_DENSITY", "5.0"))
+TEXT_MIN_CHARS = int(os.environ.get("TEXT_MIN_CHARS", "50"))
+TEXT_CONTEXT_MAX_CHARS = int(os.environ.get("TEXT_CONTEXT_MAX_CHARS", "8000"))
+
+PAGE_XRAY = "xray"
+PAGE_TEXT = "text"
+PAGE_BLANK = "blank"
+
+
+@dataclass(frozen=True)
+class PageTriage:
+    page_number: int
+    kind: str
+    text_chars: int
+    text_density: float
+    image_coverage: float
+
+
+def _image_coverage(page: fitz.Page) -> float:
+    """
+    Fraction of the page covered by its largest image. Using the largest
+    image avoids double counting overlapping/stacked images.
+    """
+    page_rect = page.rect
+    page_area = page_rect.width * page_rect.height
+    if page_area <= 0:
+        return 0.0
+    largest = 0.0
+    for info in page.get_image_info():
+        bbox = fitz.Rect(info["bbox"]) & page_rect
+        if not bbox.is_empty:
+            largest = max(largest, bbox.width * bbox.height)
+    return min(largest / page_area, 1.0)
+
+
+def classify_page(page: fitz.Page) -> PageTriage:
+    """
+    Classify a page from its text layer and image coverage, without rendering it.
+    """
+    text_chars = len(page.get_text("text").strip())
+    page_area = page.rect.width * page.rect.height
+    text_density = text_chars * 1000 / page_area if page_area > 0 else 0.0
+    image_coverage = _image_coverage(page)
+
+    if image_coverage >= XRAY_MIN_IMAGE_COVERAGE and text_density <= XRAY_MAX_TEXT_DENSITY:
+        kind = PAGE_XRAY
+    elif text_chars >= TEXT_MIN_CHARS:
+        kind = PAGE_TEXT
+    else:
+        kind = PAGE_BLANK
+
+    return PageTriage(
+        page_number=page.number,
+        kind=kind,
+        text_chars=text_chars,
+        text_density=round(text_density, 2),
+        image_coverage=round(image_coverage, 3),
+    )
+
+
+def triage_document(pdf_document: fitz.Document) -> List[PageTriage]:
+    return [classify_page(page) for page in pdf_document]
+
+
+def extract_text_context(pdf_document: fitz.Document, pages: List[int]) -> str:
+    """
+    Extract the given pages as markdown to attach as LLM context.
+    """
+    if not pages:
+        return ""
+    markdown = pymupdf4llm.to_markdown(pdf_document, pages=pages, show_progress=False)
+    return markdown[:TEXT_CONTEXT_MAX_CHARS]
+
+
+def summarize_triage(pages: List[PageTriage]) -> dict:
+    kinds = [p.kind for p in pages]
+    return {
+        "pages": len(pages),
+        "xray_pages": kinds.count(PAGE_XRAY),
+        "text_pages": kinds.count(PAGE_TEXT),
+        "blank_pages": kinds.count(PAGE_BLANK),
+        # X-ray olmayan sayfalar modele gönderilmez
+        "pages_skipped_for_inference": len(pages) - kinds.count(PAGE_XRAY),
+        "details": [asdict(p) for p in pages],
+    }
@@ -0,0 +1,161 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+# Render edilen görseller yazıldıktan sonra asla değişmez
+IMMUTABLE_MAX_AGE_SECONDS = 31536000
+
+_READ_CHUNK_SIZE = 64 * 1024
+
+# path -> (mtime_ns, size, etag); aynı dosya her istekte yeniden hash'lenmesin.
+# En son kullanılan ETAG_CACHE_MAX_ENTRIES dosya tutulur (LRU)
+ETAG_CACHE_MAX_ENTRIES = int(os.environ.get("ETAG_CACHE_MAX_ENTRIES", "4096"))
+_etag_cache: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+_etag_lock = threading.Lock()
+
+
+def get_file_etag(file_path: str) -> str:
+    """
+    Strong ETag derived from the SHA-256 of the file content.
+    The digest is memoized per (mtime, size) so it is computed once per file,
+    for the ETAG_CACHE_MAX_ENTRIES most recently used files.
+    """
+    stat = os.stat(file_path)
+    with _etag_lock:
+        cached = _etag_cache.get(file_path)
+        if cached is not None:
+            _etag_cache.move_to_end(file_path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    etag = f'"{digest.hexdigest()[:32]}"'
+
+    with _etag_lock:
+        _etag_cache[file_path] = (stat.st_mtime_ns, stat.st_size, etag)
+        _etag_cache.move_to_end(file_path)
+        while len(_etag_cache) > ETAG_CACHE_MAX_ENTRIES:
+            _etag_cache.popitem(last=False)
+    return etag
+
+
+def discard_file_etag(file_path: str) -> None:
+    with _etag_lock:
+        _etag_cache.pop(file_path, None)
+
+
+def _etag_matches(header_value: str, etag: str) -> bool:
+    # If-None-Match için zayıf karşılaştırma (RFC 9110 13.1.2)
+    if header_value.strip() == "*":
+        return True
+    candidates = [c.strip() for c in header_value.split(",")]
+    return any(c.removeprefix("W/") == etag for c in candidates)
+
+
+def _parse_range(header_value: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=` range. Returns an inclusive (start, end) tuple,
+    None when the header should be ignored (including invalid ranges such as
+    `bytes=5-2`, RFC 9110 14.2), and raises 416 when the range starts past the
+    end of the file.
+    """
+    unit, _, ranges = header_value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        # Çoklu aralıkları desteklemiyoruz; RFC tam yanıt dönmeye izin veriyor
+        return None
+    start_str, sep, end_str = ranges.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_str == "":
+            suffix_length = int(end_str)
+            if suffix_length <= 0:
+                raise ValueError
+            start, end = max(file_size - suffix_length, 0), file_size - 1
+        else:
+            start = int(start_str)
+            end = int(end_str) if end_str else file_size - 1
+            if end < start:
+                # Geçersiz aralık yok sayılır ve tam dosya döner
+                return None
+            end = min(end, file_size - 1)
+    except ValueError:
+        return None
+    if start >= file_size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{file_size}"},
+        )
+    return start, end
+
+
+def _iter_file_range(file_path: str, start: int, end: int):
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(_READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def build_cached_file_response(
+        request: Request,
+        file_path: str,
+        filename: str,
+        media_type: str,
+        max_age: int = IMMUTABLE_MAX_AGE_SECONDS,
+    ) -> Response:
+    """
+    Serve an immutable file with a strong ETag, `If-None-Match` -> 304
+    and single byte-range (`Range` / `If-Range`) support.
+    - **max_age**: Cache lifetime; signed URLs pass their remaining validity.
+    """
+    file_size = os.path.getsize(file_path)
+    if file_size == 0:
+        raise HTTPException(status_code=500, detail="File is empty")
+
+    etag = get_file_etag(file_path)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}, immutable",
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, file_size)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                _iter_file_range(file_path, start, end),
+                status_code=206,
+                media_type=media_type,
+                headers=headers,
+            )
+
+    headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return FileResponse(
+        path=file_path,
+        filename=filename,
+        media_type=media_type,
+        headers=headers,
+    )
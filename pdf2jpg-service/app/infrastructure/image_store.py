@@ -0,0 +1,113 @@
+import glob
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from app.domain.services import DERIVATIVE_DIR, OUTPUT_DIR, render_derivative
+from app.infrastructure.http_cache import discard_file_etag, get_file_etag
+
+# Orijinaller ve türevler için ortak saklama politikası:
+# erişim zamanına göre LRU, yaş ve iki katmanın toplamı için tek boyut sınırı
+IMAGE_RETENTION_SECONDS = int(os.environ.get("IMAGE_RETENTION_SECONDS", str(7 * 24 * 3600)))
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+EVICTION_INTERVAL_SECONDS = 60
+
+ORIGINAL_PATTERN = os.path.join(OUTPUT_DIR, "heart_xray_*")
+DERIVATIVE_PATTERN = os.path.join(DERIVATIVE_DIR, "*")
+
+_inflight: Dict[str, threading.Lock] = {}
+_inflight_guard = threading.Lock()
+_last_eviction = 0.0
+_eviction_lock = threading.Lock()
+
+
+def touch(path: str) -> None:
+    """
+    Record an access for LRU eviction. Only atime is bumped so the
+    memoized ETag (keyed on mtime) stays valid.
+    """
+    try:
+        stat = os.stat(path)
+        os.utime(path, (time.time(), stat.st_mtime))
+    except OSError:
+        pass
+
+
+def _evict(patterns: List[str]) -> int:
+    now = time.time()
+    entries: List[Tuple[float, int, str]] = []
+    for path in (path for pattern in patterns for path in glob.glob(pattern)):
+        if path.endswith(".tmp"):
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+
+    entries.sort()
+    total_bytes = sum(size for _, size, _ in entries)
+    removed = 0
+    for last_access, size, path in entries:
+        expired = now - last_access > IMAGE_RETENTION_SECONDS
+        if not expired and total_bytes <= IMAGE_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        discard_file_etag(path)
+        total_bytes -= size
+        removed += 1
+    return removed
+
+
+def evict_stale_images(force: bool = False) -> int:
+    """
+    Apply the retention policy to original renders and derivatives;
+    IMAGE_CACHE_MAX_BYTES bounds both together.
+    Runs at most once per EVICTION_INTERVAL_SECONDS unless forced.
+    - **Returns**: Number of removed files.
+    """
+    global _last_eviction
+    with _eviction_lock:
+        if not force and time.time() - _last_eviction < EVICTION_INTERVAL_SECONDS:
+            return 0
+        _last_eviction = time.time()
+        removed = _evict([ORIGINAL_PATTERN, DERIVATIVE_PATTERN])
+    if removed:
+        print(f"Evicted {removed} cached images")
+    return removed
+
+
+def derivative_path(source_path: str, width: int, fmt: str) -> str:
+    # Orijinal silinip numarası yeniden kullanılırsa eski türev sunulmasın diye
+    # anahtar kaynağın içerik hash'ini de içerir
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    digest = get_file_etag(source_path).strip('"')[:16]
+    return os.path.join(DERIVATIVE_DIR, f"{stem}_{digest}_w{width}.{fmt}")
+
+
+def get_or_create_derivative(source_path: str, width: int, fmt: str) -> str:
+    """
+    Return the cached derivative of `source_path`, rendering it on first use.
+    Concurrent requests for the same derivative wait on a single render.
+    """
+    output_path = derivative_path(source_path, width, fmt)
+    if os.path.exists(output_path):
+        touch(output_path)
+        return output_path
+
+    with _inflight_guard:
+        lock = _inflight.setdefault(output_path, threading.Lock())
+    try:
+        with lock:
+            if not os.path.exists(output_path):
+                render_derivative(source_path, output_path, width, fmt)
+    finally:
+        with _inflight_guard:
+            _inflight.pop(output_path, None)
+
+    evict_stale_images()
+    return output_path
@@ -0,0 +1,66 @@
+import base64
+import hashlib
+import hmac
+import os
+import time
+from typing import Optional
+
+from fastapi import HTTPException, Query, Request, status
+
+# İmzalı indirme linkleri: HMAC-SHA256("{path}\n{expires}")
+# Aynı secret'a sahip herhangi bir statik dosya sunucusu / sidecar da doğrulayabilir.
+# Ayrı bir secret zorunludur; JWT secret'ı paylaşılmaz, tanımlı değilse servis başlamaz.
+DOWNLOAD_URL_SECRET = os.environ.get("DOWNLOAD_URL_SECRET", "")
+if not DOWNLOAD_URL_SECRET:
+    raise RuntimeError("DOWNLOAD_URL_SECRET is not set")
+if DOWNLOAD_URL_SECRET == os.environ.get("JWT_SECRET_KEY"):
+    raise RuntimeError("DOWNLOAD_URL_SECRET must differ from JWT_SECRET_KEY")
+DOWNLOAD_URL_TTL_SECONDS = int(os.environ.get("DOWNLOAD_URL_TTL_SECONDS", "900"))
+# Son kullanma zamanı bu aralığa yuvarlanır; aynı aralıktaki istekler aynı URL'yi
+# alır, böylece tarayıcı önbelleğindeki değişmez görsel yeniden indirilmez
+DOWNLOAD_URL_EXPIRY_BUCKET_SECONDS = int(os.environ.get("DOWNLOAD_URL_EXPIRY_BUCKET_SECONDS", "300"))
+PUBLIC_BASE_URL = os.environ.get("PUBLIC_BASE_URL", "http://localhost:8001")
+
+
+def compute_signature(path: str, expires: int) -> str:
+    """
+    Compute the URL-safe base64 HMAC-SHA256 of `path` and `expires`.
+    """
+    message = f"{path}\n{expires}".encode()
+    mac = hmac.new(DOWNLOAD_URL_SECRET.encode(), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(mac).rstrip(b"=").decode()
+
+
+def sign_download_url(path: str, ttl_seconds: Optional[int] = None) -> str:
+    """
+    Build an absolute, short-lived signed URL for `path` (e.g. `/download/x.jpg`).
+    The expiry is rounded up to DOWNLOAD_URL_EXPIRY_BUCKET_SECONDS, so repeated
+    requests within one bucket get the same, browser-cacheable URL.
+    """
+    ttl = DOWNLOAD_URL_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+    expires = int(time.time()) + ttl
+    if DOWNLOAD_URL_EXPIRY_BUCKET_SECONDS > 0:
+        # Yukarı yuvarlanır: URL en az `ttl` saniye geçerli kalır
+        expires = -(-expires // DOWNLOAD_URL_EXPIRY_BUCKET_SECONDS) * DOWNLOAD_URL_EXPIRY_BUCKET_SECONDS
+    signature = compute_signature(path, expires)
+    return f"{PUBLIC_BASE_URL}{path}?expires={expires}&signature={signature}"
+
+
+def verify_signed_url(
+        request: Request,
+        expires: int = Query(...),
+        signature: str = Query(...),
+    ) -> int:
+    """
+    FastAPI dependency validating a signed URL without any DB or auth-service call.
+    - **Returns**: Seconds left until the URL expires.
+    - **Raises**: 403 if the signature is invalid or expired.
+    """
+    remaining = expires - int(time.time())
+    if remaining <= 0:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Download URL expired")
+    expected = compute_signature(request.url.path, expires)
+    # Bayt olarak karşılaştırılır: ASCII dışı bir imza TypeError (500) yerine 403 alır
+    if not hmac.compare_digest(expected.encode(), signature.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid download signature")
+    return remaining
@@ -1,10 +1,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import HTTPBearer
-from fastapi import Depends
 from app.domain.models import Base
 from app.infrastructure.database import engine
-from app.application.routes import router
+from app.application.routes import router, download_router
 
 # Initialize DB
 def init_db():
@@ -15,11 +13,13 @@ app = FastAPI(
     description="XCARDIA : pdf2image-service",
     version="1.0.0",
     openapi_tags=[{"name": "PDF", "description": "PDF dönüşüm işlemleri"}],
-    dependencies=[Depends(HTTPBearer())]
 )
 
 # Router'ı uygulamaya ekle
+# /convert/ ve /logs/ get_current_user ile bearer token ister;
+# /download imzalı URL ile doğrulanır.
 app.include_router(router)
+app.include_router(download_router)
 
 @app.on_event("startup")
 def on_startup():
@@ -0,0 +1,62 @@
+"""
+Benchmark the output profiles on the sample X-rays in temp/.
+
+    cd pdf2jpg-service && python -m benchmarks.bench_output_profiles [--samples 10]
+
+Reports per profile: mean encode time, mean bytes and mean decode time.
+"""
+import argparse
+import glob
+import io
+import os
+import statistics
+import time
+
+from PIL import Image
+
+from app.domain.codecs import OUTPUT_PROFILES, encode_image
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "temp")
+
+
+def load_samples(limit: int):
+    paths = sorted(glob.glob(os.path.join(SAMPLE_DIR, "heart_xray_*.jpg")))[:limit]
+    images = []
+    for path in paths:
+        with Image.open(path) as img:
+            images.append(img.convert("RGB"))
+    return images
+
+
+def bench_profile(profile, images):
+    encode_ms, sizes, decode_ms = [], [], []
+    for img in images:
+        start = time.perf_counter()
+        data, _ = encode_image(img, profile)
+        encode_ms.append((time.perf_counter() - start) * 1000)
+        sizes.append(len(data))
+
+        start = time.perf_counter()
+        with Image.open(io.BytesIO(data)) as decoded:
+            decoded.load()
+        decode_ms.append((time.perf_counter() - start) * 1000)
+    return statistics.mean(encode_ms), statistics.mean(sizes), statistics.mean(decode_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=10)
+    args = parser.parse_args()
+
+    images = load_samples(args.samples)
+    if not images:
+        raise SystemExit(f"No heart_xray_*.jpg samples found in {SAMPLE_DIR}")
+    print(f"{len(images)} samples, {images[0].width}x{images[0].height} px")
+    print(f"{'profile':<10} {'format':<6} {'encode ms':>10} {'KB':>10} {'decode ms':>10}")
+    for profile in OUTPUT_PROFILES.values():
+        encode_ms, size, decode_ms = bench_profile(profile, images)
+        print(f"{profile.name:<10} {profile.format:<6} {encode_ms:>10.1f} {size / 1024:>10.1f} {decode_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Report how much inference and LLM work page triage avoids.
+
+    cd pdf2jpg-service && python -m benchmarks.bench_page_triage [PDF ...]
+
+Without arguments the PDFs in uploads/ are used. The skipped-page total only
+counts these real documents; measure the saving on real traffic by passing
+multi-page referral PDFs (cover letter, films, typed reports). A synthetic
+mixed document (cover letter + film + typed report, built from the temp/
+samples) is listed separately as a classifier sanity check and is not part
+of the total.
+"""
+import argparse
+import glob
+import os
+import time
+
+import fitz  # PyMuPDF
+
+from app.domain.triage import PAGE_TEXT, PAGE_XRAY, extract_text_context, triage_document
+
+BASE_DIR = os.path.join(os.path.dirname(__file__), "..")
+LETTER = (
+    "Sayın Doktor,\n\nEkte hastamıza ait akciğer grafisini ve önceki raporları "
+    "bilgilerinize sunarız. Hasta 54 yaşında, nefes darlığı ve göğüs ağrısı "
+    "şikayetleriyle başvurmuştur. Hipertansiyon öyküsü mevcuttur.\n\n"
+) * 6
+
+
+def build_mixed_document() -> fitz.Document:
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_textbox(page.rect + (50, 50, -50, -50), LETTER, fontsize=11)
+    for image_path in sorted(glob.glob(os.path.join(BASE_DIR, "temp", "heart_xray_*.jpg")))[:2]:
+        page = doc.new_page()
+        page.insert_image(page.rect, filename=image_path)
+    page = doc.new_page()
+    page.insert_textbox(page.rect + (50, 50, -50, -50), "RAPOR\n\n" + LETTER, fontsize=11)
+    return doc
+
+
+def bench_document(name: str, doc: fitz.Document) -> dict:
+    start = time.perf_counter()
+    pages = triage_document(doc)
+    triage_ms = (time.perf_counter() - start) * 1000
+
+    skipped = [p.page_number for p in pages if p.kind != PAGE_XRAY]
+    start = time.perf_counter()
+    for page_number in skipped:
+        doc[page_number].get_pixmap(matrix=fitz.Matrix(2.0, 2.0))
+    render_saved_ms = (time.perf_counter() - start) * 1000
+
+    text_pages = [p.page_number for p in pages if p.kind == PAGE_TEXT]
+    markdown = extract_text_context(doc, text_pages)
+    kinds = "".join(p.kind[0].upper() for p in pages)
+    print(
+        f"{name[:40]:<40} {len(pages):>5} {kinds:<10} {triage_ms:>9.1f} "
+        f"{len(skipped):>8} {render_saved_ms:>11.1f} {len(markdown):>9}"
+    )
+    return {"pages": len(pages), "skipped": len(skipped)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("pdfs", nargs="*")
+    args = parser.parse_args()
+
+    paths = args.pdfs or sorted(glob.glob(os.path.join(BASE_DIR, "uploads", "*.pdf")))
+    print(f"{'document':<40} {'pages':>5} {'kinds':<10} {'triage ms':>9} {'skipped':>8} {'render ms':>11} {'md chars':>9}")
+    totals = {"pages": 0, "skipped": 0}
+    for path in paths:
+        doc = fitz.open(path)
+        result = bench_document(os.path.basename(path), doc)
+        totals["pages"] += result["pages"]
+        totals["skipped"] += result["skipped"]
+        doc.close()
+    if not args.pdfs:
+        # Yalnızca sınıflandırıcının doğruluğunu gösterir; toplama katılmaz
+        doc = build_mixed_document()
+        bench_document("(synthetic mixed document)", doc)
+        doc.close()
+
+    share = totals["skipped"] / totals["pages"] * 100 if totals["pages"] else 0.0
+    print(
+        f"\n{len(paths)} real documents: {totals['skipped']} of {totals['pages']} pages ({share:.0f}%) never rendered, "
+        f"never sent to the X-ray model and never interpreted by the LLM as an image"
+    )
+
+
+if __name__ == "__main__":
+    main()